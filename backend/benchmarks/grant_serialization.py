@@ -0,0 +1,111 @@
+"""
+Micro-benchmark: default FastAPI response path vs. the prebuilt TypeAdapter path for a 50-stage program.
+
+    cd backend && python benchmarks/grant_serialization.py
+"""
+import asyncio
+import os
+import sys
+import time
+import uuid
+from decimal import Decimal
+from pathlib import Path
+
+os.environ.setdefault("DB_URL", "sqlite+aiosqlite:///:memory:")
+os.environ.setdefault("SECRET_KEY", "bench-secret")
+os.environ.setdefault("MIR_API_KEY", "bench-key")
+os.environ.setdefault("APP_BANK_ACCOUNT_NUMBER", "APP-ACCOUNT")
+sys.path.append(str(Path(__file__).resolve().parents[1]))
+
+from fastapi.responses import JSONResponse  # noqa: E402
+from fastapi.routing import serialize_response  # noqa: E402
+from fastapi.utils import create_response_field  # noqa: E402
+
+from src.modules.auth.models import User  # noqa: E402
+from src.modules.grants.models import GrantProgram, Requirement, Stage, UserToGrant  # noqa: E402
+from src.modules.grants.schemas import GrantProgramRead  # noqa: E402
+from src.modules.grants.serializers import dump_program, load_program  # noqa: E402
+
+STAGES = 50
+REQUIREMENTS_PER_STAGE = 4
+PARTICIPANTS = 20
+ITERATIONS = 300
+
+
+def build_program() -> GrantProgram:
+    program = GrantProgram(
+        id=uuid.uuid4(),
+        name="Benchmark Program",
+        bank_account_number="BANK-BENCH",
+        status="active",
+        grantor_id=uuid.uuid4(),
+        payout_policy="immediate",
+        total_amount=Decimal("50000.00"),
+        disbursed_amount=Decimal("0"),
+        completed_stages=0,
+        pending_requirements=STAGES * REQUIREMENTS_PER_STAGE,
+    )
+    for order in range(1, STAGES + 1):
+        stage = Stage(
+            id=uuid.uuid4(),
+            order=order,
+            amount=Decimal("1000.00"),
+            completion_status="pending",
+            spent_amount=Decimal("0"),
+        )
+        for index in range(REQUIREMENTS_PER_STAGE):
+            stage.requirements.append(
+                Requirement(
+                    id=uuid.uuid4(),
+                    name=f"Requirement {order}.{index}",
+                    description="Upload the signed milestone report",
+                    status="pending",
+                )
+            )
+        program.stages.append(stage)
+    for index in range(PARTICIPANTS):
+        user = User(id=uuid.uuid4(), name=f"User {index}", email=f"user{index}@example.com", hashed_password="x")
+        program.participants.append(
+            UserToGrant(
+                id=uuid.uuid4(), user_id=user.id, grant_program_id=program.id, user=user, role="grantee", active=True
+            )
+        )
+    return program
+
+
+async def default_path(program: GrantProgram, field) -> bytes:
+    model = GrantProgramRead.model_validate(program, from_attributes=True)
+    content = await serialize_response(field=field, response_content=model)
+    return JSONResponse(content).body
+
+
+def fast_path(program: GrantProgram) -> bytes:
+    return dump_program(load_program(program))
+
+
+async def main() -> None:
+    program = build_program()
+    field = create_response_field(name="response", type_=GrantProgramRead)
+
+    for _ in range(20):  # warm-up
+        await default_path(program, field)
+        fast_path(program)
+
+    start = time.perf_counter()
+    for _ in range(ITERATIONS):
+        default_body = await default_path(program, field)
+    default_time = (time.perf_counter() - start) / ITERATIONS
+
+    start = time.perf_counter()
+    for _ in range(ITERATIONS):
+        fast_body = fast_path(program)
+    fast_time = (time.perf_counter() - start) / ITERATIONS
+
+    print(f"program: {STAGES} stages, {STAGES * REQUIREMENTS_PER_STAGE} requirements, {PARTICIPANTS} participants")
+    print(f"default response_model + json: {default_time * 1e6:8.0f} us/response ({len(default_body)} bytes)")
+    print(f"TypeAdapter + preserialized:   {fast_time * 1e6:8.0f} us/response ({len(fast_body)} bytes)")
+    print(f"speedup: {default_time / fast_time:.1f}x")
+
+
+if __name__ == "__main__":
+    asyncio.run(main())
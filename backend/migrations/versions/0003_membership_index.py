@@ -0,0 +1,27 @@
+"""add membership index on user_to_grant
+
+Revision ID: 0003_membership_index
+Revises: 0002_add_requirement_proof
+Create Date: 2025-02-01 00:00:00.000000
+"""
+from __future__ import annotations
+
+from alembic import op
+
+# revision identifiers, used by Alembic.
+revision = "0003_membership_index"
+down_revision = "0002_add_requirement_proof"
+branch_labels = None
+depends_on = None
+
+
+def upgrade() -> None:
+    op.create_index(
+        "ix_user_to_grant_program_user_active",
+        "user_to_grant",
+        ["grant_program_id", "user_id", "active"],
+    )
+
+
+def downgrade() -> None:
+    op.drop_index("ix_user_to_grant_program_user_active", table_name="user_to_grant")
@@ -0,0 +1,28 @@
+"""add optimistic concurrency version columns
+
+Revision ID: 0004_optimistic_versions
+Revises: 0003_membership_index
+Create Date: 2025-02-10 00:00:00.000000
+"""
+from __future__ import annotations
+
+from alembic import op
+import sqlalchemy as sa
+
+# revision identifiers, used by Alembic.
+revision = "0004_optimistic_versions"
+down_revision = "0003_membership_index"
+branch_labels = None
+depends_on = None
+
+VERSIONED_TABLES = ("grant_programs", "stages", "requirements")
+
+
+def upgrade() -> None:
+    for table in VERSIONED_TABLES:
+        op.add_column(table, sa.Column("version", sa.Integer(), nullable=False, server_default="1"))
+
+
+def downgrade() -> None:
+    for table in reversed(VERSIONED_TABLES):
+        op.drop_column(table, "version")
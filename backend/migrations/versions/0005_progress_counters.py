@@ -0,0 +1,54 @@
+"""add denormalized progress counters to grant programs
+
+Revision ID: 0005_progress_counters
+Revises: 0004_optimistic_versions
+Create Date: 2025-02-20 00:00:00.000000
+"""
+from __future__ import annotations
+
+from alembic import op
+import sqlalchemy as sa
+
+# revision identifiers, used by Alembic.
+revision = "0005_progress_counters"
+down_revision = "0004_optimistic_versions"
+branch_labels = None
+depends_on = None
+
+
+def upgrade() -> None:
+    op.add_column("grant_programs", sa.Column("total_amount", sa.Numeric(12, 2), nullable=False, server_default="0"))
+    op.add_column(
+        "grant_programs", sa.Column("disbursed_amount", sa.Numeric(12, 2), nullable=False, server_default="0")
+    )
+    op.add_column("grant_programs", sa.Column("completed_stages", sa.Integer(), nullable=False, server_default="0"))
+    op.add_column(
+        "grant_programs", sa.Column("pending_requirements", sa.Integer(), nullable=False, server_default="0")
+    )
+
+    # Backfill from the source tables; afterwards GrantService keeps the counters current.
+    op.execute(
+        """
+        UPDATE grant_programs SET
+            total_amount = (SELECT COALESCE(SUM(s.amount), 0) FROM stages s WHERE s.grant_program_id = grant_programs.id),
+            disbursed_amount = (
+                SELECT COALESCE(SUM(s.amount), 0) FROM stages s
+                WHERE s.grant_program_id = grant_programs.id AND s.completion_status = 'completed'
+            ),
+            completed_stages = (
+                SELECT COUNT(s.id) FROM stages s
+                WHERE s.grant_program_id = grant_programs.id AND s.completion_status = 'completed'
+            ),
+            pending_requirements = (
+                SELECT COUNT(r.id) FROM requirements r JOIN stages s ON s.id = r.stage_id
+                WHERE s.grant_program_id = grant_programs.id AND COALESCE(r.status, 'pending') <> 'completed'
+            )
+        """
+    )
+
+
+def downgrade() -> None:
+    op.drop_column("grant_programs", "pending_requirements")
+    op.drop_column("grant_programs", "completed_stages")
+    op.drop_column("grant_programs", "disbursed_amount")
+    op.drop_column("grant_programs", "total_amount")
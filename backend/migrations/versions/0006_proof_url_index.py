@@ -0,0 +1,23 @@
+"""index requirement proof urls for proof download access checks
+
+Revision ID: 0006_proof_url_index
+Revises: 0005_progress_counters
+Create Date: 2025-03-01 00:00:00.000000
+"""
+from __future__ import annotations
+
+from alembic import op
+
+# revision identifiers, used by Alembic.
+revision = "0006_proof_url_index"
+down_revision = "0005_progress_counters"
+branch_labels = None
+depends_on = None
+
+
+def upgrade() -> None:
+    op.create_index("ix_requirements_proof_url", "requirements", ["proof_url"])
+
+
+def downgrade() -> None:
+    op.drop_index("ix_requirements_proof_url", table_name="requirements")
@@ -0,0 +1,52 @@
+"""add append-only grant_events audit log and its archive
+
+Revision ID: 0007_grant_events
+Revises: 0006_proof_url_index
+Create Date: 2025-03-10 00:00:00.000000
+"""
+from __future__ import annotations
+
+import sqlalchemy as sa
+from alembic import op
+from sqlalchemy.dialects import postgresql
+
+# revision identifiers, used by Alembic.
+revision = "0007_grant_events"
+down_revision = "0006_proof_url_index"
+branch_labels = None
+depends_on = None
+
+
+def _event_columns() -> list[sa.Column]:
+    return [
+        sa.Column("grant_program_id", postgresql.UUID(as_uuid=True), nullable=False),
+        sa.Column("kind", sa.String(length=64), nullable=False),
+        sa.Column("actor_id", postgresql.UUID(as_uuid=True), nullable=True),
+        sa.Column("payload", sa.JSON(), nullable=False),
+        sa.Column("created_at", sa.DateTime(timezone=True), nullable=False),
+    ]
+
+
+def upgrade() -> None:
+    op.create_table(
+        "grant_events",
+        sa.Column("id", sa.BigInteger(), primary_key=True, autoincrement=True),
+        *_event_columns(),
+    )
+    op.create_index("ix_grant_events_program_id_id", "grant_events", ["grant_program_id", "id"])
+    op.create_index("ix_grant_events_created_at", "grant_events", ["created_at"])
+
+    op.create_table(
+        "grant_events_archive",
+        sa.Column("id", sa.BigInteger(), primary_key=True, autoincrement=False),
+        *_event_columns(),
+    )
+    op.create_index("ix_grant_events_archive_program_id_id", "grant_events_archive", ["grant_program_id", "id"])
+
+
+def downgrade() -> None:
+    op.drop_index("ix_grant_events_archive_program_id_id", table_name="grant_events_archive")
+    op.drop_table("grant_events_archive")
+    op.drop_index("ix_grant_events_created_at", table_name="grant_events")
+    op.drop_index("ix_grant_events_program_id_id", table_name="grant_events")
+    op.drop_table("grant_events")
@@ -0,0 +1,98 @@
+"""add transition timestamps and monthly disbursement rollups
+
+Revision ID: 0008_disbursement_rollups
+Revises: 0007_grant_events
+Create Date: 2025-03-20 00:00:00.000000
+"""
+from __future__ import annotations
+
+import sqlalchemy as sa
+from alembic import op
+from sqlalchemy.dialects import postgresql
+
+# revision identifiers, used by Alembic.
+revision = "0008_disbursement_rollups"
+down_revision = "0007_grant_events"
+branch_labels = None
+depends_on = None
+
+
+def upgrade() -> None:
+    op.add_column("grant_programs", sa.Column("confirmed_at", sa.DateTime(timezone=True), nullable=True))
+    op.add_column("grant_programs", sa.Column("completed_at", sa.DateTime(timezone=True), nullable=True))
+    op.add_column("stages", sa.Column("completed_at", sa.DateTime(timezone=True), nullable=True))
+
+    # Earlier transitions are dated from the audit log where it recorded them. The rest stay NULL, which keeps
+    # them out of the rollups rather than booking them all in the month of the upgrade.
+    op.execute(
+        """
+        UPDATE grant_programs p SET confirmed_at = e.created_at
+        FROM (
+            SELECT grant_program_id, min(created_at) AS created_at FROM grant_events
+            WHERE kind = 'program.confirmed' GROUP BY grant_program_id
+        ) AS e
+        WHERE e.grant_program_id = p.id AND p.status <> 'draft'
+        """
+    )
+    op.execute(
+        """
+        UPDATE grant_programs p SET completed_at = e.created_at
+        FROM (
+            SELECT grant_program_id, max(created_at) AS created_at FROM grant_events
+            WHERE kind = 'program.completed' GROUP BY grant_program_id
+        ) AS e
+        WHERE e.grant_program_id = p.id AND p.status = 'completed'
+        """
+    )
+    op.execute(
+        """
+        UPDATE stages s SET completed_at = e.created_at
+        FROM (
+            SELECT CAST(payload ->> 'stage_id' AS UUID) AS stage_id, max(created_at) AS created_at FROM grant_events
+            WHERE kind = 'stage.completed' GROUP BY 1
+        ) AS e
+        WHERE e.stage_id = s.id AND s.completion_status = 'completed'
+        """
+    )
+
+    op.create_table(
+        "disbursement_rollups",
+        sa.Column("month", sa.Date(), primary_key=True),
+        sa.Column("grantor_id", postgresql.UUID(as_uuid=True), primary_key=True),
+        sa.Column("committed_amount", sa.Numeric(14, 2), nullable=False, server_default="0"),
+        sa.Column("disbursed_amount", sa.Numeric(14, 2), nullable=False, server_default="0"),
+        sa.Column("programs_confirmed", sa.Integer(), nullable=False, server_default="0"),
+        sa.Column("programs_completed", sa.Integer(), nullable=False, server_default="0"),
+        sa.Column("stages_completed", sa.Integer(), nullable=False, server_default="0"),
+    )
+    op.execute(
+        """
+        INSERT INTO disbursement_rollups
+            (month, grantor_id, committed_amount, disbursed_amount,
+             programs_confirmed, programs_completed, stages_completed)
+        SELECT month, grantor_id, sum(committed), sum(disbursed), sum(confirmed), sum(completed), sum(stages)
+        FROM (
+            SELECT CAST(date_trunc('month', confirmed_at) AS DATE) AS month, grantor_id,
+                   total_amount AS committed, 0 AS disbursed, 1 AS confirmed,
+                   0 AS completed, 0 AS stages
+            FROM grant_programs
+            WHERE confirmed_at IS NOT NULL
+            UNION ALL
+            SELECT CAST(date_trunc('month', completed_at) AS DATE), grantor_id, 0, 0, 0, 1, 0
+            FROM grant_programs
+            WHERE completed_at IS NOT NULL
+            UNION ALL
+            SELECT CAST(date_trunc('month', s.completed_at) AS DATE), p.grantor_id, 0, s.amount, 0, 0, 1
+            FROM stages s JOIN grant_programs p ON p.id = s.grant_program_id
+            WHERE s.completed_at IS NOT NULL
+        ) AS facts
+        GROUP BY month, grantor_id
+        """
+    )
+
+
+def downgrade() -> None:
+    op.drop_table("disbursement_rollups")
+    op.drop_column("stages", "completed_at")
+    op.drop_column("grant_programs", "completed_at")
+    op.drop_column("grant_programs", "confirmed_at")
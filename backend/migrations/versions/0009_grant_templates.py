@@ -0,0 +1,68 @@
+"""add grant templates
+
+Revision ID: 0009_grant_templates
+Revises: 0008_disbursement_rollups
+Create Date: 2025-04-01 00:00:00.000000
+"""
+from __future__ import annotations
+
+import sqlalchemy as sa
+from alembic import op
+from sqlalchemy.dialects import postgresql
+
+# revision identifiers, used by Alembic.
+revision = "0009_grant_templates"
+down_revision = "0008_disbursement_rollups"
+branch_labels = None
+depends_on = None
+
+
+def upgrade() -> None:
+    op.create_table(
+        "grant_templates",
+        sa.Column("id", postgresql.UUID(as_uuid=True), primary_key=True),
+        sa.Column("name", sa.String(length=255), nullable=False),
+        sa.Column(
+            "grantor_id", postgresql.UUID(as_uuid=True), sa.ForeignKey("users.id", ondelete="CASCADE"), nullable=False
+        ),
+    )
+    op.create_index("ix_grant_templates_grantor_id", "grant_templates", ["grantor_id"])
+
+    op.create_table(
+        "grant_template_stages",
+        sa.Column("id", postgresql.UUID(as_uuid=True), primary_key=True),
+        sa.Column(
+            "template_id",
+            postgresql.UUID(as_uuid=True),
+            sa.ForeignKey("grant_templates.id", ondelete="CASCADE"),
+            nullable=False,
+        ),
+        sa.Column("order", sa.Integer(), nullable=False),
+        sa.Column("amount", sa.Numeric(10, 2), nullable=False),
+    )
+    op.create_index("ix_grant_template_stages_template_id", "grant_template_stages", ["template_id"])
+
+    op.create_table(
+        "grant_template_requirements",
+        sa.Column("id", postgresql.UUID(as_uuid=True), primary_key=True),
+        sa.Column(
+            "template_stage_id",
+            postgresql.UUID(as_uuid=True),
+            sa.ForeignKey("grant_template_stages.id", ondelete="CASCADE"),
+            nullable=False,
+        ),
+        sa.Column("name", sa.String(length=255), nullable=False),
+        sa.Column("description", sa.String(length=500), nullable=True),
+    )
+    op.create_index(
+        "ix_grant_template_requirements_template_stage_id", "grant_template_requirements", ["template_stage_id"]
+    )
+
+
+def downgrade() -> None:
+    op.drop_index("ix_grant_template_requirements_template_stage_id", table_name="grant_template_requirements")
+    op.drop_table("grant_template_requirements")
+    op.drop_index("ix_grant_template_stages_template_id", table_name="grant_template_stages")
+    op.drop_table("grant_template_stages")
+    op.drop_index("ix_grant_templates_grantor_id", table_name="grant_templates")
+    op.drop_table("grant_templates")
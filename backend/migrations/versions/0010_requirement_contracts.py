@@ -0,0 +1,80 @@
+"""link requirements to payment contracts
+
+Revision ID: 0010_requirement_contracts
+Revises: 0009_grant_templates
+Create Date: 2025-04-08 00:00:00.000000
+"""
+from __future__ import annotations
+
+import sqlalchemy as sa
+from alembic import op
+from sqlalchemy.dialects import postgresql
+
+# revision identifiers, used by Alembic.
+revision = "0010_requirement_contracts"
+down_revision = "0009_grant_templates"
+branch_labels = None
+depends_on = None
+
+
+def upgrade() -> None:
+    # payment_contracts was only ever created by the app's create_all; make sure it exists before referencing it.
+    op.execute(
+        """
+        CREATE TABLE IF NOT EXISTS payment_contracts (
+            id UUID PRIMARY KEY,
+            name VARCHAR(255) NOT NULL,
+            contract_type VARCHAR(50) NOT NULL,
+            parameters JSON NOT NULL,
+            description VARCHAR(500),
+            status VARCHAR(50) NOT NULL,
+            created_at TIMESTAMP WITH TIME ZONE NOT NULL
+        )
+        """
+    )
+
+    op.add_column("requirements", sa.Column("payment_contract_id", postgresql.UUID(as_uuid=True), nullable=True))
+    op.create_foreign_key(
+        "fk_requirements_payment_contract_id",
+        "requirements",
+        "payment_contracts",
+        ["payment_contract_id"],
+        ["id"],
+        ondelete="SET NULL",
+    )
+    op.create_index("ix_requirements_payment_contract_id", "requirements", ["payment_contract_id"])
+
+    op.add_column(
+        "grant_template_requirements",
+        sa.Column("payment_contract_id", postgresql.UUID(as_uuid=True), nullable=True),
+    )
+    op.create_foreign_key(
+        "fk_grant_template_requirements_payment_contract_id",
+        "grant_template_requirements",
+        "payment_contracts",
+        ["payment_contract_id"],
+        ["id"],
+        ondelete="SET NULL",
+    )
+
+    # Backfill links encoded as `payment_contract_id:<uuid>` descriptions that point at an existing contract.
+    for table in ("requirements", "grant_template_requirements"):
+        op.execute(
+            f"""
+            UPDATE {table} AS r
+            SET payment_contract_id = c.id
+            FROM payment_contracts AS c
+            WHERE r.description LIKE 'payment_contract_id:%'
+              AND c.id::text = lower(trim(substring(r.description FROM length('payment_contract_id:') + 1)))
+            """
+        )
+
+
+def downgrade() -> None:
+    op.drop_constraint(
+        "fk_grant_template_requirements_payment_contract_id", "grant_template_requirements", type_="foreignkey"
+    )
+    op.drop_column("grant_template_requirements", "payment_contract_id")
+    op.drop_index("ix_requirements_payment_contract_id", table_name="requirements")
+    op.drop_constraint("fk_requirements_payment_contract_id", "requirements", type_="foreignkey")
+    op.drop_column("requirements", "payment_contract_id")
@@ -0,0 +1,24 @@
+"""track contract spend per stage
+
+Revision ID: 0011_stage_spent_amount
+Revises: 0010_requirement_contracts
+Create Date: 2025-04-15 00:00:00.000000
+"""
+from __future__ import annotations
+
+import sqlalchemy as sa
+from alembic import op
+
+# revision identifiers, used by Alembic.
+revision = "0011_stage_spent_amount"
+down_revision = "0010_requirement_contracts"
+branch_labels = None
+depends_on = None
+
+
+def upgrade() -> None:
+    op.add_column("stages", sa.Column("spent_amount", sa.Numeric(10, 2), nullable=False, server_default="0"))
+
+
+def downgrade() -> None:
+    op.drop_column("stages", "spent_amount")
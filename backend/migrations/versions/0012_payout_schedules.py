@@ -0,0 +1,60 @@
+"""add payout schedules
+
+Revision ID: 0012_payout_schedules
+Revises: 0011_stage_spent_amount
+Create Date: 2025-04-22 00:00:00.000000
+"""
+from __future__ import annotations
+
+import sqlalchemy as sa
+from alembic import op
+from sqlalchemy.dialects import postgresql
+
+# revision identifiers, used by Alembic.
+revision = "0012_payout_schedules"
+down_revision = "0011_stage_spent_amount"
+branch_labels = None
+depends_on = None
+
+
+def upgrade() -> None:
+    op.add_column(
+        "grant_programs",
+        sa.Column("payout_policy", sa.String(length=32), nullable=False, server_default="immediate"),
+    )
+
+    op.create_table(
+        "payout_schedules",
+        sa.Column("id", postgresql.UUID(as_uuid=True), primary_key=True),
+        sa.Column(
+            "stage_id",
+            postgresql.UUID(as_uuid=True),
+            sa.ForeignKey("stages.id", ondelete="CASCADE"),
+            nullable=False,
+            unique=True,
+        ),
+        sa.Column(
+            "grant_program_id",
+            postgresql.UUID(as_uuid=True),
+            sa.ForeignKey("grant_programs.id", ondelete="CASCADE"),
+            nullable=False,
+        ),
+        sa.Column("bank_account_number", sa.String(length=64), nullable=False),
+        sa.Column("amount", sa.Numeric(10, 2), nullable=False),
+        sa.Column("due_at", sa.DateTime(timezone=True), nullable=False),
+        sa.Column("status", sa.String(length=20), nullable=False),
+        sa.Column("attempts", sa.Integer(), nullable=False),
+        sa.Column("claimed_at", sa.DateTime(timezone=True), nullable=True),
+        sa.Column("paid_at", sa.DateTime(timezone=True), nullable=True),
+        sa.Column("transaction_id", sa.String(length=255), nullable=True),
+        sa.Column("last_error", sa.String(length=500), nullable=True),
+    )
+    op.create_index("ix_payout_schedules_status_due_at", "payout_schedules", ["status", "due_at"])
+    op.create_index("ix_payout_schedules_grant_program_id", "payout_schedules", ["grant_program_id"])
+
+
+def downgrade() -> None:
+    op.drop_index("ix_payout_schedules_grant_program_id", table_name="payout_schedules")
+    op.drop_index("ix_payout_schedules_status_due_at", table_name="payout_schedules")
+    op.drop_table("payout_schedules")
+    op.drop_column("grant_programs", "payout_policy")
@@ -0,0 +1,29 @@
+"""add job checkpoints
+
+Revision ID: 0013_job_checkpoints
+Revises: 0012_payout_schedules
+Create Date: 2025-04-29 00:00:00.000000
+"""
+from __future__ import annotations
+
+import sqlalchemy as sa
+from alembic import op
+
+# revision identifiers, used by Alembic.
+revision = "0013_job_checkpoints"
+down_revision = "0012_payout_schedules"
+branch_labels = None
+depends_on = None
+
+
+def upgrade() -> None:
+    op.create_table(
+        "job_checkpoints",
+        sa.Column("name", sa.String(length=100), primary_key=True),
+        sa.Column("position", sa.JSON(), nullable=False),
+        sa.Column("updated_at", sa.DateTime(timezone=True), nullable=False),
+    )
+
+
+def downgrade() -> None:
+    op.drop_table("job_checkpoints")
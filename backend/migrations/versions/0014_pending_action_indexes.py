@@ -0,0 +1,36 @@
+"""partial indexes for the pending-actions query
+
+Revision ID: 0014_pending_action_indexes
+Revises: 0013_job_checkpoints
+Create Date: 2025-05-06 00:00:00.000000
+"""
+from __future__ import annotations
+
+import sqlalchemy as sa
+from alembic import op
+
+# revision identifiers, used by Alembic.
+revision = "0014_pending_action_indexes"
+down_revision = "0013_job_checkpoints"
+branch_labels = None
+depends_on = None
+
+
+def upgrade() -> None:
+    op.create_index(
+        "ix_stages_active_program_id",
+        "stages",
+        ["grant_program_id"],
+        postgresql_where=sa.text("completion_status = 'active'"),
+    )
+    op.create_index(
+        "ix_requirements_pending_stage_id",
+        "requirements",
+        ["stage_id"],
+        postgresql_where=sa.text("status = 'pending'"),
+    )
+
+
+def downgrade() -> None:
+    op.drop_index("ix_requirements_pending_stage_id", table_name="requirements")
+    op.drop_index("ix_stages_active_program_id", table_name="stages")
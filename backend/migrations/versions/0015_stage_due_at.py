@@ -0,0 +1,31 @@
+"""add stage deadlines
+
+Revision ID: 0015_stage_due_at
+Revises: 0014_pending_action_indexes
+Create Date: 2025-05-13 00:00:00.000000
+"""
+from __future__ import annotations
+
+import sqlalchemy as sa
+from alembic import op
+
+# revision identifiers, used by Alembic.
+revision = "0015_stage_due_at"
+down_revision = "0014_pending_action_indexes"
+branch_labels = None
+depends_on = None
+
+
+def upgrade() -> None:
+    op.add_column("stages", sa.Column("due_at", sa.DateTime(timezone=True), nullable=True))
+    op.create_index(
+        "ix_stages_active_due_at",
+        "stages",
+        ["due_at"],
+        postgresql_where=sa.text("completion_status = 'active' AND due_at IS NOT NULL"),
+    )
+
+
+def downgrade() -> None:
+    op.drop_index("ix_stages_active_due_at", table_name="stages")
+    op.drop_column("stages", "due_at")
@@ -0,0 +1,43 @@
+"""add full-text search vectors to programs and requirements
+
+Revision ID: 0016_search_vectors
+Revises: 0015_stage_due_at
+Create Date: 2025-05-20 00:00:00.000000
+"""
+from __future__ import annotations
+
+from alembic import op
+
+# revision identifiers, used by Alembic.
+revision = "0016_search_vectors"
+down_revision = "0015_stage_due_at"
+branch_labels = None
+depends_on = None
+
+
+def upgrade() -> None:
+    # Generated columns are recomputed by Postgres on every write, so no trigger is needed.
+    op.execute(
+        """
+        ALTER TABLE grant_programs ADD COLUMN search_vector tsvector
+            GENERATED ALWAYS AS (to_tsvector('simple', coalesce(name, ''))) STORED
+        """
+    )
+    op.execute("CREATE INDEX ix_grant_programs_search_vector ON grant_programs USING gin (search_vector)")
+    op.execute(
+        """
+        ALTER TABLE requirements ADD COLUMN search_vector tsvector
+            GENERATED ALWAYS AS (
+                setweight(to_tsvector('simple', coalesce(name, '')), 'A')
+                || setweight(to_tsvector('simple', coalesce(description, '')), 'B')
+            ) STORED
+        """
+    )
+    op.execute("CREATE INDEX ix_requirements_search_vector ON requirements USING gin (search_vector)")
+
+
+def downgrade() -> None:
+    op.drop_index("ix_requirements_search_vector", table_name="requirements")
+    op.drop_column("requirements", "search_vector")
+    op.drop_index("ix_grant_programs_search_vector", table_name="grant_programs")
+    op.drop_column("grant_programs", "search_vector")
@@ -0,0 +1,26 @@
+"""index lowercase user emails and names for prefix lookups
+
+Revision ID: 0017_user_prefix_indexes
+Revises: 0016_search_vectors
+Create Date: 2025-05-27 00:00:00.000000
+"""
+from __future__ import annotations
+
+from alembic import op
+
+# revision identifiers, used by Alembic.
+revision = "0017_user_prefix_indexes"
+down_revision = "0016_search_vectors"
+branch_labels = None
+depends_on = None
+
+
+def upgrade() -> None:
+    # Byte-order collation, like text_pattern_ops, but the index also serves ORDER BY on the same key.
+    op.execute('CREATE INDEX ix_users_email_prefix ON users ((lower(email) COLLATE "C"))')
+    op.execute('CREATE INDEX ix_users_name_prefix ON users ((lower(name) COLLATE "C"))')
+
+
+def downgrade() -> None:
+    op.drop_index("ix_users_name_prefix", table_name="users")
+    op.drop_index("ix_users_email_prefix", table_name="users")
@@ -0,0 +1,114 @@
+"""add archive tables for completed grant programs
+
+Revision ID: 0018_program_archive
+Revises: 0017_user_prefix_indexes
+Create Date: 2025-06-03 00:00:00.000000
+"""
+from __future__ import annotations
+
+import sqlalchemy as sa
+from alembic import op
+from sqlalchemy.dialects import postgresql
+
+# revision identifiers, used by Alembic.
+revision = "0018_program_archive"
+down_revision = "0017_user_prefix_indexes"
+branch_labels = None
+depends_on = None
+
+
+def upgrade() -> None:
+    op.create_index(
+        "ix_grant_programs_completed_at",
+        "grant_programs",
+        ["completed_at"],
+        postgresql_where=sa.text("status = 'completed'"),
+    )
+
+    op.create_table(
+        "grant_programs_archive",
+        sa.Column("id", postgresql.UUID(as_uuid=True), primary_key=True, nullable=False),
+        sa.Column("name", sa.String(length=255), nullable=False),
+        sa.Column("bank_account_number", sa.String(length=64), nullable=False),
+        sa.Column("status", sa.String(length=50), nullable=False),
+        sa.Column("grantor_id", postgresql.UUID(as_uuid=True), nullable=False),
+        sa.Column("payout_policy", sa.String(length=32), nullable=False),
+        sa.Column("version", sa.Integer(), nullable=False),
+        sa.Column("total_amount", sa.Numeric(12, 2), nullable=False),
+        sa.Column("disbursed_amount", sa.Numeric(12, 2), nullable=False),
+        sa.Column("completed_stages", sa.Integer(), nullable=False),
+        sa.Column("pending_requirements", sa.Integer(), nullable=False),
+        sa.Column("confirmed_at", sa.DateTime(timezone=True), nullable=True),
+        sa.Column("completed_at", sa.DateTime(timezone=True), nullable=True),
+        sa.Column("archived_at", sa.DateTime(timezone=True), nullable=False),
+    )
+    op.create_index("ix_grant_programs_archive_grantor_id", "grant_programs_archive", ["grantor_id"])
+
+    op.create_table(
+        "stages_archive",
+        sa.Column("id", postgresql.UUID(as_uuid=True), primary_key=True, nullable=False),
+        sa.Column(
+            "grant_program_id",
+            postgresql.UUID(as_uuid=True),
+            sa.ForeignKey("grant_programs_archive.id", ondelete="CASCADE"),
+            nullable=False,
+        ),
+        sa.Column("order", sa.Integer(), nullable=False),
+        sa.Column("amount", sa.Numeric(10, 2), nullable=False),
+        sa.Column("completion_status", sa.String(length=50), nullable=False),
+        sa.Column("completed_at", sa.DateTime(timezone=True), nullable=True),
+        sa.Column("due_at", sa.DateTime(timezone=True), nullable=True),
+        sa.Column("spent_amount", sa.Numeric(10, 2), nullable=False),
+        sa.Column("version", sa.Integer(), nullable=False),
+        sa.Column("payout_bank_account_number", sa.String(length=64), nullable=True),
+        sa.Column("payout_transaction_id", sa.String(length=255), nullable=True),
+    )
+    op.create_index("ix_stages_archive_grant_program_id", "stages_archive", ["grant_program_id"])
+
+    op.create_table(
+        "requirements_archive",
+        sa.Column("id", postgresql.UUID(as_uuid=True), primary_key=True, nullable=False),
+        sa.Column(
+            "stage_id",
+            postgresql.UUID(as_uuid=True),
+            sa.ForeignKey("stages_archive.id", ondelete="CASCADE"),
+            nullable=False,
+        ),
+        sa.Column("name", sa.String(length=255), nullable=False),
+        sa.Column("description", sa.String(length=500), nullable=True),
+        sa.Column("status", sa.String(length=50), nullable=True),
+        sa.Column("proof_url", sa.String(length=500), nullable=True),
+        sa.Column("proof_submitted_by", postgresql.UUID(as_uuid=True), nullable=True),
+        sa.Column("payment_contract_id", postgresql.UUID(as_uuid=True), nullable=True),
+        sa.Column("version", sa.Integer(), nullable=False),
+    )
+    op.create_index("ix_requirements_archive_stage_id", "requirements_archive", ["stage_id"])
+
+    op.create_table(
+        "user_to_grant_archive",
+        sa.Column("id", postgresql.UUID(as_uuid=True), primary_key=True, nullable=False),
+        sa.Column("user_id", postgresql.UUID(as_uuid=True), nullable=False),
+        sa.Column(
+            "grant_program_id",
+            postgresql.UUID(as_uuid=True),
+            sa.ForeignKey("grant_programs_archive.id", ondelete="CASCADE"),
+            nullable=False,
+        ),
+        sa.Column("role", sa.String(length=50), nullable=False),
+        sa.Column("active", sa.Boolean(), nullable=True),
+    )
+    op.create_index("ix_user_to_grant_archive_user_id", "user_to_grant_archive", ["user_id"])
+    op.create_index("ix_user_to_grant_archive_grant_program_id", "user_to_grant_archive", ["grant_program_id"])
+
+
+def downgrade() -> None:
+    op.drop_index("ix_user_to_grant_archive_grant_program_id", table_name="user_to_grant_archive")
+    op.drop_index("ix_user_to_grant_archive_user_id", table_name="user_to_grant_archive")
+    op.drop_table("user_to_grant_archive")
+    op.drop_index("ix_requirements_archive_stage_id", table_name="requirements_archive")
+    op.drop_table("requirements_archive")
+    op.drop_index("ix_stages_archive_grant_program_id", table_name="stages_archive")
+    op.drop_table("stages_archive")
+    op.drop_index("ix_grant_programs_archive_grantor_id", table_name="grant_programs_archive")
+    op.drop_table("grant_programs_archive")
+    op.drop_index("ix_grant_programs_completed_at", table_name="grant_programs")
@@ -0,0 +1,41 @@
+"""add stored read-model documents for grant programs
+
+Revision ID: 0019_program_documents
+Revises: 0018_program_archive
+Create Date: 2025-06-10 00:00:00.000000
+
+Documents are serialized by the application, so existing programs are filled in by
+`python -m src.modules.grants.commands rebuild-documents` after upgrading. Until then their
+detail reads fall back to loading from the source tables.
+"""
+from __future__ import annotations
+
+import sqlalchemy as sa
+from alembic import op
+from sqlalchemy.dialects import postgresql
+
+# revision identifiers, used by Alembic.
+revision = "0019_program_documents"
+down_revision = "0018_program_archive"
+branch_labels = None
+depends_on = None
+
+
+def upgrade() -> None:
+    op.create_table(
+        "grant_program_documents",
+        sa.Column(
+            "grant_program_id",
+            postgresql.UUID(as_uuid=True),
+            sa.ForeignKey("grant_programs.id", ondelete="CASCADE"),
+            primary_key=True,
+            nullable=False,
+        ),
+        sa.Column("version", sa.Integer(), nullable=False),
+        sa.Column("document", sa.LargeBinary(), nullable=False),
+        sa.Column("updated_at", sa.DateTime(timezone=True), nullable=False),
+    )
+
+
+def downgrade() -> None:
+    op.drop_table("grant_program_documents")
@@ -0,0 +1,26 @@
+"""add idempotency keys to payout schedules
+
+Revision ID: 0020_payout_transfer_keys
+Revises: 0019_program_documents
+Create Date: 2025-06-17 00:00:00.000000
+"""
+from __future__ import annotations
+
+import sqlalchemy as sa
+from alembic import op
+
+# revision identifiers, used by Alembic.
+revision = "0020_payout_transfer_keys"
+down_revision = "0019_program_documents"
+branch_labels = None
+depends_on = None
+
+
+def upgrade() -> None:
+    op.add_column("payout_schedules", sa.Column("transfer_key", sa.String(length=128), nullable=True))
+    op.create_index("ix_payout_schedules_transfer_key", "payout_schedules", ["transfer_key"])
+
+
+def downgrade() -> None:
+    op.drop_index("ix_payout_schedules_transfer_key", table_name="payout_schedules")
+    op.drop_column("payout_schedules", "transfer_key")
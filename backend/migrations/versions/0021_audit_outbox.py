@@ -0,0 +1,29 @@
+"""add the audit event outbox
+
+Revision ID: 0021_audit_outbox
+Revises: 0020_payout_transfer_keys
+Create Date: 2025-06-18 00:00:00.000000
+"""
+from __future__ import annotations
+
+import sqlalchemy as sa
+from alembic import op
+
+# revision identifiers, used by Alembic.
+revision = "0021_audit_outbox"
+down_revision = "0020_payout_transfer_keys"
+branch_labels = None
+depends_on = None
+
+
+def upgrade() -> None:
+    op.create_table(
+        "grant_events_outbox",
+        sa.Column("id", sa.BigInteger(), primary_key=True, autoincrement=True),
+        sa.Column("events", sa.JSON(), nullable=False),
+        sa.Column("created_at", sa.DateTime(timezone=True), nullable=False),
+    )
+
+
+def downgrade() -> None:
+    op.drop_table("grant_events_outbox")
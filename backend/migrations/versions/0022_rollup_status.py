@@ -0,0 +1,82 @@
+"""split disbursement rollups by program status
+
+Revision ID: 0022_rollup_status
+Revises: 0021_audit_outbox
+Create Date: 2025-06-19 00:00:00.000000
+
+Existing buckets have no status, so the table is refilled from the transition timestamps of the hot and
+archived programs, the same way `python -m src.modules.reports.commands rebuild-rollups` does.
+"""
+from __future__ import annotations
+
+import sqlalchemy as sa
+from alembic import op
+from sqlalchemy.dialects import postgresql
+
+# revision identifiers, used by Alembic.
+revision = "0022_rollup_status"
+down_revision = "0021_audit_outbox"
+branch_labels = None
+depends_on = None
+
+MEASURES = "committed_amount, disbursed_amount, programs_confirmed, programs_completed, stages_completed"
+
+
+def _facts(programs: str, stages: str) -> str:
+    return f"""
+        SELECT CAST(date_trunc('month', confirmed_at) AS DATE) AS month, grantor_id, status,
+               total_amount AS committed, 0 AS disbursed, 1 AS confirmed, 0 AS completed, 0 AS stages
+        FROM {programs}
+        WHERE confirmed_at IS NOT NULL
+        UNION ALL
+        SELECT CAST(date_trunc('month', completed_at) AS DATE), grantor_id, status, 0, 0, 0, 1, 0
+        FROM {programs}
+        WHERE completed_at IS NOT NULL
+        UNION ALL
+        SELECT CAST(date_trunc('month', s.completed_at) AS DATE), p.grantor_id, p.status, 0, s.amount, 0, 0, 1
+        FROM {stages} s JOIN {programs} p ON p.id = s.grant_program_id
+        WHERE s.completed_at IS NOT NULL
+    """
+
+
+def _create(*key: sa.Column) -> None:
+    op.create_table(
+        "disbursement_rollups",
+        sa.Column("month", sa.Date(), primary_key=True),
+        sa.Column("grantor_id", postgresql.UUID(as_uuid=True), primary_key=True),
+        *key,
+        sa.Column("committed_amount", sa.Numeric(14, 2), nullable=False, server_default="0"),
+        sa.Column("disbursed_amount", sa.Numeric(14, 2), nullable=False, server_default="0"),
+        sa.Column("programs_confirmed", sa.Integer(), nullable=False, server_default="0"),
+        sa.Column("programs_completed", sa.Integer(), nullable=False, server_default="0"),
+        sa.Column("stages_completed", sa.Integer(), nullable=False, server_default="0"),
+    )
+
+
+def upgrade() -> None:
+    op.drop_table("disbursement_rollups")
+    _create(sa.Column("status", sa.String(length=50), primary_key=True))
+    op.execute(
+        f"""
+        INSERT INTO disbursement_rollups (month, grantor_id, status, {MEASURES})
+        SELECT month, grantor_id, status, sum(committed), sum(disbursed), sum(confirmed), sum(completed), sum(stages)
+        FROM ({_facts("grant_programs", "stages")} UNION ALL {_facts("grant_programs_archive", "stages_archive")})
+            AS facts
+        GROUP BY month, grantor_id, status
+        """
+    )
+
+
+def downgrade() -> None:
+    op.execute("CREATE TEMPORARY TABLE disbursement_rollups_by_status AS SELECT * FROM disbursement_rollups")
+    op.drop_table("disbursement_rollups")
+    _create()
+    op.execute(
+        f"""
+        INSERT INTO disbursement_rollups (month, grantor_id, {MEASURES})
+        SELECT month, grantor_id, {", ".join(f"sum({name})" for name in MEASURES.split(", "))}
+        FROM disbursement_rollups_by_status
+        GROUP BY month, grantor_id
+        """
+    )
+    op.execute("DROP TABLE disbursement_rollups_by_status")
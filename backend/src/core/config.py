@@ -17,5 +17,22 @@ class Settings(BaseSettings):
     payment_bank_api_base_url: str | None = Field(None, alias="PAYMENT_BANK_API_BASE_URL")
     app_bank_account_number: str = Field(..., alias="APP_BANK_ACCOUNT_NUMBER")
 
+    proof_storage_dir: str = Field("storage/proofs", alias="PROOF_STORAGE_DIR")
+    proof_max_bytes: int = Field(200 * 1024 * 1024, alias="PROOF_MAX_BYTES")
+
+    audit_flush_interval_seconds: float = Field(1.0, alias="AUDIT_FLUSH_INTERVAL_SECONDS")
+
+    # Immediate payouts are held until the end of this window and sent as one transfer per account; 0 disables.
+    payout_netting_window_seconds: int = Field(0, alias="PAYOUT_NETTING_WINDOW_SECONDS")
+    # A payout claimed longer ago than this without being settled is claimed again (its worker is presumed dead).
+    # Keep it well above the bank client timeout.
+    payout_claim_lease_seconds: int = Field(300, alias="PAYOUT_CLAIM_LEASE_SECONDS")
+
+    # How often each worker looks for stages that went past their deadline.
+    overdue_sweep_interval_seconds: float = Field(60.0, alias="OVERDUE_SWEEP_INTERVAL_SECONDS")
+
+    # Users allowed to read portfolio-wide reports; everyone else only sees programs they granted.
+    report_viewer_emails: list[str] = Field(default_factory=list, alias="REPORT_VIEWER_EMAILS")
+
 
 settings = Settings()
@@ -0,0 +1,24 @@
+import hashlib
+from typing import Iterable
+
+from fastapi import Request
+
+# Clients must revalidate on every use, but may keep the body and send If-None-Match.
+REVALIDATE_CACHE_CONTROL = "private, no-cache"
+
+
+def compute_etag(parts: Iterable[object]) -> str:
+    """Strong ETag over an ordered sequence of version markers (e.g. program id/version pairs)."""
+    digest = hashlib.sha1()
+    for part in parts:
+        digest.update(str(part).encode())
+        digest.update(b"\0")
+    return f'"{digest.hexdigest()}"'
+
+
+def etag_matches(request: Request, etag: str) -> bool:
+    header = request.headers.get("if-none-match")
+    if not header:
+        return False
+    candidates = {candidate.strip() for candidate in header.split(",")}
+    return "*" in candidates or etag in candidates
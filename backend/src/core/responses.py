@@ -0,0 +1,82 @@
+from pathlib import Path
+
+import anyio
+from starlette.responses import FileResponse, Response, StreamingResponse
+
+FILE_CHUNK_SIZE = 64 * 1024
+
+
+class PreserializedJSONResponse(Response):
+    """
+    JSON response for bodies that are already encoded, e.g. by a prebuilt pydantic TypeAdapter.
+    Returning it from a route also bypasses FastAPI's response_model re-validation.
+    """
+
+    media_type = "application/json"
+
+    def render(self, content: bytes) -> bytes:
+        return content
+
+
+class RangeNotSatisfiable(ValueError):
+    pass
+
+
+def parse_byte_range(header: str, size: int) -> tuple[int, int] | None:
+    """
+    Resolve a single `bytes=` range to inclusive offsets. Returns None for headers that should be ignored
+    (other units, multiple ranges), in which case the whole file is served.
+    """
+    unit, _, spec = header.partition("=")
+    if unit.strip().lower() != "bytes" or "," in spec:
+        return None
+    first, _, last = spec.strip().partition("-")
+    try:
+        if first:
+            start = int(first)
+            end = int(last) if last else size - 1
+        else:
+            start = max(size - int(last), 0)
+            end = size - 1
+    except ValueError:
+        return None
+    if start < 0 or start >= size or end < start:
+        raise RangeNotSatisfiable(header)
+    return start, min(end, size - 1)
+
+
+def file_response(
+    path: Path, range_header: str | None, media_type: str = "application/octet-stream", headers: dict | None = None
+) -> Response:
+    """
+    Serve a file honouring a single byte range. Whole-file responses go through FileResponse, which hands
+    the path to the server (`http.response.pathsend`) where supported; ranges are streamed in chunks.
+    """
+    size = path.stat().st_size
+    headers = {"Accept-Ranges": "bytes", **(headers or {})}
+    try:
+        byte_range = parse_byte_range(range_header, size) if range_header else None
+    except RangeNotSatisfiable:
+        return Response(status_code=416, headers={**headers, "Content-Range": f"bytes */{size}"})
+    if byte_range is None:
+        return FileResponse(path, media_type=media_type, headers=headers)
+
+    start, end = byte_range
+
+    async def _read_range():
+        async with await anyio.open_file(path, "rb") as file:
+            await file.seek(start)
+            remaining = end - start + 1
+            while remaining:
+                chunk = await file.read(min(FILE_CHUNK_SIZE, remaining))
+                if not chunk:
+                    break
+                remaining -= len(chunk)
+                yield chunk
+
+    return StreamingResponse(
+        _read_range(),
+        status_code=206,
+        media_type=media_type,
+        headers={**headers, "Content-Range": f"bytes {start}-{end}/{size}", "Content-Length": str(end - start + 1)},
+    )
@@ -3,12 +3,18 @@ from contextlib import asynccontextmanager
 from fastapi import FastAPI
 from fastapi.middleware.cors import CORSMiddleware
 
-from src.core.database import Base, engine
+from src.core.database import Base, SessionLocal, engine
 from src.modules.auth import router as auth_router
 from src.modules.grants import router as grants_router
+from src.modules.grants.audit import audit_log
+from src.modules.grants.deadlines import overdue_sweeper
+from src.modules.grants.events import grant_events
+from src.modules.jobs import models as jobs_models  # noqa: F401  (registers job tables for create_all)
 from src.modules.payments import router as payments_router
+from src.modules.payments.scheduler import payout_scheduler
 from src.modules.contracts import router as contracts_router
 from src.modules.payment_middleware import router as payment_middleware_router
+from src.modules.reports import router as reports_router
 
 
 @asynccontextmanager
@@ -16,7 +22,13 @@ async def lifespan(app: FastAPI):
     # Dev fallback to create tables (production should use Alembic migrations).
     async with engine.begin() as conn:
         await conn.run_sync(Base.metadata.create_all)
-    yield
+    async with (
+        grant_events.listening(engine),
+        audit_log.running(SessionLocal),
+        payout_scheduler.running(SessionLocal),
+        overdue_sweeper.running(SessionLocal),
+    ):
+        yield
 
 
 app = FastAPI(title="SmartGrant API", version="1.0.0", lifespan=lifespan)
@@ -31,6 +43,7 @@ app.add_middleware(
     allow_credentials=True,
     allow_methods=["*"],
     allow_headers=["*"],
+    expose_headers=["ETag"],
 )
 
 API_PREFIX = "/api/v1"
@@ -39,6 +52,7 @@ app.include_router(grants_router.router, prefix=API_PREFIX)
 app.include_router(payments_router.router, prefix=API_PREFIX)
 app.include_router(contracts_router.router, prefix=API_PREFIX)
 app.include_router(payment_middleware_router.router, prefix=API_PREFIX)
+app.include_router(reports_router.router, prefix=API_PREFIX)
 
 
 @app.get(f"{API_PREFIX}/health")
@@ -1,6 +1,6 @@
 import uuid
 
-from sqlalchemy import Column, String
+from sqlalchemy import Column, Index, String, func
 from sqlalchemy.dialects.postgresql import UUID
 
 from src.core.database import Base
@@ -14,3 +14,12 @@ class User(Base):
     email = Column(String(length=255), nullable=False, unique=True, index=True)
     hashed_password = Column(String(length=255), nullable=False)
     bank_id = Column(String(length=255), nullable=True)
+
+    # Prefix lookups for invitation autocomplete range-scan these; see UserRepository.search_by_prefix.
+    # Byte order ("C") on Postgres so the same index serves both the range and the ORDER BY.
+    __table_args__ = (
+        Index("ix_users_email_prefix", func.lower(email).collate("C")).ddl_if(dialect="postgresql"),
+        Index("ix_users_name_prefix", func.lower(name).collate("C")).ddl_if(dialect="postgresql"),
+        Index("ix_users_email_prefix", func.lower(email)).ddl_if(dialect="sqlite"),
+        Index("ix_users_name_prefix", func.lower(name)).ddl_if(dialect="sqlite"),
+    )
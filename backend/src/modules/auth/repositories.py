@@ -1,6 +1,8 @@
-from typing import Optional
+import sys
+from typing import Iterable, Optional
+from uuid import UUID
 
-from sqlalchemy import select
+from sqlalchemy import ColumnElement, func, select
 from sqlalchemy.ext.asyncio import AsyncSession
 
 from .models import User
@@ -14,6 +16,48 @@ class UserRepository:
         result = await self.session.execute(select(User).where(User.email == email))
         return result.scalar_one_or_none()
 
+    def normalize_prefix(self, prefix: str) -> str:
+        """
+        Lowercase `prefix` the way the database lowercases the indexed columns. SQLite's `lower()` only
+        folds ASCII, so there other characters are left as typed and match case-sensitively.
+        """
+        if self.session.bind.dialect.name == "sqlite":
+            return "".join(char.lower() if char.isascii() else char for char in prefix)
+        return prefix.lower()
+
+    async def search_by_prefix(self, prefix: str, limit: int) -> list[User]:
+        """
+        Users whose email, then name, starts with `prefix` (see `normalize_prefix`), up to `limit`. Each lookup
+        is a range scan of the matching `lower(...)` index bounded by the prefix, so the cost follows the limit
+        rather than the number of users.
+        """
+        upper = _prefix_upper_bound(prefix)
+        users: dict[UUID, User] = {}
+        for column in (User.email, User.name):
+            key = self._prefix_key(column)
+            stmt = select(User).where(key >= prefix)
+            if upper is not None:
+                stmt = stmt.where(key < upper)
+            result = await self.session.execute(stmt.order_by(key).limit(limit))
+            for user in result.scalars():
+                users.setdefault(user.id, user)
+            if len(users) >= limit:
+                break
+        return list(users.values())[:limit]
+
+    def _prefix_key(self, column) -> ColumnElement:
+        # Must match the expression of ix_users_email_prefix / ix_users_name_prefix for the dialect.
+        key = func.lower(column)
+        return key.collate("C") if self.session.bind.dialect.name == "postgresql" else key
+
+    async def list_by_emails(self, emails: Iterable[str]) -> list[User]:
+        result = await self.session.execute(select(User).where(User.email.in_(list(emails))))
+        return list(result.scalars().all())
+
+    async def list_existing_ids(self, user_ids: Iterable[UUID]) -> set[UUID]:
+        result = await self.session.execute(select(User.id).where(User.id.in_(list(user_ids))))
+        return set(result.scalars().all())
+
     async def create(self, user: User) -> User:
         self.session.add(user)
         await self.session.flush()
@@ -23,6 +67,17 @@ class UserRepository:
         result = await self.session.execute(select(User).where(User.id == user_id))
         return result.scalar_one_or_none()
 
-    async def list(self) -> list[User]:
-        result = await self.session.execute(select(User))
+    async def list(self, limit: int = 100, after_email: Optional[str] = None) -> list[User]:
+        stmt = select(User).order_by(User.email).limit(limit)
+        if after_email is not None:
+            stmt = stmt.where(User.email > after_email)
+        result = await self.session.execute(stmt)
         return list(result.scalars().all())
+
+
+def _prefix_upper_bound(prefix: str) -> Optional[str]:
+    """Smallest string greater than every string starting with `prefix`; None when there is none."""
+    stripped = prefix.rstrip(chr(sys.maxunicode))
+    if not stripped:
+        return None
+    return stripped[:-1] + chr(ord(stripped[-1]) + 1)
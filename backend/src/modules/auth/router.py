@@ -1,9 +1,11 @@
-from fastapi import APIRouter, Depends, status
+from typing import Optional
+
+from fastapi import APIRouter, Depends, Query, status
 from sqlalchemy.ext.asyncio import AsyncSession
 
 from src.core.database import get_session
 from src.core.security import get_current_user
-from .schemas import Token, UserCreate, UserLogin, UserRead
+from .schemas import Token, UserCreate, UserLogin, UserRead, UserSuggestion
 from .services import AuthService, UserService
 
 router = APIRouter(prefix="/auth", tags=["auth"])
@@ -24,3 +26,25 @@ async def login(credentials: UserLogin, session: AsyncSession = Depends(get_sess
 @router.get("/me", response_model=UserRead)
 async def read_current_user(current_user=Depends(get_current_user)) -> UserRead:
     return UserRead.model_validate(current_user)
+
+
+@router.get("/users", response_model=list[UserRead])
+async def list_users(
+    limit: int = Query(100, ge=1, le=500),
+    after: Optional[str] = Query(None, description="Return users whose email sorts after this one"),
+    session: AsyncSession = Depends(get_session),
+    current_user=Depends(get_current_user),
+) -> list[UserRead]:
+    service = UserService(session)
+    return await service.list_users(limit=limit, after_email=after)
+
+
+@router.get("/users/suggest", response_model=list[UserSuggestion])
+async def suggest_users(
+    q: str = Query(..., min_length=1, max_length=255),
+    limit: int = Query(10, ge=1, le=50),
+    session: AsyncSession = Depends(get_session),
+    current_user=Depends(get_current_user),
+) -> list[UserSuggestion]:
+    service = UserService(session)
+    return await service.suggest_users(q, limit=limit)
@@ -21,6 +21,15 @@ class UserRead(UserBase):
         from_attributes = True
 
 
+class UserSuggestion(BaseModel):
+    id: UUID
+    name: str
+    email: str
+
+    class Config:
+        from_attributes = True
+
+
 class UserLogin(BaseModel):
     email: EmailStr
     password: str
@@ -1,3 +1,5 @@
+import time
+from collections import OrderedDict
 from datetime import timedelta
 
 from fastapi import HTTPException, status
@@ -7,7 +9,46 @@ from src.core import security
 from src.core.config import settings
 from .models import User
 from .repositories import UserRepository
-from .schemas import Token, UserCreate, UserLogin, UserRead
+from .schemas import Token, UserCreate, UserLogin, UserRead, UserSuggestion
+
+MIN_SUGGEST_PREFIX = 2
+SUGGEST_CACHE_SECONDS = 30.0
+SUGGEST_CACHE_SIZE = 1024
+
+
+class SuggestionCache:
+    """
+    Short-lived per-process cache of autocomplete results, so a burst of keystrokes on a popular prefix
+    reaches the database once. Registrations clear it locally; other workers catch up within the TTL.
+    """
+
+    def __init__(self, ttl: float = SUGGEST_CACHE_SECONDS, max_size: int = SUGGEST_CACHE_SIZE):
+        self.ttl = ttl
+        self.max_size = max_size
+        self._entries: OrderedDict[tuple[str, int], tuple[float, list[UserSuggestion]]] = OrderedDict()
+
+    def get(self, key: tuple[str, int]) -> list[UserSuggestion] | None:
+        entry = self._entries.get(key)
+        if entry is None:
+            return None
+        expires_at, suggestions = entry
+        if expires_at <= time.monotonic():
+            del self._entries[key]
+            return None
+        self._entries.move_to_end(key)
+        return suggestions
+
+    def put(self, key: tuple[str, int], suggestions: list[UserSuggestion]) -> None:
+        self._entries[key] = (time.monotonic() + self.ttl, suggestions)
+        self._entries.move_to_end(key)
+        while len(self._entries) > self.max_size:
+            self._entries.popitem(last=False)
+
+    def clear(self) -> None:
+        self._entries.clear()
+
+
+suggestion_cache = SuggestionCache()
 
 
 class UserService:
@@ -30,12 +71,29 @@ class UserService:
         await self.repo.create(user)
         await self.session.commit()
         await self.session.refresh(user)
+        suggestion_cache.clear()
         return UserRead.model_validate(user)
 
-    async def list_users(self) -> list[UserRead]:
-        users = await self.repo.list()
+    async def list_users(self, limit: int = 100, after_email: str | None = None) -> list[UserRead]:
+        users = await self.repo.list(limit=limit, after_email=after_email)
         return [UserRead.model_validate(u) for u in users]
 
+    async def suggest_users(self, query: str, limit: int = 10) -> list[UserSuggestion]:
+        prefix = self.repo.normalize_prefix(query.strip())
+        if len(prefix) < MIN_SUGGEST_PREFIX:
+            raise HTTPException(
+                status_code=status.HTTP_400_BAD_REQUEST,
+                detail=f"Query must be at least {MIN_SUGGEST_PREFIX} characters",
+            )
+        key = (prefix, limit)
+        cached = suggestion_cache.get(key)
+        if cached is not None:
+            return cached
+        users = await self.repo.search_by_prefix(prefix, limit)
+        suggestions = [UserSuggestion.model_validate(user) for user in users]
+        suggestion_cache.put(key, suggestions)
+        return suggestions
+
 
 class AuthService:
     def __init__(self, session: AsyncSession):
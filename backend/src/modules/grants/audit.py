@@ -0,0 +1,133 @@
+"""
+Batched writer for the `grant_events` audit log.
+
+Services call `audit_log.stage` before committing, which adds one `grant_events_outbox` row holding the
+transaction's events, so the audit trail commits or rolls back with the change and survives a crash.
+After the commit `audit_log.notify` wakes a background task started with the app. It copies outbox rows
+to `grant_events` in multi-row INSERTs and keeps going without pausing until the outbox is empty. It then
+waits for the next notification, or for the flush interval to pick up rows committed by other processes.
+"""
+import asyncio
+import logging
+from contextlib import asynccontextmanager
+from datetime import datetime, timezone
+from typing import AsyncIterator, Optional, Sequence
+from uuid import UUID
+
+from sqlalchemy import delete, insert, select
+from sqlalchemy.ext.asyncio import AsyncSession, async_sessionmaker
+
+from src.core.config import settings
+from .events import GrantEvent
+from .models import GrantAuditEvent, GrantAuditOutbox
+
+logger = logging.getLogger(__name__)
+
+# Outbox rows copied per INSERT; each holds the events of one commit.
+MAX_BATCH_SIZE = 1000
+
+
+class AuditLogWriter:
+    def __init__(self, flush_interval: float | None = None, max_batch: int = MAX_BATCH_SIZE):
+        self.flush_interval = settings.audit_flush_interval_seconds if flush_interval is None else flush_interval
+        self.max_batch = max_batch
+        self._wakeup = asyncio.Event()
+        self._session_factory: Optional[async_sessionmaker[AsyncSession]] = None
+        self._task: Optional[asyncio.Task] = None
+
+    async def stage(self, session: AsyncSession, events: Sequence[GrantEvent]) -> None:
+        """Add `events` to the outbox in the caller's transaction."""
+        if not events:
+            return
+        rows = [
+            {
+                "grant_program_id": str(event.grant_program_id),
+                "kind": event.kind,
+                "actor_id": None if event.actor_id is None else str(event.actor_id),
+                "payload": event.data,
+            }
+            for event in events
+        ]
+        await session.execute(insert(GrantAuditOutbox).values(events=rows, created_at=datetime.now(timezone.utc)))
+
+    def notify(self) -> None:
+        """Wake the writer after a commit that staged events."""
+        self._wakeup.set()
+
+    @asynccontextmanager
+    async def running(self, session_factory: async_sessionmaker[AsyncSession]) -> AsyncIterator["AuditLogWriter"]:
+        self._session_factory = session_factory
+        self._task = asyncio.create_task(self._run())
+        try:
+            yield self
+        finally:
+            self._task.cancel()
+            try:
+                await self._task
+            except asyncio.CancelledError:
+                pass
+            await self.flush()
+            self._session_factory = None
+            self._task = None
+
+    async def flush(self) -> int:
+        """Copy the whole outbox to `grant_events`; returns the number of events written."""
+        written = 0
+        while True:
+            batch = await self._write_batch()
+            if batch is None:
+                return written
+            written += batch
+
+    async def _run(self) -> None:
+        while True:
+            # Cleared before draining, so a commit landing mid-drain triggers another pass.
+            self._wakeup.clear()
+            await self.flush()
+            try:
+                await asyncio.wait_for(self._wakeup.wait(), self.flush_interval)
+            except asyncio.TimeoutError:
+                pass
+
+    async def _write_batch(self) -> Optional[int]:
+        """Move up to `max_batch` outbox rows to `grant_events`; None once the outbox is empty or unreachable."""
+        if self._session_factory is None:
+            return None
+        try:
+            async with self._session_factory() as session:
+                # Writers in other processes wait here instead of skipping ahead, so ids follow commit order.
+                outbox = (
+                    await session.execute(
+                        select(GrantAuditOutbox)
+                        .order_by(GrantAuditOutbox.id)
+                        .limit(self.max_batch)
+                        .with_for_update()
+                    )
+                ).scalars().all()
+                if not outbox:
+                    return None
+                rows = [
+                    {
+                        "grant_program_id": UUID(event["grant_program_id"]),
+                        "kind": event["kind"],
+                        "actor_id": None if event["actor_id"] is None else UUID(event["actor_id"]),
+                        "payload": event["payload"],
+                        "created_at": entry.created_at,
+                    }
+                    for entry in outbox
+                    for event in entry.events
+                ]
+                if rows:
+                    await session.execute(insert(GrantAuditEvent), rows)
+                await session.execute(
+                    delete(GrantAuditOutbox).where(GrantAuditOutbox.id.in_([entry.id for entry in outbox]))
+                )
+                await session.commit()
+        except Exception:
+            # Rows stay in the outbox and are retried on the next pass.
+            logger.exception("Failed to copy audit events from the outbox")
+            return None
+        return len(rows)
+
+
+audit_log = AuditLogWriter()
@@ -0,0 +1,139 @@
+"""
+Admin commands for the grants module.
+
+    python -m src.modules.grants.commands verify-counters
+    python -m src.modules.grants.commands recompute-counters
+    python -m src.modules.grants.commands archive-events --older-than-days 365
+    python -m src.modules.grants.commands sweep-overdue
+    python -m src.modules.grants.commands archive-programs --older-than-days 180
+    python -m src.modules.grants.commands rebuild-documents
+"""
+import argparse
+import asyncio
+import sys
+from datetime import datetime, timedelta, timezone
+
+from sqlalchemy.ext.asyncio import AsyncSession, async_sessionmaker
+
+from src.core.database import SessionLocal
+from .deadlines import overdue_sweeper
+from .repositories import GrantRepository
+
+
+async def verify_counters(session_factory: async_sessionmaker[AsyncSession] = SessionLocal) -> int:
+    async with session_factory() as session:
+        drift = await GrantRepository(session).find_counter_drift()
+    for grant_program_id, diffs in drift:
+        details = ", ".join(f"{name}: stored={old} expected={new}" for name, (old, new) in diffs.items())
+        print(f"{grant_program_id}: {details}")
+    print(f"{len(drift)} program(s) with counter drift")
+    return len(drift)
+
+
+async def recompute_counters(session_factory: async_sessionmaker[AsyncSession] = SessionLocal) -> int:
+    async with session_factory() as session:
+        repo = GrantRepository(session)
+        drift = await repo.find_counter_drift()
+        ids = [grant_program_id for grant_program_id, _ in drift]
+        updated = await repo.recompute_counters(ids)
+        await repo.refresh_documents(ids)
+        await session.commit()
+    print(f"Recomputed counters for {updated} program(s)")
+    return updated
+
+
+async def archive_events(
+    older_than_days: int, batch_size: int = 5000, session_factory: async_sessionmaker[AsyncSession] = SessionLocal
+) -> int:
+    """Move audit events older than the cutoff to grant_events_archive, one committed batch at a time."""
+    cutoff = datetime.now(timezone.utc) - timedelta(days=older_than_days)
+    archived = 0
+    while True:
+        async with session_factory() as session:
+            moved = await GrantRepository(session).archive_events(cutoff, batch_size)
+            await session.commit()
+        if not moved:
+            break
+        archived += moved
+    print(f"Archived {archived} audit event(s) older than {cutoff.isoformat()}")
+    return archived
+
+
+async def archive_programs(
+    older_than_days: int, batch_size: int = 500, session_factory: async_sessionmaker[AsyncSession] = SessionLocal
+) -> int:
+    """Move programs completed before the cutoff to the archive tables, one committed batch at a time."""
+    cutoff = datetime.now(timezone.utc) - timedelta(days=older_than_days)
+    archived = 0
+    while True:
+        async with session_factory() as session:
+            moved = await GrantRepository(session).archive_programs(cutoff, batch_size)
+            await session.commit()
+        if not moved:
+            break
+        archived += moved
+    print(f"Archived {archived} program(s) completed before {cutoff.isoformat()}")
+    return archived
+
+
+async def rebuild_documents(
+    batch_size: int = 500, session_factory: async_sessionmaker[AsyncSession] = SessionLocal
+) -> int:
+    """Regenerate the stored program documents from the source tables, one committed batch at a time."""
+    rebuilt = 0
+    after = None
+    while True:
+        async with session_factory() as session:
+            repo = GrantRepository(session)
+            ids = await repo.list_program_ids(after, batch_size)
+            if not ids:
+                break
+            rebuilt += await repo.refresh_documents(ids)
+            await session.commit()
+        after = ids[-1]
+    print(f"Rebuilt {rebuilt} program document(s)")
+    return rebuilt
+
+
+async def sweep_overdue(session_factory: async_sessionmaker[AsyncSession] = SessionLocal) -> int:
+    reported = await overdue_sweeper.sweep(session_factory)
+    print(f"Reported {reported} newly overdue stage(s)")
+    return reported
+
+
+def main(argv: list[str] | None = None) -> int:
+    parser = argparse.ArgumentParser(prog="python -m src.modules.grants.commands")
+    subcommands = parser.add_subparsers(dest="command", required=True)
+    subcommands.add_parser("verify-counters", help="Report programs whose progress counters drifted (exit 1 if any)")
+    subcommands.add_parser("recompute-counters", help="Rewrite drifted progress counters from stages and requirements")
+    archive = subcommands.add_parser("archive-events", help="Move old audit events to grant_events_archive")
+    archive.add_argument("--older-than-days", type=int, default=365)
+    archive.add_argument("--batch-size", type=int, default=5000)
+    programs = subcommands.add_parser("archive-programs", help="Move long-completed programs to the archive tables")
+    programs.add_argument("--older-than-days", type=int, default=180)
+    programs.add_argument("--batch-size", type=int, default=500)
+    documents = subcommands.add_parser("rebuild-documents", help="Regenerate the stored program read model")
+    documents.add_argument("--batch-size", type=int, default=500)
+    subcommands.add_parser("sweep-overdue", help="Emit stage.overdue for stages past their deadline since the last sweep")
+    args = parser.parse_args(argv)
+
+    if args.command == "verify-counters":
+        return 1 if asyncio.run(verify_counters()) else 0
+    if args.command == "archive-programs":
+        asyncio.run(archive_programs(args.older_than_days, args.batch_size))
+        return 0
+    if args.command == "rebuild-documents":
+        asyncio.run(rebuild_documents(args.batch_size))
+        return 0
+    if args.command == "sweep-overdue":
+        asyncio.run(sweep_overdue())
+        return 0
+    if args.command == "archive-events":
+        asyncio.run(archive_events(args.older_than_days, args.batch_size))
+        return 0
+    asyncio.run(recompute_counters())
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,116 @@
+"""
+Overdue detection for stage deadlines.
+
+`OverdueSweeper.sweep` walks the active stages whose `due_at` passed since the previous sweep, in
+`(due_at, id)` order over the partial index `ix_stages_active_due_at`, and emits a `stage.overdue` event
+for each. The position reached is kept in `job_checkpoints` (`stage_overdue`) and saved in the transaction
+that stages the events, so a sweep costs a range scan over the deadlines that passed since the last one,
+however many stages exist. The checkpoint row is locked for the batch: workers running the sweeper take
+turns instead of reporting the same stages twice.
+
+A stage activated after the sweeper already went past its deadline is reported by GrantService when it
+is activated (see `swept_past`).
+"""
+import asyncio
+import logging
+from contextlib import asynccontextmanager
+from datetime import datetime, timezone
+from typing import AsyncIterator, Optional
+from uuid import UUID
+
+from sqlalchemy.ext.asyncio import AsyncSession, async_sessionmaker
+
+from src.core.config import settings
+from src.modules.jobs.repositories import JobCheckpointRepository
+from .audit import audit_log
+from .events import GrantEvent, grant_events
+from .repositories import GrantRepository
+
+logger = logging.getLogger(__name__)
+
+CHECKPOINT_NAME = "stage_overdue"
+SWEEP_BATCH_SIZE = 500
+
+
+def overdue_event(grant_program_id: UUID, stage_id: UUID, order: int, due_at: datetime) -> GrantEvent:
+    return GrantEvent(
+        "stage.overdue",
+        grant_program_id,
+        {"stage_id": str(stage_id), "order": order, "due_at": _as_utc(due_at).isoformat()},
+    )
+
+
+async def swept_past(session: AsyncSession, stage_id: UUID, due_at: datetime) -> bool:
+    """True if the deadline has passed and the sweeper's checkpoint is beyond it, so it will not report the stage."""
+    due_at = _as_utc(due_at)
+    if due_at > datetime.now(timezone.utc):
+        return False
+    position = _position(await JobCheckpointRepository(session).get(CHECKPOINT_NAME))
+    return position is not None and (due_at, stage_id) <= position
+
+
+class OverdueSweeper:
+    def __init__(self, interval: float | None = None, batch_size: int = SWEEP_BATCH_SIZE):
+        self.interval = settings.overdue_sweep_interval_seconds if interval is None else interval
+        self.batch_size = batch_size
+        self._task: Optional[asyncio.Task] = None
+
+    @asynccontextmanager
+    async def running(self, session_factory: async_sessionmaker[AsyncSession]) -> AsyncIterator["OverdueSweeper"]:
+        self._task = asyncio.create_task(self._run(session_factory))
+        try:
+            yield self
+        finally:
+            self._task.cancel()
+            try:
+                await self._task
+            except asyncio.CancelledError:
+                pass
+            self._task = None
+
+    async def sweep(self, session_factory: async_sessionmaker[AsyncSession], now: datetime | None = None) -> int:
+        """Report every stage that went overdue since the last sweep; returns the number reported."""
+        now = now or datetime.now(timezone.utc)
+        reported = 0
+        while True:
+            async with session_factory() as session:
+                checkpoints = JobCheckpointRepository(session)
+                after = _position(await checkpoints.get(CHECKPOINT_NAME, lock=True))
+                rows = await GrantRepository(session).list_newly_overdue(now, after, self.batch_size)
+                if not rows:
+                    break
+                events = [overdue_event(row.grant_program_id, row.id, row.order, row.due_at) for row in rows]
+                last = rows[-1]
+                await checkpoints.save(
+                    CHECKPOINT_NAME, {"due_at": _as_utc(last.due_at).isoformat(), "stage_id": str(last.id)}
+                )
+                await audit_log.stage(session, await grant_events.stage(session, events))
+                await session.commit()
+            grant_events.dispatch(events)
+            audit_log.notify()
+            reported += len(rows)
+            if len(rows) < self.batch_size:
+                break
+        return reported
+
+    async def _run(self, session_factory: async_sessionmaker[AsyncSession]) -> None:
+        while True:
+            try:
+                await self.sweep(session_factory)
+            except Exception:
+                logger.exception("Overdue stage sweep failed")
+            await asyncio.sleep(self.interval)
+
+
+def _position(raw: Optional[dict]) -> Optional[tuple[datetime, UUID]]:
+    if raw is None:
+        return None
+    return _as_utc(datetime.fromisoformat(raw["due_at"])), UUID(raw["stage_id"])
+
+
+def _as_utc(value: datetime) -> datetime:
+    # SQLite hands back naive datetimes for timezone-aware columns.
+    return value.replace(tzinfo=timezone.utc) if value.tzinfo is None else value.astimezone(timezone.utc)
+
+
+overdue_sweeper = OverdueSweeper()
@@ -0,0 +1,265 @@
+"""
+In-process pub/sub for grant state changes, served to participants over server-sent events.
+
+A subscription follows the programs its user could see when it connected; membership events carry the
+program's new audience so subscriptions join or leave programs without reconnecting. Every connection
+has its own bounded queue, and a slow client loses its oldest events instead of growing memory.
+
+On Postgres, events are sent with NOTIFY inside the writing transaction and every worker re-publishes
+what it hears on the channel, so subscribers on any worker see every commit and nothing that rolled back.
+NOTIFY payloads must stay under 8000 bytes. An event too large for that (a membership change on a big
+program, a large bulk invite) is written to `grant_events` in the same transaction and announced by id;
+listeners load it from there and take the audience from the program's active memberships.
+"""
+import asyncio
+import json
+import logging
+from collections import defaultdict
+from contextlib import asynccontextmanager, contextmanager
+from datetime import datetime, timezone
+from typing import Any, AsyncIterator, Iterable, Iterator, NamedTuple, Optional, Sequence
+from uuid import UUID
+
+from sqlalchemy import bindparam, insert, select, text
+from sqlalchemy.dialects.postgresql import ARRAY
+from sqlalchemy.exc import SQLAlchemyError
+from sqlalchemy.ext.asyncio import AsyncEngine, AsyncSession
+from sqlalchemy.types import Text
+
+from .models import GrantAuditEvent, UserToGrant
+
+logger = logging.getLogger(__name__)
+
+NOTIFY_CHANNEL = "grant_events"
+# Postgres rejects payloads of 8000 bytes or more; larger events are sent by reference.
+MAX_NOTIFY_PAYLOAD_BYTES = 7900
+SUBSCRIBER_QUEUE_SIZE = 100
+HEARTBEAT_SECONDS = 15
+
+
+class GrantEvent(NamedTuple):
+    kind: str
+    grant_program_id: UUID
+    data: dict[str, Any]
+    # Set on membership changes: the users who can see the program after the change.
+    audience: Optional[frozenset[UUID]] = None
+    actor_id: Optional[UUID] = None
+
+    def to_json(self) -> str:
+        return json.dumps(
+            {
+                "kind": self.kind,
+                "grant_program_id": str(self.grant_program_id),
+                "data": self.data,
+                "audience": None if self.audience is None else [str(user_id) for user_id in self.audience],
+                "actor_id": None if self.actor_id is None else str(self.actor_id),
+            }
+        )
+
+    @classmethod
+    def from_json(cls, raw: str) -> "GrantEvent":
+        payload = json.loads(raw)
+        audience = payload["audience"]
+        actor_id = payload.get("actor_id")
+        return cls(
+            kind=payload["kind"],
+            grant_program_id=UUID(payload["grant_program_id"]),
+            data=payload["data"],
+            audience=None if audience is None else frozenset(UUID(user_id) for user_id in audience),
+            actor_id=None if actor_id is None else UUID(actor_id),
+        )
+
+    def to_sse(self) -> bytes:
+        body = json.dumps({"grant_program_id": str(self.grant_program_id), **self.data})
+        return f"event: {self.kind}\ndata: {body}\n\n".encode()
+
+
+class Subscription:
+    def __init__(self, user_id: UUID, queue_size: int):
+        self.user_id = user_id
+        self.queue: asyncio.Queue[GrantEvent] = asyncio.Queue(maxsize=queue_size)
+        self.program_ids: set[UUID] = set()
+
+    def deliver(self, event: GrantEvent) -> None:
+        if self.queue.full():
+            self.queue.get_nowait()
+        self.queue.put_nowait(event)
+
+
+class GrantEventBroker:
+    def __init__(self, queue_size: int = SUBSCRIBER_QUEUE_SIZE):
+        self.queue_size = queue_size
+        self._by_program: dict[UUID, set[Subscription]] = defaultdict(set)
+        self._by_user: dict[UUID, set[Subscription]] = defaultdict(set)
+        # Set while a database listener is running; commits are then delivered through NOTIFY only.
+        self._listening = False
+
+    @contextmanager
+    def subscribe(self, user_id: UUID, program_ids: Iterable[UUID]) -> Iterator[Subscription]:
+        subscription = Subscription(user_id, self.queue_size)
+        self._by_user[user_id].add(subscription)
+        for program_id in program_ids:
+            self._follow(subscription, program_id)
+        try:
+            yield subscription
+        finally:
+            for program_id in list(subscription.program_ids):
+                self._unfollow(subscription, program_id)
+            self._discard(self._by_user, user_id, subscription)
+
+    async def stream(
+        self, user_id: UUID, program_ids: Iterable[UUID], heartbeat: float = HEARTBEAT_SECONDS
+    ) -> AsyncIterator[bytes]:
+        """Server-sent event frames for one connection; comments keep idle proxies from closing it."""
+        with self.subscribe(user_id, program_ids) as subscription:
+            yield b": connected\n\n"
+            while True:
+                try:
+                    event = await asyncio.wait_for(subscription.queue.get(), heartbeat)
+                except asyncio.TimeoutError:
+                    yield b": keepalive\n\n"
+                    continue
+                yield event.to_sse()
+
+    def publish(self, event: GrantEvent) -> None:
+        program_id = event.grant_program_id
+        if event.audience is not None:
+            for user_id in event.audience:
+                for subscription in self._by_user.get(user_id, ()):
+                    self._follow(subscription, program_id)
+        for subscription in list(self._by_program.get(program_id, ())):
+            subscription.deliver(event)
+            if event.audience is not None and subscription.user_id not in event.audience:
+                self._unfollow(subscription, program_id)
+
+    async def stage(self, session: AsyncSession, events: Sequence[GrantEvent]) -> list[GrantEvent]:
+        """
+        Queue events in the current transaction; Postgres only delivers them if it commits. Returns the events
+        still to hand to the audit log: the ones sent by reference were already written to it here.
+        """
+        if not events or session.bind.dialect.name != "postgresql":
+            return list(events)
+        payloads, unrecorded = await self._notify_payloads(session, events)
+        await session.execute(
+            text("SELECT pg_notify(:channel, payload) FROM unnest(:payloads) AS payload").bindparams(
+                bindparam("payloads", type_=ARRAY(Text))
+            ),
+            {"channel": NOTIFY_CHANNEL, "payloads": payloads},
+        )
+        return unrecorded
+
+    async def _notify_payloads(
+        self, session: AsyncSession, events: Sequence[GrantEvent]
+    ) -> tuple[list[str], list[GrantEvent]]:
+        """NOTIFY payloads for `events`, writing the oversized ones to `grant_events` and referencing their id."""
+        payloads: list[str] = []
+        unrecorded: list[GrantEvent] = []
+        for event in events:
+            payload = event.to_json()
+            if len(payload.encode()) < MAX_NOTIFY_PAYLOAD_BYTES:
+                payloads.append(payload)
+                unrecorded.append(event)
+                continue
+            event_id = await session.scalar(
+                insert(GrantAuditEvent)
+                .values(
+                    grant_program_id=event.grant_program_id,
+                    kind=event.kind,
+                    actor_id=event.actor_id,
+                    payload=event.data,
+                    created_at=datetime.now(timezone.utc),
+                )
+                .returning(GrantAuditEvent.id)
+            )
+            payloads.append(json.dumps({"event_id": event_id, "membership": event.audience is not None}))
+        return payloads, unrecorded
+
+    async def _load_event(self, engine: AsyncEngine, payload: str) -> Optional[GrantEvent]:
+        """The event a NOTIFY payload describes, loading it from `grant_events` when it was sent by reference."""
+        reference = json.loads(payload)
+        if "event_id" not in reference:
+            return GrantEvent.from_json(payload)
+        audit = GrantAuditEvent.__table__
+        async with engine.connect() as conn:
+            row = (await conn.execute(select(audit).where(audit.c.id == reference["event_id"]))).one_or_none()
+            if row is None:
+                logger.warning("Grant event %s announced but not found", reference["event_id"])
+                return None
+            audience = None
+            if reference["membership"]:
+                members = await conn.execute(
+                    select(UserToGrant.user_id).where(
+                        UserToGrant.grant_program_id == row.grant_program_id, UserToGrant.active.is_(True)
+                    )
+                )
+                audience = frozenset(members.scalars().all())
+        return GrantEvent(row.kind, row.grant_program_id, row.payload, audience, row.actor_id)
+
+    def dispatch(self, events: Sequence[GrantEvent]) -> None:
+        """Publish committed events locally unless the database listener will deliver them."""
+        if self._listening:
+            return
+        for event in events:
+            self.publish(event)
+
+    @asynccontextmanager
+    async def listening(self, engine: AsyncEngine) -> AsyncIterator[None]:
+        if engine.dialect.name != "postgresql":
+            yield
+            return
+
+        # Notifications are relayed in arrival order, including the ones that need a lookup.
+        received: asyncio.Queue[str] = asyncio.Queue()
+
+        def _on_notify(_connection, _pid, _channel, payload: str) -> None:
+            received.put_nowait(payload)
+
+        async def _relay() -> None:
+            while True:
+                payload = await received.get()
+                try:
+                    event = await self._load_event(engine, payload)
+                except (ValueError, KeyError):
+                    logger.warning("Ignoring malformed grant event: %s", payload)
+                    continue
+                except SQLAlchemyError:
+                    logger.exception("Could not load grant event %s", payload)
+                    continue
+                if event is not None:
+                    self.publish(event)
+
+        async with engine.connect() as conn:
+            raw = await conn.get_raw_connection()
+            driver_connection = raw.driver_connection
+            await driver_connection.add_listener(NOTIFY_CHANNEL, _on_notify)
+            self._listening = True
+            relay = asyncio.create_task(_relay())
+            try:
+                yield
+            finally:
+                self._listening = False
+                relay.cancel()
+                try:
+                    await relay
+                except asyncio.CancelledError:
+                    pass
+                await driver_connection.remove_listener(NOTIFY_CHANNEL, _on_notify)
+
+    def _follow(self, subscription: Subscription, program_id: UUID) -> None:
+        subscription.program_ids.add(program_id)
+        self._by_program[program_id].add(subscription)
+
+    def _unfollow(self, subscription: Subscription, program_id: UUID) -> None:
+        subscription.program_ids.discard(program_id)
+        self._discard(self._by_program, program_id, subscription)
+
+    @staticmethod
+    def _discard(index: dict[UUID, set[Subscription]], key: UUID, subscription: Subscription) -> None:
+        subscriptions = index.get(key)
+        if subscriptions is not None:
+            subscriptions.discard(subscription)
+            if not subscriptions:
+                del index[key]
+
+
+grant_events = GrantEventBroker()
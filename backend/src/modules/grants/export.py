@@ -0,0 +1,171 @@
+"""
+Streaming export of the grant portfolio visible to a user.
+
+Rows are read with server-side cursors (`yield_per`) and encoded one partition at a time, so memory
+stays flat regardless of how many programs, stages and requirements are exported.
+"""
+import csv
+import io
+import json
+from decimal import Decimal
+from typing import AsyncIterator, Literal
+from uuid import UUID
+
+from sqlalchemy import Select, select
+from sqlalchemy.ext.asyncio import AsyncSession, async_sessionmaker
+
+from src.modules.auth.models import User
+from .models import GrantProgram, Requirement, Stage, UserToGrant
+from .repositories import GrantRepository
+
+ExportFormat = Literal["ndjson", "csv"]
+
+EXPORT_BATCH_SIZE = 1000
+
+CSV_COLUMNS = [
+    "grant_program_id",
+    "grant_program_name",
+    "grant_program_status",
+    "bank_account_number",
+    "stage_id",
+    "stage_order",
+    "stage_amount",
+    "stage_status",
+    "requirement_id",
+    "requirement_name",
+    "requirement_status",
+    "proof_url",
+]
+
+
+class GrantExporter:
+    def __init__(self, session_factory: async_sessionmaker[AsyncSession], user_id: UUID):
+        self.session_factory = session_factory
+        self.user_id = user_id
+
+    def media_type(self, export_format: ExportFormat) -> str:
+        return "text/csv" if export_format == "csv" else "application/x-ndjson"
+
+    def stream(self, export_format: ExportFormat) -> AsyncIterator[bytes]:
+        return self.iter_csv() if export_format == "csv" else self.iter_ndjson()
+
+    async def iter_ndjson(self) -> AsyncIterator[bytes]:
+        """One JSON object per line, tagged with `type`: programs, then stages, requirements and participants."""
+        visible = self._visible_program_ids()
+        queries: list[tuple[str, Select]] = [
+            (
+                "program",
+                select(
+                    GrantProgram.id,
+                    GrantProgram.name,
+                    GrantProgram.bank_account_number,
+                    GrantProgram.status,
+                    GrantProgram.grantor_id,
+                    GrantProgram.total_amount,
+                    GrantProgram.disbursed_amount,
+                    GrantProgram.completed_stages,
+                    GrantProgram.pending_requirements,
+                )
+                .where(GrantProgram.id.in_(visible))
+                .order_by(GrantProgram.id),
+            ),
+            (
+                "stage",
+                select(Stage.id, Stage.grant_program_id, Stage.order, Stage.amount, Stage.completion_status)
+                .where(Stage.grant_program_id.in_(visible))
+                .order_by(Stage.grant_program_id, Stage.order),
+            ),
+            (
+                "requirement",
+                select(
+                    Requirement.id,
+                    Requirement.stage_id,
+                    Stage.grant_program_id,
+                    Requirement.name,
+                    Requirement.description,
+                    Requirement.status,
+                    Requirement.proof_url,
+                    Requirement.proof_submitted_by,
+                )
+                .join(Stage, Stage.id == Requirement.stage_id)
+                .where(Stage.grant_program_id.in_(visible))
+                .order_by(Stage.grant_program_id, Requirement.stage_id, Requirement.id),
+            ),
+            (
+                "participant",
+                select(
+                    UserToGrant.id,
+                    UserToGrant.grant_program_id,
+                    UserToGrant.user_id,
+                    UserToGrant.role,
+                    UserToGrant.active,
+                    User.email,
+                    User.name,
+                )
+                .join(User, User.id == UserToGrant.user_id)
+                .where(UserToGrant.grant_program_id.in_(visible))
+                .order_by(UserToGrant.grant_program_id, UserToGrant.id),
+            ),
+        ]
+        async with self.session_factory() as session:
+            for record_type, stmt in queries:
+                async for rows in self._partitions(session, stmt):
+                    yield b"".join(
+                        json.dumps({"type": record_type, **row._asdict()}, default=_encode_value).encode() + b"\n"
+                        for row in rows
+                    )
+
+    async def iter_csv(self) -> AsyncIterator[bytes]:
+        """One row per requirement, with its stage and program; stages without requirements get one row."""
+        stmt = (
+            select(
+                GrantProgram.id,
+                GrantProgram.name,
+                GrantProgram.status,
+                GrantProgram.bank_account_number,
+                Stage.id,
+                Stage.order,
+                Stage.amount,
+                Stage.completion_status,
+                Requirement.id,
+                Requirement.name,
+                Requirement.status,
+                Requirement.proof_url,
+            )
+            .join(Stage, Stage.grant_program_id == GrantProgram.id)
+            .outerjoin(Requirement, Requirement.stage_id == Stage.id)
+            .where(GrantProgram.id.in_(self._visible_program_ids()))
+            .order_by(GrantProgram.id, Stage.order, Requirement.id)
+        )
+        buffer = io.StringIO()
+        writer = csv.writer(buffer)
+        writer.writerow(CSV_COLUMNS)
+        yield _drain(buffer)
+        async with self.session_factory() as session:
+            async for rows in self._partitions(session, stmt):
+                writer.writerows(["" if value is None else _encode_value(value) for value in row] for row in rows)
+                yield _drain(buffer)
+
+    def _visible_program_ids(self) -> Select:
+        # Never correlate: the export queries select from the same tables the visibility filter joins.
+        return GrantRepository._visible_to(select(GrantProgram.id), self.user_id, None).correlate(None)
+
+    @staticmethod
+    async def _partitions(session: AsyncSession, stmt: Select):
+        result = await session.stream(stmt.execution_options(yield_per=EXPORT_BATCH_SIZE))
+        async for rows in result.partitions():
+            yield rows
+
+
+def _encode_value(value):
+    # Amounts are exported as exact decimal strings rather than floats.
+    if isinstance(value, (UUID, Decimal)):
+        return str(value)
+    return value
+
+
+def _drain(buffer: io.StringIO) -> bytes:
+    data = buffer.getvalue().encode()
+    buffer.seek(0)
+    buffer.truncate()
+    return data
@@ -1,7 +1,22 @@
 import uuid
+from datetime import datetime, timezone
 from typing import List, Optional
 
-from sqlalchemy import Boolean, Column, ForeignKey, Integer, Numeric, String, UniqueConstraint
+from sqlalchemy import (
+    JSON,
+    BigInteger,
+    Boolean,
+    Column,
+    DateTime,
+    ForeignKey,
+    Index,
+    Integer,
+    LargeBinary,
+    Numeric,
+    String,
+    UniqueConstraint,
+    text,
+)
 from sqlalchemy.dialects.postgresql import UUID
 from sqlalchemy.orm import Mapped, mapped_column, relationship
 
@@ -11,12 +26,36 @@ from src.modules.auth.models import User
 
 class GrantProgram(Base):
     __tablename__ = "grant_programs"
+    __table_args__ = (
+        # Candidates for `commands archive-programs`.
+        Index(
+            "ix_grant_programs_completed_at",
+            "completed_at",
+            postgresql_where=text("status = 'completed'"),
+            sqlite_where=text("status = 'completed'"),
+        ),
+    )
 
     id = Column(UUID(as_uuid=True), primary_key=True, default=uuid.uuid4)
     name = Column(String(length=255), nullable=False)
     bank_account_number = Column(String(length=64), nullable=False)
     status = Column(String(length=50), default="draft", nullable=False)
     grantor_id = Column(UUID(as_uuid=True), ForeignKey("users.id", ondelete="CASCADE"), nullable=False)
+    # `immediate` pays a stage when it completes (or at the end of the netting window); `next_month` schedules it for the 1st of the following month.
+    payout_policy = Column(String(length=32), nullable=False, default="immediate", server_default="immediate")
+    version = Column(Integer, nullable=False, server_default="1")
+
+    # Progress counters maintained by GrantService transitions; `commands recompute-counters` repairs drift.
+    total_amount = Column(Numeric(12, 2), nullable=False, default=0, server_default="0")
+    disbursed_amount = Column(Numeric(12, 2), nullable=False, default=0, server_default="0")
+    completed_stages = Column(Integer, nullable=False, default=0, server_default="0")
+    pending_requirements = Column(Integer, nullable=False, default=0, server_default="0")
+
+    # Transition timestamps; reporting rollups are rebuilt from them.
+    confirmed_at = Column(DateTime(timezone=True), nullable=True)
+    completed_at = Column(DateTime(timezone=True), nullable=True)
+
+    __mapper_args__ = {"version_id_col": version}
 
     stages: Mapped[List["Stage"]] = relationship(
         "Stage", back_populates="grant_program", cascade="all, delete-orphan", order_by="Stage.order"
@@ -28,12 +67,35 @@ class GrantProgram(Base):
 
 class Stage(Base):
     __tablename__ = "stages"
+    __table_args__ = (
+        # Active stages per program; the pending-actions join only ever visits these.
+        Index(
+            "ix_stages_active_program_id",
+            "grant_program_id",
+            postgresql_where=text("completion_status = 'active'"),
+            sqlite_where=text("completion_status = 'active'"),
+        ),
+        # Overdue detection scans active stages by deadline; see deadlines.OverdueSweeper.
+        Index(
+            "ix_stages_active_due_at",
+            "due_at",
+            postgresql_where=text("completion_status = 'active' AND due_at IS NOT NULL"),
+            sqlite_where=text("completion_status = 'active' AND due_at IS NOT NULL"),
+        ),
+    )
 
     id = Column(UUID(as_uuid=True), primary_key=True, default=uuid.uuid4)
     grant_program_id = Column(UUID(as_uuid=True), ForeignKey("grant_programs.id", ondelete="CASCADE"), nullable=False)
     order = Column(Integer, nullable=False)
     amount = Column(Numeric(10, 2), nullable=False)
     completion_status = Column(String(length=50), default="pending", nullable=False)
+    completed_at = Column(DateTime(timezone=True), nullable=True)
+    due_at = Column(DateTime(timezone=True), nullable=True)
+    # Running total of contract purchases tagged with this stage; see GrantRepository.add_stage_spend.
+    spent_amount = Column(Numeric(10, 2), nullable=False, default=0, server_default="0")
+    version = Column(Integer, nullable=False, server_default="1")
+
+    __mapper_args__ = {"version_id_col": version}
 
     grant_program: Mapped[GrantProgram] = relationship("GrantProgram", back_populates="stages")
     requirements: Mapped[List["Requirement"]] = relationship(
@@ -43,21 +105,40 @@ class Stage(Base):
 
 class Requirement(Base):
     __tablename__ = "requirements"
+    __table_args__ = (
+        Index(
+            "ix_requirements_pending_stage_id",
+            "stage_id",
+            postgresql_where=text("status = 'pending'"),
+            sqlite_where=text("status = 'pending'"),
+        ),
+    )
 
     id = Column(UUID(as_uuid=True), primary_key=True, default=uuid.uuid4)
     stage_id = Column(UUID(as_uuid=True), ForeignKey("stages.id", ondelete="CASCADE"), nullable=False)
     name = Column(String(length=255), nullable=False)
     description = Column(String(length=500), nullable=True)
     status = Column(String(length=50), default="pending")
-    proof_url = Column(String(length=500), nullable=True)
+    proof_url = Column(String(length=500), nullable=True, index=True)
     proof_submitted_by = Column(UUID(as_uuid=True), ForeignKey("users.id", ondelete="SET NULL"), nullable=True)
+    # Set when the stage is enforced by a payment contract instead of manual review.
+    payment_contract_id = Column(
+        UUID(as_uuid=True), ForeignKey("payment_contracts.id", ondelete="SET NULL"), nullable=True, index=True
+    )
+    version = Column(Integer, nullable=False, server_default="1")
+
+    __mapper_args__ = {"version_id_col": version}
 
     stage: Mapped[Stage] = relationship("Stage", back_populates="requirements")
 
 
 class UserToGrant(Base):
     __tablename__ = "user_to_grant"
-    __table_args__ = (UniqueConstraint("user_id", "grant_program_id", name="uq_user_grant"),)
+    __table_args__ = (
+        UniqueConstraint("user_id", "grant_program_id", name="uq_user_grant"),
+        # Serves the per-request membership probe in GrantService._ensure_role.
+        Index("ix_user_to_grant_program_user_active", "grant_program_id", "user_id", "active"),
+    )
 
     id = Column(UUID(as_uuid=True), primary_key=True, default=uuid.uuid4)
     user_id = Column(UUID(as_uuid=True), ForeignKey("users.id", ondelete="CASCADE"), nullable=False)
@@ -75,3 +156,210 @@ class UserToGrant(Base):
     @property
     def name(self) -> Optional[str]:
         return self.user.name if self.user else None
+
+
+class GrantProgramDocument(Base):
+    """
+    Read model for `GET /grants/{id}`: the program's serialized `GrantProgramRead`, rewritten in the same
+    transaction as every write to the program. `commands rebuild-documents` regenerates it from the tables.
+    """
+
+    __tablename__ = "grant_program_documents"
+
+    grant_program_id = Column(
+        UUID(as_uuid=True), ForeignKey("grant_programs.id", ondelete="CASCADE"), primary_key=True
+    )
+    version = Column(Integer, nullable=False)
+    document = Column(LargeBinary, nullable=False)
+    updated_at = Column(
+        DateTime(timezone=True),
+        nullable=False,
+        default=lambda: datetime.now(timezone.utc),
+        onupdate=lambda: datetime.now(timezone.utc),
+    )
+
+
+class GrantProgramArchive(Base):
+    """
+    Completed programs moved out of the hot tables by `commands archive-programs`, with their stages,
+    requirements and participants below. Ids and every hot column are kept; no foreign keys leave the
+    archive, since history outlives the users and contracts it mentions.
+    """
+
+    __tablename__ = "grant_programs_archive"
+
+    id = Column(UUID(as_uuid=True), primary_key=True)
+    name = Column(String(length=255), nullable=False)
+    bank_account_number = Column(String(length=64), nullable=False)
+    status = Column(String(length=50), nullable=False)
+    grantor_id = Column(UUID(as_uuid=True), nullable=False, index=True)
+    payout_policy = Column(String(length=32), nullable=False)
+    version = Column(Integer, nullable=False)
+    total_amount = Column(Numeric(12, 2), nullable=False)
+    disbursed_amount = Column(Numeric(12, 2), nullable=False)
+    completed_stages = Column(Integer, nullable=False)
+    pending_requirements = Column(Integer, nullable=False)
+    confirmed_at = Column(DateTime(timezone=True), nullable=True)
+    completed_at = Column(DateTime(timezone=True), nullable=True)
+    archived_at = Column(DateTime(timezone=True), nullable=False)
+
+    stages: Mapped[List["StageArchive"]] = relationship(
+        "StageArchive", cascade="all, delete-orphan", order_by="StageArchive.order"
+    )
+    participants: Mapped[List["UserToGrantArchive"]] = relationship(
+        "UserToGrantArchive", cascade="all, delete-orphan"
+    )
+
+
+class StageArchive(Base):
+    __tablename__ = "stages_archive"
+
+    id = Column(UUID(as_uuid=True), primary_key=True)
+    grant_program_id = Column(
+        UUID(as_uuid=True), ForeignKey("grant_programs_archive.id", ondelete="CASCADE"), nullable=False, index=True
+    )
+    order = Column(Integer, nullable=False)
+    amount = Column(Numeric(10, 2), nullable=False)
+    completion_status = Column(String(length=50), nullable=False)
+    completed_at = Column(DateTime(timezone=True), nullable=True)
+    due_at = Column(DateTime(timezone=True), nullable=True)
+    spent_amount = Column(Numeric(10, 2), nullable=False)
+    version = Column(Integer, nullable=False)
+    # Taken from the stage's payout_schedules row, which is dropped with the stage; null for immediate payouts.
+    payout_bank_account_number = Column(String(length=64), nullable=True)
+    payout_transaction_id = Column(String(length=255), nullable=True)
+
+    requirements: Mapped[List["RequirementArchive"]] = relationship(
+        "RequirementArchive", cascade="all, delete-orphan"
+    )
+
+
+class RequirementArchive(Base):
+    __tablename__ = "requirements_archive"
+
+    id = Column(UUID(as_uuid=True), primary_key=True)
+    stage_id = Column(
+        UUID(as_uuid=True), ForeignKey("stages_archive.id", ondelete="CASCADE"), nullable=False, index=True
+    )
+    name = Column(String(length=255), nullable=False)
+    description = Column(String(length=500), nullable=True)
+    status = Column(String(length=50), nullable=True)
+    proof_url = Column(String(length=500), nullable=True)
+    proof_submitted_by = Column(UUID(as_uuid=True), nullable=True)
+    payment_contract_id = Column(UUID(as_uuid=True), nullable=True)
+    version = Column(Integer, nullable=False)
+
+
+class UserToGrantArchive(Base):
+    __tablename__ = "user_to_grant_archive"
+
+    id = Column(UUID(as_uuid=True), primary_key=True)
+    user_id = Column(UUID(as_uuid=True), nullable=False, index=True)
+    grant_program_id = Column(
+        UUID(as_uuid=True), ForeignKey("grant_programs_archive.id", ondelete="CASCADE"), nullable=False, index=True
+    )
+    role = Column(String(length=50), nullable=False)
+    active = Column(Boolean, nullable=True)
+
+    user: Mapped[Optional[User]] = relationship(
+        "User", primaryjoin="foreign(UserToGrantArchive.user_id) == User.id", viewonly=True
+    )
+
+    @property
+    def email(self) -> Optional[str]:
+        return self.user.email if self.user else None
+
+    @property
+    def name(self) -> Optional[str]:
+        return self.user.name if self.user else None
+
+
+class GrantTemplate(Base):
+    """Reusable program outline; `GrantService.clone_template` copies it into new draft programs."""
+
+    __tablename__ = "grant_templates"
+
+    id = Column(UUID(as_uuid=True), primary_key=True, default=uuid.uuid4)
+    name = Column(String(length=255), nullable=False)
+    grantor_id = Column(UUID(as_uuid=True), ForeignKey("users.id", ondelete="CASCADE"), nullable=False, index=True)
+
+    stages: Mapped[List["GrantTemplateStage"]] = relationship(
+        "GrantTemplateStage",
+        back_populates="template",
+        cascade="all, delete-orphan",
+        order_by="GrantTemplateStage.order",
+    )
+
+
+class GrantTemplateStage(Base):
+    __tablename__ = "grant_template_stages"
+
+    id = Column(UUID(as_uuid=True), primary_key=True, default=uuid.uuid4)
+    template_id = Column(
+        UUID(as_uuid=True), ForeignKey("grant_templates.id", ondelete="CASCADE"), nullable=False, index=True
+    )
+    order = Column(Integer, nullable=False)
+    amount = Column(Numeric(10, 2), nullable=False)
+
+    template: Mapped[GrantTemplate] = relationship("GrantTemplate", back_populates="stages")
+    requirements: Mapped[List["GrantTemplateRequirement"]] = relationship(
+        "GrantTemplateRequirement", back_populates="stage", cascade="all, delete-orphan"
+    )
+
+
+class GrantTemplateRequirement(Base):
+    __tablename__ = "grant_template_requirements"
+
+    id = Column(UUID(as_uuid=True), primary_key=True, default=uuid.uuid4)
+    template_stage_id = Column(
+        UUID(as_uuid=True), ForeignKey("grant_template_stages.id", ondelete="CASCADE"), nullable=False, index=True
+    )
+    name = Column(String(length=255), nullable=False)
+    description = Column(String(length=500), nullable=True)
+    payment_contract_id = Column(
+        UUID(as_uuid=True), ForeignKey("payment_contracts.id", ondelete="SET NULL"), nullable=True
+    )
+
+    stage: Mapped[GrantTemplateStage] = relationship("GrantTemplateStage", back_populates="requirements")
+
+
+class GrantEventColumns:
+    """Shared columns of the audit log and its archive. No foreign keys: history outlives the rows it describes."""
+
+    grant_program_id = Column(UUID(as_uuid=True), nullable=False)
+    kind = Column(String(length=64), nullable=False)
+    actor_id = Column(UUID(as_uuid=True), nullable=True)
+    payload = Column(JSON, nullable=False, default=dict)
+    created_at = Column(DateTime(timezone=True), nullable=False, default=lambda: datetime.now(timezone.utc))
+
+
+class GrantAuditEvent(GrantEventColumns, Base):
+    """Append-only log of grant transitions, copied in batches from `grant_events_outbox` by `audit.AuditLogWriter`."""
+
+    __tablename__ = "grant_events"
+    __table_args__ = (
+        # Per-program timeline, newest first, paged by id.
+        Index("ix_grant_events_program_id_id", "grant_program_id", "id"),
+        Index("ix_grant_events_created_at", "created_at"),
+    )
+
+    id = Column(BigInteger().with_variant(Integer, "sqlite"), primary_key=True, autoincrement=True)
+
+
+class GrantAuditEventArchive(GrantEventColumns, Base):
+    """Events moved out of `grant_events` by `commands archive-events`; ids are kept."""
+
+    __tablename__ = "grant_events_archive"
+    __table_args__ = (Index("ix_grant_events_archive_program_id_id", "grant_program_id", "id"),)
+
+    id = Column(BigInteger().with_variant(Integer, "sqlite"), primary_key=True, autoincrement=False)
+
+
+class GrantAuditOutbox(Base):
+    """Events committed with their business transaction and not yet copied to `grant_events`, one row per commit."""
+
+    __tablename__ = "grant_events_outbox"
+
+    id = Column(BigInteger().with_variant(Integer, "sqlite"), primary_key=True, autoincrement=True)
+    events = Column(JSON, nullable=False)
+    created_at = Column(DateTime(timezone=True), nullable=False, default=lambda: datetime.now(timezone.utc))
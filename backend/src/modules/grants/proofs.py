@@ -0,0 +1,133 @@
+"""
+Content-addressed storage for uploaded requirement proofs.
+
+Uploads are parsed straight from the request stream (`upload_chunks`), hashed and written once to a
+temporary file, then renamed to `<root>/ab/cd/<sha256>`. Identical files share one blob, and a blob never
+changes once written. Nothing is buffered by the framework, so an upload rejected by the size or
+permission checks is refused before its body is read.
+"""
+import hashlib
+import os
+import re
+from pathlib import Path
+from typing import AsyncIterable, AsyncIterator, Optional
+from uuid import uuid4
+
+import anyio
+from fastapi import HTTPException, Request, status
+from multipart.multipart import MultipartParser, parse_options_header
+
+from src.core.config import settings
+
+PROOF_URL_PREFIX = "/api/v1/grants/proofs/"
+# Room for the multipart boundaries and part headers around the file itself.
+MULTIPART_OVERHEAD_BYTES = 16 * 1024
+
+_DIGEST_PATTERN = re.compile(r"^[0-9a-f]{64}$")
+
+
+def proof_url(digest: str) -> str:
+    return f"{PROOF_URL_PREFIX}{digest}"
+
+
+class ProofStorage:
+    def __init__(self, root: str | Path | None = None, max_bytes: int | None = None):
+        self.root = Path(root or settings.proof_storage_dir)
+        self.max_bytes = max_bytes or settings.proof_max_bytes
+
+    def path_for(self, digest: str) -> Path:
+        if not _DIGEST_PATTERN.match(digest):
+            raise HTTPException(status_code=status.HTTP_404_NOT_FOUND, detail="Proof not found")
+        return self.root / digest[:2] / digest[2:4] / digest
+
+    def check_content_length(self, content_length: Optional[str]) -> None:
+        """Refuse a request whose declared size cannot fit `max_bytes`, before any of its body is read."""
+        limit = self.max_bytes + MULTIPART_OVERHEAD_BYTES
+        if content_length and content_length.isdigit() and int(content_length) > limit:
+            raise HTTPException(status_code=status.HTTP_413_REQUEST_ENTITY_TOO_LARGE, detail="Proof file is too large")
+
+    async def save(self, chunks: AsyncIterable[bytes]) -> str:
+        """Store the streamed file and return its sha256 digest, reusing the existing blob for duplicate content."""
+        tmp_dir = self.root / "tmp"
+        tmp_dir.mkdir(parents=True, exist_ok=True)
+        tmp_path = tmp_dir / uuid4().hex
+        hasher = hashlib.sha256()
+        size = 0
+        try:
+            async with await anyio.open_file(tmp_path, "wb") as target:
+                async for chunk in chunks:
+                    size += len(chunk)
+                    if size > self.max_bytes:
+                        raise HTTPException(
+                            status_code=status.HTTP_413_REQUEST_ENTITY_TOO_LARGE, detail="Proof file is too large"
+                        )
+                    hasher.update(chunk)
+                    await target.write(chunk)
+            digest = hasher.hexdigest()
+            path = self.path_for(digest)
+            if path.exists():
+                return digest
+            path.parent.mkdir(parents=True, exist_ok=True)
+            os.replace(tmp_path, path)
+            return digest
+        finally:
+            tmp_path.unlink(missing_ok=True)
+
+
+async def upload_chunks(request: Request, field_name: str = "file") -> AsyncIterator[bytes]:
+    """
+    Bytes of the `field_name` file of a multipart/form-data request, parsed as the body arrives. Other
+    fields are skipped. Stopping the iteration stops reading the body.
+    """
+    content_type, options = parse_options_header(request.headers.get("content-type", ""))
+    boundary = options.get(b"boundary")
+    if content_type != b"multipart/form-data" or not boundary:
+        raise HTTPException(status_code=status.HTTP_400_BAD_REQUEST, detail="Expected a multipart/form-data upload")
+
+    target = field_name.encode()
+    part = {"header_field": b"", "header_value": b"", "name": None}
+    found: list[bool] = []
+    pending: list[bytes] = []
+
+    def on_part_begin() -> None:
+        part.update(header_field=b"", header_value=b"", name=None)
+
+    def on_header_field(data: bytes, start: int, end: int) -> None:
+        part["header_field"] += data[start:end]
+
+    def on_header_value(data: bytes, start: int, end: int) -> None:
+        part["header_value"] += data[start:end]
+
+    def on_header_end() -> None:
+        if part["header_field"].lower() == b"content-disposition":
+            _, disposition = parse_options_header(part["header_value"])
+            part["name"] = disposition.get(b"name")
+        part.update(header_field=b"", header_value=b"")
+
+    def on_part_data(data: bytes, start: int, end: int) -> None:
+        if part["name"] == target and not found:
+            pending.append(data[start:end])
+
+    def on_part_end() -> None:
+        if part["name"] == target:
+            found.append(True)
+
+    parser = MultipartParser(
+        boundary,
+        {
+            "on_part_begin": on_part_begin,
+            "on_header_field": on_header_field,
+            "on_header_value": on_header_value,
+            "on_header_end": on_header_end,
+            "on_part_data": on_part_data,
+            "on_part_end": on_part_end,
+        },
+    )
+    async for body in request.stream():
+        parser.write(body)
+        for chunk in pending:
+            yield chunk
+        pending.clear()
+    parser.finalize()
+    if not found:
+        raise HTTPException(status_code=status.HTTP_400_BAD_REQUEST, detail=f"Missing `{field_name}` file")
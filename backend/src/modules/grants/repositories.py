@@ -1,10 +1,98 @@
-from typing import Optional
+from datetime import datetime, timezone
+from decimal import Decimal
+from typing import Iterable, NamedTuple, Optional, Sequence
+from uuid import UUID
 
-from sqlalchemy import select, or_
+from sqlalchemy import (
+    DateTime,
+    Row,
+    Select,
+    and_,
+    case,
+    delete,
+    exists,
+    func,
+    insert,
+    literal,
+    or_,
+    select,
+    true,
+    update,
+)
+from sqlalchemy.dialects import postgresql, sqlite
+from sqlalchemy.dialects.postgresql import UUID as PG_UUID
 from sqlalchemy.ext.asyncio import AsyncSession
+from sqlalchemy.ext.compiler import compiles
 from sqlalchemy.orm import selectinload
+from sqlalchemy.sql.functions import FunctionElement
 
-from .models import GrantProgram, Requirement, Stage, UserToGrant
+from src.modules.payments.models import PayoutSchedule
+from .models import (
+    GrantAuditEvent,
+    GrantAuditEventArchive,
+    GrantProgram,
+    GrantProgramArchive,
+    GrantProgramDocument,
+    GrantTemplate,
+    GrantTemplateRequirement,
+    GrantTemplateStage,
+    Requirement,
+    RequirementArchive,
+    Stage,
+    StageArchive,
+    UserToGrant,
+    UserToGrantArchive,
+)
+from .search import ranked_programs, ranked_requirements
+from .serializers import dump_program, load_program
+
+
+class StoredDocument(NamedTuple):
+    version: int
+    document: bytes
+
+
+class RequirementContext(NamedTuple):
+    requirement: Requirement
+    stage_status: str
+    grant_program_id: UUID
+    program_status: str
+    grantor_id: UUID
+    program_version: int
+    stored_document: Optional[StoredDocument]
+
+
+# Dashboard orderings served straight from the progress counters on grant_programs.
+PROGRAM_ORDERINGS = {
+    # Programs without an amount have no progress; they sort last, as in services._ordering_key.
+    "progress": (GrantProgram.disbursed_amount / func.nullif(GrantProgram.total_amount, 0)).desc().nulls_last(),
+    "disbursed_amount": GrantProgram.disbursed_amount.desc(),
+    "pending_requirements": GrantProgram.pending_requirements.desc(),
+}
+
+
+class TemplateSummary(NamedTuple):
+    grantor_id: UUID
+    total_amount: Decimal
+    requirement_count: int
+
+
+class new_uuid(FunctionElement):
+    """Random UUID generated by the database, for rows copied with INSERT ... SELECT."""
+
+    type = PG_UUID(as_uuid=True)
+    inherit_cache = True
+
+
+@compiles(new_uuid)
+def _new_uuid_postgresql(element, compiler, **kw):
+    return "gen_random_uuid()"
+
+
+@compiles(new_uuid, "sqlite")
+def _new_uuid_sqlite(element, compiler, **kw):
+    # Non-native UUID columns are stored as 32 hex characters.
+    return "lower(hex(randomblob(16)))"
 
 
 class GrantRepository:
@@ -27,18 +115,426 @@ class GrantRepository:
         await self.session.flush()
         return program
 
-    async def list_for_user(self, user_id: str) -> list[GrantProgram]:
+    async def list_pending_actions(self, user_id: UUID, limit: int) -> list[Row]:
+        """
+        Requirements waiting on the user across all their programs: proofs to submit as grantee, proofs
+        to review as grantor or supervisor. One join from the user's memberships through the partial
+        indexes on active stages and pending requirements.
+        """
+        submit = and_(UserToGrant.role == "grantee", Requirement.proof_url.is_(None))
+        review = and_(UserToGrant.role.in_(("grantor", "supervisor")), Requirement.proof_url.is_not(None))
         stmt = (
+            select(
+                case((UserToGrant.role == "grantee", "submit_proof"), else_="review_proof").label("action"),
+                UserToGrant.role.label("role"),
+                GrantProgram.id.label("grant_program_id"),
+                GrantProgram.name.label("grant_program_name"),
+                Stage.id.label("stage_id"),
+                Stage.order.label("stage_order"),
+                Requirement.id.label("requirement_id"),
+                Requirement.name.label("requirement_name"),
+                Requirement.description.label("requirement_description"),
+                Requirement.proof_url.label("proof_url"),
+            )
+            .select_from(UserToGrant)
+            .join(
+                Stage,
+                and_(Stage.grant_program_id == UserToGrant.grant_program_id, Stage.completion_status == "active"),
+            )
+            .join(Requirement, and_(Requirement.stage_id == Stage.id, Requirement.status == "pending"))
+            .join(GrantProgram, GrantProgram.id == Stage.grant_program_id)
+            .where(
+                UserToGrant.user_id == user_id,
+                UserToGrant.active.is_(True),
+                GrantProgram.status == "active",
+                # Contract-enforced requirements are settled by purchases, not by proofs.
+                Requirement.payment_contract_id.is_(None),
+                or_(submit, review),
+            )
+            .order_by(GrantProgram.name, GrantProgram.id, Requirement.id)
+            .limit(limit)
+        )
+        result = await self.session.execute(stmt)
+        return list(result.all())
+
+    async def list_overdue_for_user(self, user_id: UUID, now: datetime, limit: int) -> list[Row]:
+        """Active stages past their deadline in the user's programs, most overdue first."""
+        stmt = (
+            select(
+                GrantProgram.id.label("grant_program_id"),
+                GrantProgram.name.label("grant_program_name"),
+                Stage.id.label("stage_id"),
+                Stage.order.label("stage_order"),
+                Stage.amount.label("amount"),
+                Stage.due_at.label("due_at"),
+            )
+            .select_from(UserToGrant)
+            .join(Stage, Stage.grant_program_id == UserToGrant.grant_program_id)
+            .join(GrantProgram, GrantProgram.id == Stage.grant_program_id)
+            .where(
+                UserToGrant.user_id == user_id,
+                UserToGrant.active.is_(True),
+                Stage.completion_status == "active",
+                Stage.due_at.is_not(None),
+                Stage.due_at <= now,
+            )
+            .order_by(Stage.due_at, Stage.id)
+            .limit(limit)
+        )
+        result = await self.session.execute(stmt)
+        return list(result.all())
+
+    async def list_newly_overdue(
+        self, now: datetime, after: Optional[tuple[datetime, UUID]], limit: int
+    ) -> list[Row]:
+        """
+        Active stages whose deadline passed after the `(due_at, stage_id)` position and at or before `now`,
+        in keyset order. A range scan of `ix_stages_active_due_at`, so the cost tracks new deadlines only.
+        """
+        stmt = select(Stage.id, Stage.grant_program_id, Stage.order, Stage.due_at).where(
+            Stage.completion_status == "active", Stage.due_at.is_not(None), Stage.due_at <= now
+        )
+        if after is not None:
+            after_due_at, after_id = after
+            stmt = stmt.where(
+                Stage.due_at >= after_due_at,
+                or_(Stage.due_at > after_due_at, Stage.id > after_id),
+            )
+        result = await self.session.execute(stmt.order_by(Stage.due_at, Stage.id).limit(limit))
+        return list(result.all())
+
+    async def search_programs(self, user_id: UUID, terms: list[str], limit: int) -> list[Row]:
+        """Programs the user can access whose name matches every term, best match first."""
+        ranked = ranked_programs(self._dialect, terms).subquery()
+        stmt = (
+            select(
+                GrantProgram.id.label("grant_program_id"),
+                GrantProgram.name.label("name"),
+                GrantProgram.status.label("status"),
+                ranked.c.rank,
+            )
+            .join(ranked, ranked.c.id == GrantProgram.id)
+            .where(self._accessible_by(user_id))
+            .order_by(ranked.c.rank.desc(), GrantProgram.id)
+            .limit(limit)
+        )
+        result = await self.session.execute(stmt)
+        return list(result.all())
+
+    async def search_requirements(self, user_id: UUID, terms: list[str], limit: int) -> list[Row]:
+        """Requirements in programs the user can access whose name or description matches every term."""
+        ranked = ranked_requirements(self._dialect, terms).subquery()
+        stmt = (
+            select(
+                GrantProgram.id.label("grant_program_id"),
+                GrantProgram.name.label("grant_program_name"),
+                Stage.id.label("stage_id"),
+                Requirement.id.label("requirement_id"),
+                Requirement.name.label("name"),
+                Requirement.description.label("description"),
+                Requirement.status.label("status"),
+                ranked.c.rank,
+            )
+            .join(ranked, ranked.c.id == Requirement.id)
+            .join(Stage, Stage.id == Requirement.stage_id)
+            .join(GrantProgram, GrantProgram.id == Stage.grant_program_id)
+            .where(self._accessible_by(user_id))
+            .order_by(ranked.c.rank.desc(), Requirement.id)
+            .limit(limit)
+        )
+        result = await self.session.execute(stmt)
+        return list(result.all())
+
+    @property
+    def _dialect(self) -> str:
+        return self.session.bind.dialect.name
+
+    @staticmethod
+    def _accessible_by(user_id: UUID):
+        memberships = select(UserToGrant.grant_program_id).where(
+            UserToGrant.user_id == user_id, UserToGrant.active.is_(True)
+        )
+        return or_(GrantProgram.grantor_id == user_id, GrantProgram.id.in_(memberships))
+
+    async def get_version(self, grant_program_id: UUID) -> Optional[int]:
+        result = await self.session.execute(
+            select(GrantProgram.version).where(GrantProgram.id == grant_program_id)
+        )
+        return result.scalar_one_or_none()
+
+    async def get_document(self, grant_program_id: UUID) -> Optional[bytes]:
+        """The stored `GrantProgramRead` JSON of the program: one primary-key read, nothing to serialize."""
+        result = await self.session.execute(
+            select(GrantProgramDocument.document).where(GrantProgramDocument.grant_program_id == grant_program_id)
+        )
+        return result.scalar_one_or_none()
+
+    async def get_stored_document(self, grant_program_id: UUID) -> Optional[StoredDocument]:
+        result = await self.session.execute(
+            select(GrantProgramDocument.version, GrantProgramDocument.document).where(
+                GrantProgramDocument.grant_program_id == grant_program_id
+            )
+        )
+        row = result.one_or_none()
+        return StoredDocument(*row) if row else None
+
+    async def patch_document(self, grant_program_id: UUID, base_version: int, document: bytes) -> bool:
+        """
+        Store a document edited from the one written at `base_version`, stamped with the program's current
+        version. False means another write replaced the document since it was read; rebuild it instead.
+        """
+        result = await self.session.execute(
+            update(GrantProgramDocument)
+            .where(
+                GrantProgramDocument.grant_program_id == grant_program_id,
+                GrantProgramDocument.version == base_version,
+            )
+            .values(
+                version=select(GrantProgram.version).where(GrantProgram.id == grant_program_id).scalar_subquery(),
+                document=document,
+                updated_at=datetime.now(timezone.utc),
+            )
+            .execution_options(synchronize_session=False)
+        )
+        return result.rowcount == 1
+
+    async def refresh_documents(self, grant_program_ids: Iterable[UUID]) -> int:
+        """Rewrite the read-model documents of the programs from the source tables, in the caller's transaction."""
+        ids = list(set(grant_program_ids))
+        if not ids:
+            return 0
+        # Conditional updates and counter deltas are Core statements, so objects in this session may be stale.
+        # A second session on the same connection reads the flushed state without touching the caller's objects.
+        await self.session.flush()
+        async with AsyncSession(bind=await self.session.connection()) as reader:
+            result = await reader.execute(
+                select(GrantProgram)
+                .where(GrantProgram.id.in_(ids))
+                .options(
+                    selectinload(GrantProgram.stages).selectinload(Stage.requirements),
+                    selectinload(GrantProgram.participants).selectinload(UserToGrant.user),
+                )
+            )
+            rows = [
+                {
+                    "grant_program_id": program.id,
+                    "version": program.version,
+                    "document": dump_program(load_program(program)),
+                }
+                for program in result.scalars().all()
+            ]
+        if not rows:
+            return 0
+        dialect_insert = postgresql.insert if self._dialect == "postgresql" else sqlite.insert
+        stmt = dialect_insert(GrantProgramDocument)
+        stmt = stmt.on_conflict_do_update(
+            index_elements=[GrantProgramDocument.grant_program_id],
+            set_={
+                "version": stmt.excluded.version,
+                "document": stmt.excluded.document,
+                "updated_at": datetime.now(timezone.utc),
+            },
+        )
+        await self.session.execute(stmt, rows)
+        return len(rows)
+
+    async def list_program_ids(self, after: Optional[UUID], limit: int) -> list[UUID]:
+        """Program ids in id order after `after`, for batch jobs over every program."""
+        stmt = select(GrantProgram.id).order_by(GrantProgram.id).limit(limit)
+        if after is not None:
+            stmt = stmt.where(GrantProgram.id > after)
+        result = await self.session.execute(stmt)
+        return list(result.scalars().all())
+
+    async def list_for_user(
+        self,
+        user_id: str,
+        status: Optional[str] = None,
+        order_by: Optional[str] = None,
+        ids: Optional[Sequence[UUID]] = None,
+    ) -> list[GrantProgram]:
+        stmt = self._visible_to(select(GrantProgram), user_id, status, ids).options(
+            selectinload(GrantProgram.stages).selectinload(Stage.requirements),
+            selectinload(GrantProgram.participants).selectinload(UserToGrant.user),
+        )
+        if order_by:
+            stmt = stmt.order_by(PROGRAM_ORDERINGS[order_by], GrantProgram.id)
+        result = await self.session.execute(stmt)
+        return list(result.scalars().unique().all())
+
+    async def list_by_ids(self, grant_program_ids: Iterable[UUID]) -> list[GrantProgram]:
+        result = await self.session.execute(
             select(GrantProgram)
-            .outerjoin(UserToGrant, UserToGrant.grant_program_id == GrantProgram.id)
-            .where(or_(GrantProgram.grantor_id == user_id, UserToGrant.user_id == user_id))
+            .where(GrantProgram.id.in_(list(grant_program_ids)))
             .options(
                 selectinload(GrantProgram.stages).selectinload(Stage.requirements),
                 selectinload(GrantProgram.participants).selectinload(UserToGrant.user),
             )
         )
-        result = await self.session.execute(stmt)
-        return list(result.scalars().unique().all())
+        return list(result.scalars().all())
+
+    async def list_versions_for_user(
+        self, user_id: str, status: Optional[str] = None, ids: Optional[Sequence[UUID]] = None
+    ) -> list[tuple[UUID, int]]:
+        """Id/version pairs of the programs `list_for_user` would return, without loading any children."""
+        stmt = self._visible_to(select(GrantProgram.id, GrantProgram.version), user_id, status, ids)
+        result = await self.session.execute(stmt.distinct().order_by(GrantProgram.id))
+        return [(row.id, row.version) for row in result.all()]
+
+    async def list_archived_for_user(
+        self, user_id: UUID, status: Optional[str] = None, ids: Optional[Sequence[UUID]] = None
+    ) -> list[GrantProgramArchive]:
+        stmt = self._archived_visible_to(select(GrantProgramArchive), user_id, status, ids).options(
+            selectinload(GrantProgramArchive.stages).selectinload(StageArchive.requirements),
+            selectinload(GrantProgramArchive.participants).selectinload(UserToGrantArchive.user),
+        )
+        result = await self.session.execute(stmt.order_by(GrantProgramArchive.id))
+        return list(result.scalars().all())
+
+    async def list_archived_versions_for_user(
+        self, user_id: UUID, status: Optional[str] = None, ids: Optional[Sequence[UUID]] = None
+    ) -> list[tuple[UUID, int]]:
+        stmt = self._archived_visible_to(
+            select(GrantProgramArchive.id, GrantProgramArchive.version), user_id, status, ids
+        )
+        result = await self.session.execute(stmt.order_by(GrantProgramArchive.id))
+        return [(row.id, row.version) for row in result.all()]
+
+    async def get_archived(self, grant_program_id: UUID) -> Optional[GrantProgramArchive]:
+        result = await self.session.execute(
+            select(GrantProgramArchive)
+            .where(GrantProgramArchive.id == grant_program_id)
+            .options(
+                selectinload(GrantProgramArchive.stages).selectinload(StageArchive.requirements),
+                selectinload(GrantProgramArchive.participants).selectinload(UserToGrantArchive.user),
+            )
+        )
+        return result.scalar_one_or_none()
+
+    async def get_archived_access(self, grant_program_id: UUID, user_id: UUID) -> Optional[tuple[int, bool]]:
+        """Version of an archived program and whether the user granted it or actively took part; None if not archived."""
+        member = exists().where(
+            UserToGrantArchive.grant_program_id == GrantProgramArchive.id,
+            UserToGrantArchive.user_id == user_id,
+            UserToGrantArchive.active.is_(True),
+        )
+        result = await self.session.execute(
+            select(GrantProgramArchive.version, or_(GrantProgramArchive.grantor_id == user_id, member)).where(
+                GrantProgramArchive.id == grant_program_id
+            )
+        )
+        row = result.first()
+        return None if row is None else (row[0], bool(row[1]))
+
+    @staticmethod
+    def _archived_visible_to(
+        stmt: Select, user_id: UUID, status: Optional[str], ids: Optional[Sequence[UUID]] = None
+    ) -> Select:
+        memberships = select(UserToGrantArchive.grant_program_id).where(UserToGrantArchive.user_id == user_id)
+        stmt = stmt.where(
+            or_(GrantProgramArchive.grantor_id == user_id, GrantProgramArchive.id.in_(memberships))
+        )
+        if status:
+            stmt = stmt.where(GrantProgramArchive.status == status)
+        if ids is not None:
+            stmt = stmt.where(GrantProgramArchive.id.in_(ids))
+        return stmt
+
+    @staticmethod
+    def _visible_to(
+        stmt: Select, user_id: str, status: Optional[str], ids: Optional[Sequence[UUID]] = None
+    ) -> Select:
+        stmt = stmt.outerjoin(UserToGrant, UserToGrant.grant_program_id == GrantProgram.id).where(
+            or_(GrantProgram.grantor_id == user_id, UserToGrant.user_id == user_id)
+        )
+        if status:
+            stmt = stmt.where(GrantProgram.status == status)
+        if ids is not None:
+            stmt = stmt.where(GrantProgram.id.in_(ids))
+        return stmt
+
+    async def create_template(self, template: GrantTemplate) -> GrantTemplate:
+        self.session.add(template)
+        await self.session.flush()
+        return template
+
+    async def get_template(self, template_id: UUID) -> Optional[GrantTemplate]:
+        result = await self.session.execute(
+            select(GrantTemplate)
+            .where(GrantTemplate.id == template_id)
+            .options(selectinload(GrantTemplate.stages).selectinload(GrantTemplateStage.requirements))
+        )
+        return result.scalar_one_or_none()
+
+    async def list_templates(self, grantor_id: UUID) -> list[GrantTemplate]:
+        result = await self.session.execute(
+            select(GrantTemplate)
+            .where(GrantTemplate.grantor_id == grantor_id)
+            .order_by(GrantTemplate.name, GrantTemplate.id)
+            .options(selectinload(GrantTemplate.stages).selectinload(GrantTemplateStage.requirements))
+        )
+        return list(result.scalars().all())
+
+    async def get_template_summary(self, template_id: UUID) -> Optional[TemplateSummary]:
+        """Owner and the counter values a clone starts with, without loading the template rows."""
+        total_amount = (
+            select(func.coalesce(func.sum(GrantTemplateStage.amount), 0))
+            .where(GrantTemplateStage.template_id == GrantTemplate.id)
+            .scalar_subquery()
+        )
+        requirement_count = (
+            select(func.count(GrantTemplateRequirement.id))
+            .join(GrantTemplateStage, GrantTemplateStage.id == GrantTemplateRequirement.template_stage_id)
+            .where(GrantTemplateStage.template_id == GrantTemplate.id)
+            .scalar_subquery()
+        )
+        result = await self.session.execute(
+            select(GrantTemplate.grantor_id, total_amount, requirement_count).where(GrantTemplate.id == template_id)
+        )
+        row = result.one_or_none()
+        return TemplateSummary(row[0], Decimal(row[1]), row[2]) if row else None
+
+    async def clone_template(self, template_id: UUID, programs: list[dict], participants: list[dict]) -> None:
+        """
+        Create draft programs from a template: programs and memberships are bulk inserted, stages and
+        requirements are copied with INSERT ... SELECT, so the statement count does not grow with the batch.
+        """
+        program_ids = [program["id"] for program in programs]
+        await self.session.execute(insert(GrantProgram), programs)
+        await self.session.execute(insert(UserToGrant), participants)
+        await self.session.execute(
+            insert(Stage).from_select(
+                ["id", "grant_program_id", "order", "amount", "completion_status"],
+                select(
+                    new_uuid(),
+                    GrantProgram.id,
+                    GrantTemplateStage.order,
+                    GrantTemplateStage.amount,
+                    literal("pending"),
+                )
+                .join(GrantTemplateStage, true())
+                .where(GrantProgram.id.in_(program_ids), GrantTemplateStage.template_id == template_id),
+            )
+        )
+        await self.session.execute(
+            insert(Requirement).from_select(
+                ["id", "stage_id", "name", "description", "payment_contract_id", "status"],
+                select(
+                    new_uuid(),
+                    Stage.id,
+                    GrantTemplateRequirement.name,
+                    GrantTemplateRequirement.description,
+                    GrantTemplateRequirement.payment_contract_id,
+                    literal("pending"),
+                )
+                .join(
+                    GrantTemplateStage,
+                    and_(GrantTemplateStage.template_id == template_id, GrantTemplateStage.order == Stage.order),
+                )
+                .join(GrantTemplateRequirement, GrantTemplateRequirement.template_stage_id == GrantTemplateStage.id)
+                .where(Stage.grant_program_id.in_(program_ids)),
+            )
+        )
 
     async def get_stage(self, stage_id: str) -> Optional[Stage]:
         result = await self.session.execute(
@@ -52,17 +548,300 @@ class GrantRepository:
         )
         return result.scalar_one_or_none()
 
-    async def get_requirement(self, requirement_id: str) -> Optional[Requirement]:
+    async def get_requirement_context(self, requirement_id: UUID) -> Optional["RequirementContext"]:
+        """
+        Fetch a requirement with just the stage/program fields its transitions check, and the program's stored
+        document for patching, in one joined row.
+        """
         result = await self.session.execute(
-            select(Requirement)
+            select(
+                Requirement,
+                Stage.completion_status,
+                GrantProgram.id,
+                GrantProgram.status,
+                GrantProgram.grantor_id,
+                GrantProgram.version,
+                GrantProgramDocument.version,
+                GrantProgramDocument.document,
+            )
+            .join(Stage, Stage.id == Requirement.stage_id)
+            .join(GrantProgram, GrantProgram.id == Stage.grant_program_id)
+            .outerjoin(GrantProgramDocument, GrantProgramDocument.grant_program_id == GrantProgram.id)
             .where(Requirement.id == requirement_id)
-            .options(
-                selectinload(Requirement.stage)
-                .selectinload(Stage.grant_program)
-                .selectinload(GrantProgram.participants)
-                .selectinload(UserToGrant.user),
-                selectinload(Requirement.stage).selectinload(Stage.grant_program).selectinload(GrantProgram.stages),
-                selectinload(Requirement.stage),
+        )
+        row = result.one_or_none()
+        if not row:
+            return None
+        *fields, document_version, document = row
+        stored = StoredDocument(document_version, document) if document is not None else None
+        return RequirementContext(*fields, stored)
+
+    async def has_active_role(self, grant_program_id: UUID, user_id: UUID, roles: Iterable[str]) -> bool:
+        stmt = select(
+            exists().where(
+                UserToGrant.grant_program_id == grant_program_id,
+                UserToGrant.user_id == user_id,
+                UserToGrant.active.is_(True),
+                UserToGrant.role.in_(list(roles)),
+            )
+        )
+        return bool(await self.session.scalar(stmt))
+
+    async def can_view_proof(self, proof_url: str, user_id: UUID) -> bool:
+        """Whether the user is an active participant of a program with a requirement pointing at this proof."""
+        stmt = select(
+            exists()
+            .where(Requirement.proof_url == proof_url)
+            .where(Stage.id == Requirement.stage_id)
+            .where(
+                UserToGrant.grant_program_id == Stage.grant_program_id,
+                UserToGrant.user_id == user_id,
+                UserToGrant.active.is_(True),
             )
         )
+        return bool(await self.session.scalar(stmt))
+
+    async def list_events(
+        self, grant_program_id: UUID, before_id: Optional[int] = None, limit: int = 50
+    ) -> list[GrantAuditEvent]:
+        """A page of a program's audit timeline, newest first; pass the last id seen as `before_id`."""
+        stmt = (
+            select(GrantAuditEvent)
+            .where(GrantAuditEvent.grant_program_id == grant_program_id)
+            .order_by(GrantAuditEvent.id.desc())
+            .limit(limit)
+        )
+        if before_id is not None:
+            stmt = stmt.where(GrantAuditEvent.id < before_id)
+        result = await self.session.execute(stmt)
+        return list(result.scalars().all())
+
+    async def archive_events(self, older_than: datetime, batch_size: int) -> int:
+        """Move one batch of audit events created before `older_than` to the archive table."""
+        result = await self.session.execute(
+            select(GrantAuditEvent.id)
+            .where(GrantAuditEvent.created_at < older_than)
+            .order_by(GrantAuditEvent.id)
+            .limit(batch_size)
+        )
+        event_ids = list(result.scalars().all())
+        if not event_ids:
+            return 0
+        columns = [column.name for column in GrantAuditEvent.__table__.columns]
+        await self.session.execute(
+            insert(GrantAuditEventArchive).from_select(
+                columns,
+                select(*(GrantAuditEvent.__table__.c[name] for name in columns)).where(
+                    GrantAuditEvent.id.in_(event_ids)
+                ),
+            )
+        )
+        await self.session.execute(delete(GrantAuditEvent).where(GrantAuditEvent.id.in_(event_ids)))
+        return len(event_ids)
+
+    async def archive_programs(self, completed_before: datetime, batch_size: int) -> int:
+        """
+        Move one batch of programs completed before `completed_before`, with their stages, requirements and
+        participants, to the archive tables. A stage's payout row goes with it, folded into the archived
+        stage; programs with a payout that is not paid yet stay until it is.
+        """
+        unsettled = exists().where(
+            PayoutSchedule.grant_program_id == GrantProgram.id, PayoutSchedule.status != "paid"
+        )
+        result = await self.session.execute(
+            select(GrantProgram.id)
+            .where(
+                GrantProgram.status == "completed",
+                GrantProgram.completed_at < completed_before,
+                ~unsettled,
+            )
+            .order_by(GrantProgram.completed_at, GrantProgram.id)
+            .limit(batch_size)
+        )
+        program_ids = list(result.scalars().all())
+        if not program_ids:
+            return 0
+        stage_ids = select(Stage.id).where(Stage.grant_program_id.in_(program_ids))
+        payout = select(PayoutSchedule).where(PayoutSchedule.stage_id == Stage.id).correlate(Stage)
+
+        archived_at = literal(datetime.now(timezone.utc), DateTime(timezone=True))
+        await self._copy_to_archive(
+            GrantProgram, GrantProgramArchive, GrantProgram.id.in_(program_ids), archived_at=archived_at
+        )
+        await self._copy_to_archive(
+            Stage,
+            StageArchive,
+            Stage.grant_program_id.in_(program_ids),
+            payout_bank_account_number=payout.with_only_columns(
+                PayoutSchedule.bank_account_number
+            ).scalar_subquery(),
+            payout_transaction_id=payout.with_only_columns(PayoutSchedule.transaction_id).scalar_subquery(),
+        )
+        await self._copy_to_archive(Requirement, RequirementArchive, Requirement.stage_id.in_(stage_ids))
+        await self._copy_to_archive(UserToGrant, UserToGrantArchive, UserToGrant.grant_program_id.in_(program_ids))
+
+        # Children first: foreign keys are not enforced on every backend, so cascades cannot be relied on.
+        await self.session.execute(
+            delete(GrantProgramDocument).where(GrantProgramDocument.grant_program_id.in_(program_ids))
+        )
+        await self.session.execute(delete(PayoutSchedule).where(PayoutSchedule.grant_program_id.in_(program_ids)))
+        await self.session.execute(delete(Requirement).where(Requirement.stage_id.in_(stage_ids)))
+        await self.session.execute(delete(Stage).where(Stage.grant_program_id.in_(program_ids)))
+        await self.session.execute(delete(UserToGrant).where(UserToGrant.grant_program_id.in_(program_ids)))
+        await self.session.execute(delete(GrantProgram).where(GrantProgram.id.in_(program_ids)))
+        return len(program_ids)
+
+    async def _copy_to_archive(self, source: type, archive: type, where, **extra) -> None:
+        """INSERT ... SELECT every column of `source` into the archive table of the same shape, plus `extra`."""
+        columns = [column.name for column in source.__table__.columns]
+        await self.session.execute(
+            insert(archive).from_select(
+                columns + list(extra),
+                select(*(source.__table__.c[name] for name in columns), *extra.values()).where(where),
+            )
+        )
+
+    async def transition_program(
+        self, grant_program_id: UUID, from_status: str, to_status: str, **values: object
+    ) -> bool:
+        """
+        Move a program between statuses only if it is still in `from_status`; False means a concurrent change won.
+        Extra `values` (e.g. transition timestamps) are written in the same statement.
+        """
+        result = await self.session.execute(
+            update(GrantProgram)
+            .where(GrantProgram.id == grant_program_id, GrantProgram.status == from_status)
+            .values(status=to_status, version=GrantProgram.version + 1, **values)
+        )
+        return result.rowcount == 1
+
+    async def transition_stage(self, stage_id: UUID, from_status: str, to_status: str, **values: object) -> bool:
+        result = await self.session.execute(
+            update(Stage)
+            .where(Stage.id == stage_id, Stage.completion_status == from_status)
+            .values(completion_status=to_status, version=Stage.version + 1, **values)
+        )
+        return result.rowcount == 1
+
+    async def get_contract_stage(self, stage_id: UUID, contract_id: UUID) -> Optional[Stage]:
+        """The stage if one of its requirements is enforced by `contract_id` (served by the FK index)."""
+        enforced = exists().where(Requirement.stage_id == Stage.id, Requirement.payment_contract_id == contract_id)
+        result = await self.session.execute(select(Stage).where(Stage.id == stage_id, enforced))
+        return result.scalar_one_or_none()
+
+    async def add_stage_spend(self, stage_id: UUID, contract_id: UUID, amount: Decimal) -> Optional[UUID]:
+        """
+        Add a purchase to the stage's running spend if the stage is active, enforced by `contract_id` and the
+        purchase fits the remaining budget. Returns the stage's program id, or None when nothing was updated.
+        """
+        enforced = exists().where(Requirement.stage_id == Stage.id, Requirement.payment_contract_id == contract_id)
+        result = await self.session.execute(
+            update(Stage)
+            .where(
+                Stage.id == stage_id,
+                Stage.completion_status == "active",
+                Stage.spent_amount + amount <= Stage.amount,
+                enforced,
+            )
+            .values(spent_amount=Stage.spent_amount + amount, version=Stage.version + 1)
+            .returning(Stage.grant_program_id)
+        )
+        return result.scalar_one_or_none()
+
+    async def release_stage_spend(self, stage_id: UUID, amount: Decimal) -> Optional[UUID]:
+        """Take back a purchase added by `add_stage_spend`. Returns the stage's program id, or None if it is gone."""
+        result = await self.session.execute(
+            update(Stage)
+            .where(Stage.id == stage_id)
+            .values(spent_amount=Stage.spent_amount - amount, version=Stage.version + 1)
+            .returning(Stage.grant_program_id)
+        )
         return result.scalar_one_or_none()
+
+    async def complete_requirement(self, requirement_id: UUID, expected_version: int) -> bool:
+        """Complete a requirement that is unchanged since it was read and whose stage is still active."""
+        stage_active = exists().where(Stage.id == Requirement.stage_id, Stage.completion_status == "active")
+        result = await self.session.execute(
+            update(Requirement)
+            .where(Requirement.id == requirement_id, Requirement.version == expected_version, stage_active)
+            .values(status="completed", version=Requirement.version + 1)
+        )
+        return result.rowcount == 1
+
+    async def touch(self, grant_program_id: UUID) -> None:
+        """Bump the program version for writes to its children that do not otherwise update the program row."""
+        await self.session.execute(
+            update(GrantProgram)
+            .where(GrantProgram.id == grant_program_id)
+            .values(version=GrantProgram.version + 1)
+        )
+
+    async def apply_progress(
+        self,
+        grant_program_id: UUID,
+        *,
+        completed_stages: int = 0,
+        disbursed_amount: Decimal | int = 0,
+        pending_requirements: int = 0,
+    ) -> None:
+        """Apply counter deltas in the caller's transaction, bumping the program version like any other write."""
+        await self.session.execute(
+            update(GrantProgram)
+            .where(GrantProgram.id == grant_program_id)
+            .values(
+                completed_stages=GrantProgram.completed_stages + completed_stages,
+                disbursed_amount=GrantProgram.disbursed_amount + disbursed_amount,
+                pending_requirements=GrantProgram.pending_requirements + pending_requirements,
+                version=GrantProgram.version + 1,
+            )
+        )
+
+    async def find_counter_drift(self) -> list[tuple[UUID, dict[str, tuple]]]:
+        """Return programs whose stored counters differ from the ones derived from stages and requirements."""
+        expected = _expected_counters()
+        stmt = select(
+            GrantProgram.id,
+            *(getattr(GrantProgram, name) for name in expected),
+            *(expr.label(f"expected_{name}") for name, expr in expected.items()),
+        ).where(or_(*(getattr(GrantProgram, name) != expr for name, expr in expected.items())))
+        drift = []
+        for row in (await self.session.execute(stmt)).all():
+            mapping = row._mapping
+            diffs = {
+                name: (mapping[name], mapping[f"expected_{name}"])
+                for name in expected
+                if mapping[name] != mapping[f"expected_{name}"]
+            }
+            drift.append((row.id, diffs))
+        return drift
+
+    async def recompute_counters(self, grant_program_ids: Iterable[UUID]) -> int:
+        ids = list(grant_program_ids)
+        if not ids:
+            return 0
+        result = await self.session.execute(
+            update(GrantProgram)
+            .where(GrantProgram.id.in_(ids))
+            .values(**_expected_counters(), version=GrantProgram.version + 1)
+            .execution_options(synchronize_session=False)
+        )
+        return result.rowcount
+
+
+def _expected_counters() -> dict:
+    """Correlated subqueries deriving each progress counter from the source tables."""
+    of_program = Stage.grant_program_id == GrantProgram.id
+    completed = Stage.completion_status == "completed"
+    return {
+        "total_amount": select(func.coalesce(func.sum(Stage.amount), 0)).where(of_program).scalar_subquery(),
+        "disbursed_amount": (
+            select(func.coalesce(func.sum(Stage.amount), 0)).where(of_program, completed).scalar_subquery()
+        ),
+        "completed_stages": select(func.count(Stage.id)).where(of_program, completed).scalar_subquery(),
+        "pending_requirements": (
+            select(func.count(Requirement.id))
+            .join(Stage, Stage.id == Requirement.stage_id)
+            .where(of_program, func.coalesce(Requirement.status, "pending") != "completed")
+            .scalar_subquery()
+        ),
+    }
@@ -1,20 +1,37 @@
-from fastapi import APIRouter, Depends, status
-from sqlalchemy.ext.asyncio import AsyncSession
+from typing import Optional
 
-from src.core.database import get_session
+from fastapi import APIRouter, Depends, Query, Request, Response, status
+from fastapi.responses import FileResponse, StreamingResponse
+from sqlalchemy.ext.asyncio import AsyncSession, async_sessionmaker
+
+from src.core.database import get_session, get_session_factory
+from src.core.etag import REVALIDATE_CACHE_CONTROL, etag_matches
+from src.core.responses import PreserializedJSONResponse, file_response
 from src.core.security import get_current_user
 from src.modules.auth.models import User
+from .events import grant_events
+from .export import ExportFormat, GrantExporter
 from .schemas import (
+    GrantParticipantBulkCreate,
     GrantParticipantCreate,
     GrantParticipantRead,
     GrantParticipantRoleUpdate,
     GrantProgramCreate,
+    GrantProgramOrdering,
     GrantProgramRead,
     GrantBankAccountUpdate,
+    GrantEventRead,
+    GrantTemplateClone,
+    GrantTemplateCreate,
+    GrantTemplateRead,
+    OverdueStageRead,
+    PendingActionRead,
     RequirementProofSubmit,
     RequirementRead,
+    SearchResultsRead,
     StageRead,
 )
+from .serializers import dump_program, dump_programs
 from .services import GrantService
 
 router = APIRouter(prefix="/grants", tags=["grants"])
@@ -29,17 +46,140 @@ async def create_program(
     payload: GrantProgramCreate,
     session: AsyncSession = Depends(get_session),
     current_user: User = Depends(get_current_user),
-) -> GrantProgramRead:
+) -> Response:
     service = GrantService(session)
-    return await service.create_program(payload, current_user)
+    program = await service.create_program(payload, current_user)
+    return PreserializedJSONResponse(dump_program(program), status_code=status.HTTP_201_CREATED)
 
 
-@router.get("/", response_model=list[GrantProgramRead])
+@router.get("/", response_model=list[GrantProgramRead], responses={304: {"description": "Not modified"}})
 async def list_programs(
-    session: AsyncSession = Depends(get_session), current_user: User = Depends(get_current_user)
-) -> list[GrantProgramRead]:
+    request: Request,
+    program_status: Optional[str] = Query(None, alias="status"),
+    order_by: Optional[GrantProgramOrdering] = None,
+    ids: Optional[str] = Query(None, description="Comma-separated grant program ids (at most 100)"),
+    include_archived: bool = False,
+    session: AsyncSession = Depends(get_session),
+    current_user: User = Depends(get_current_user),
+) -> Response:
+    service = GrantService(session)
+    program_ids = None if ids is None else service.parse_program_ids(ids)
+    filters = {"status": program_status, "order_by": order_by, "ids": program_ids, "include_archived": include_archived}
+    etag = await service.list_programs_etag(current_user, **filters)
+    cache_headers = {"ETag": etag, "Cache-Control": REVALIDATE_CACHE_CONTROL}
+    if etag_matches(request, etag):
+        return Response(status_code=status.HTTP_304_NOT_MODIFIED, headers=cache_headers)
+    programs = await service.list_programs(current_user, **filters)
+    return PreserializedJSONResponse(dump_programs(programs), headers=cache_headers)
+
+
+@router.get("/export", response_class=StreamingResponse)
+async def export_programs(
+    export_format: ExportFormat = Query("ndjson", alias="format"),
+    session_factory: async_sessionmaker[AsyncSession] = Depends(get_session_factory),
+    current_user: User = Depends(get_current_user),
+) -> StreamingResponse:
+    exporter = GrantExporter(session_factory, current_user.id)
+    return StreamingResponse(
+        exporter.stream(export_format),
+        media_type=exporter.media_type(export_format),
+        headers={"Content-Disposition": f'attachment; filename="grants.{export_format}"'},
+    )
+
+
+@router.post("/templates", response_model=GrantTemplateRead, status_code=status.HTTP_201_CREATED)
+async def create_template(
+    payload: GrantTemplateCreate,
+    session: AsyncSession = Depends(get_session),
+    current_user: User = Depends(get_current_user),
+) -> GrantTemplateRead:
+    service = GrantService(session)
+    return await service.create_template(payload, current_user)
+
+
+@router.get("/templates", response_model=list[GrantTemplateRead])
+async def list_templates(
+    session: AsyncSession = Depends(get_session),
+    current_user: User = Depends(get_current_user),
+) -> list[GrantTemplateRead]:
+    service = GrantService(session)
+    return await service.list_templates(current_user)
+
+
+@router.post(
+    "/templates/{template_id}/clone", response_model=list[GrantProgramRead], status_code=status.HTTP_201_CREATED
+)
+async def clone_template(
+    template_id: str,
+    payload: GrantTemplateClone,
+    session: AsyncSession = Depends(get_session),
+    current_user: User = Depends(get_current_user),
+) -> Response:
+    service = GrantService(session)
+    programs = await service.clone_template(template_id, payload, current_user)
+    return PreserializedJSONResponse(dump_programs(programs), status_code=status.HTTP_201_CREATED)
+
+
+@router.get("/pending-actions", response_model=list[PendingActionRead])
+async def list_pending_actions(
+    limit: int = Query(100, ge=1, le=500),
+    session: AsyncSession = Depends(get_session),
+    current_user: User = Depends(get_current_user),
+) -> list[PendingActionRead]:
+    service = GrantService(session)
+    return await service.list_pending_actions(current_user, limit=limit)
+
+
+@router.get("/overdue-stages", response_model=list[OverdueStageRead])
+async def list_overdue_stages(
+    limit: int = Query(100, ge=1, le=500),
+    session: AsyncSession = Depends(get_session),
+    current_user: User = Depends(get_current_user),
+) -> list[OverdueStageRead]:
+    service = GrantService(session)
+    return await service.list_overdue_stages(current_user, limit=limit)
+
+
+@router.get("/search", response_model=SearchResultsRead)
+async def search_grants(
+    q: str = Query(..., min_length=1, max_length=200),
+    limit: int = Query(20, ge=1, le=100),
+    session: AsyncSession = Depends(get_session),
+    current_user: User = Depends(get_current_user),
+) -> SearchResultsRead:
     service = GrantService(session)
-    return await service.list_programs(current_user)
+    return await service.search(q, current_user, limit=limit)
+
+
+@router.get("/stream", response_class=StreamingResponse)
+async def stream_events(
+    session: AsyncSession = Depends(get_session),
+    current_user: User = Depends(get_current_user),
+) -> StreamingResponse:
+    service = GrantService(session)
+    program_ids = await service.visible_program_ids(current_user)
+    return StreamingResponse(
+        grant_events.stream(current_user.id, program_ids),
+        media_type="text/event-stream",
+        headers={"Cache-Control": "no-cache", "X-Accel-Buffering": "no"},
+    )
+
+
+@router.get("/{grant_program_id}", response_model=GrantProgramRead, responses={304: {"description": "Not modified"}})
+async def get_program(
+    grant_program_id: str,
+    request: Request,
+    include_archived: bool = False,
+    session: AsyncSession = Depends(get_session),
+    current_user: User = Depends(get_current_user),
+) -> Response:
+    service = GrantService(session)
+    etag = await service.get_program_etag(grant_program_id, current_user, include_archived=include_archived)
+    cache_headers = {"ETag": etag, "Cache-Control": REVALIDATE_CACHE_CONTROL}
+    if etag_matches(request, etag):
+        return Response(status_code=status.HTTP_304_NOT_MODIFIED, headers=cache_headers)
+    body = await service.get_program_json(grant_program_id, current_user, include_archived=include_archived)
+    return PreserializedJSONResponse(body, headers=cache_headers)
 
 
 @router.post("/{grant_program_id}/confirm", response_model=GrantProgramRead)
@@ -47,9 +187,21 @@ async def confirm_program(
     grant_program_id: str,
     session: AsyncSession = Depends(get_session),
     current_user: User = Depends(get_current_user),
-) -> GrantProgramRead:
+) -> Response:
     service = GrantService(session)
-    return await service.confirm_program(grant_program_id, current_user)
+    return PreserializedJSONResponse(dump_program(await service.confirm_program(grant_program_id, current_user)))
+
+
+@router.get("/{grant_program_id}/events", response_model=list[GrantEventRead])
+async def list_program_events(
+    grant_program_id: str,
+    before: Optional[int] = Query(None, description="Return events older than this event id"),
+    limit: int = Query(50, ge=1, le=200),
+    session: AsyncSession = Depends(get_session),
+    current_user: User = Depends(get_current_user),
+) -> list[GrantEventRead]:
+    service = GrantService(session)
+    return await service.list_events(grant_program_id, current_user, before=before, limit=limit)
 
 
 @router.post("/{grant_program_id}/invite", response_model=list[GrantParticipantRead])
@@ -63,6 +215,17 @@ async def invite_participant(
     return await service.invite_participant(grant_program_id, payload, current_user)
 
 
+@router.post("/{grant_program_id}/invite/bulk", response_model=list[GrantParticipantRead])
+async def invite_participants(
+    grant_program_id: str,
+    payload: GrantParticipantBulkCreate,
+    session: AsyncSession = Depends(get_session),
+    current_user: User = Depends(get_current_user),
+) -> list[GrantParticipantRead]:
+    service = GrantService(session)
+    return await service.invite_participants(grant_program_id, payload, current_user)
+
+
 @router.patch("/{grant_program_id}/participants/{participant_id}", response_model=list[GrantParticipantRead])
 async def update_participant_role(
     grant_program_id: str,
@@ -107,6 +270,52 @@ async def submit_requirement_proof(
     return await service.submit_requirement_proof(requirement_id, payload, current_user)
 
 
+@router.post(
+    "/requirements/{requirement_id}/proof/upload",
+    response_model=RequirementRead,
+    responses={413: {"description": "Proof file is too large"}},
+    # The body is parsed from the stream by the service, so it is described here rather than as a parameter.
+    openapi_extra={
+        "requestBody": {
+            "required": True,
+            "content": {
+                "multipart/form-data": {
+                    "schema": {
+                        "type": "object",
+                        "properties": {"file": {"type": "string", "format": "binary"}},
+                        "required": ["file"],
+                    }
+                }
+            },
+        }
+    },
+)
+async def upload_requirement_proof(
+    requirement_id: str,
+    request: Request,
+    session: AsyncSession = Depends(get_session),
+    current_user: User = Depends(get_current_user),
+) -> RequirementRead:
+    service = GrantService(session)
+    return await service.upload_requirement_proof(requirement_id, request, current_user)
+
+
+@router.get("/proofs/{digest}", response_class=FileResponse, responses={206: {}, 304: {}, 416: {}})
+async def download_proof(
+    digest: str,
+    request: Request,
+    session: AsyncSession = Depends(get_session),
+    current_user: User = Depends(get_current_user),
+) -> Response:
+    service = GrantService(session)
+    path = await service.get_proof_path(digest, current_user)
+    # Blobs are content-addressed, so the digest is a permanent strong validator.
+    headers = {"ETag": f'"{digest}"', "Cache-Control": "private, max-age=31536000, immutable"}
+    if etag_matches(request, headers["ETag"]):
+        return Response(status_code=status.HTTP_304_NOT_MODIFIED, headers=headers)
+    return file_response(path, request.headers.get("range"), headers=headers)
+
+
 @router.post("/stages/{stage_id}/complete", response_model=StageRead)
 async def complete_stage(
     stage_id: str,
@@ -123,6 +332,8 @@ async def update_bank_account(
     payload: GrantBankAccountUpdate,
     session: AsyncSession = Depends(get_session),
     current_user: User = Depends(get_current_user),
-) -> GrantProgramRead:
+) -> Response:
     service = GrantService(session)
-    return await service.update_bank_account(grant_program_id, payload, current_user)
+    return PreserializedJSONResponse(
+        dump_program(await service.update_bank_account(grant_program_id, payload, current_user))
+    )
@@ -1,12 +1,15 @@
-from typing import List, Optional, Literal
+from datetime import datetime, timezone
+from typing import Any, List, Optional, Literal
 from uuid import UUID
 
-from pydantic import BaseModel, Field, EmailStr, model_validator
+from pydantic import BaseModel, Field, EmailStr, field_validator, model_validator
 
 
 class RequirementCreate(BaseModel):
     name: str = Field(..., max_length=255)
     description: Optional[str] = Field(None, max_length=500)
+    # Omitted links are also read from a legacy `payment_contract_id:<uuid>` description.
+    payment_contract_id: Optional[UUID] = None
 
 
 class RequirementRead(RequirementCreate):
@@ -22,14 +25,25 @@ class RequirementRead(RequirementCreate):
 class StageCreate(BaseModel):
     order: int
     amount: float
+    due_at: Optional[datetime] = None
     requirements: List[RequirementCreate] = Field(default_factory=list)
 
+    @field_validator("due_at")
+    @classmethod
+    def normalize_due_at(cls, value: Optional[datetime]) -> Optional[datetime]:
+        # Deadlines are compared in UTC; a deadline without an offset is taken as UTC.
+        if value is None:
+            return None
+        return value.replace(tzinfo=timezone.utc) if value.tzinfo is None else value.astimezone(timezone.utc)
+
 
 class StageRead(BaseModel):
     id: UUID
     order: int
     amount: float
     completion_status: str
+    spent_amount: float = 0
+    due_at: Optional[datetime] = None
     requirements: List[RequirementRead] = Field(default_factory=list)
 
     class Config:
@@ -41,6 +55,7 @@ class GrantProgramCreate(BaseModel):
     bank_account_number: str = Field(..., max_length=64)
     stages: List[StageCreate]
     participants: List["GrantParticipantCreate"] = Field(default_factory=list)
+    payout_policy: Literal["immediate", "next_month"] = "immediate"
 
 
 class GrantBankAccountUpdate(BaseModel):
@@ -52,6 +67,11 @@ class GrantProgramRead(BaseModel):
     name: str
     bank_account_number: str
     status: str
+    payout_policy: str = "immediate"
+    total_amount: float = 0
+    disbursed_amount: float = 0
+    completed_stages: int = 0
+    pending_requirements: int = 0
     participants: List["GrantParticipantRead"] = Field(default_factory=list)
     stages: List[StageRead] = Field(default_factory=list)
 
@@ -59,6 +79,9 @@ class GrantProgramRead(BaseModel):
         from_attributes = True
 
 
+GrantProgramOrdering = Literal["progress", "disbursed_amount", "pending_requirements"]
+
+
 class GrantParticipantCreate(BaseModel):
     user_id: Optional[str] = None
     user_email: Optional[EmailStr] = None
@@ -71,6 +94,10 @@ class GrantParticipantCreate(BaseModel):
         return self
 
 
+class GrantParticipantBulkCreate(BaseModel):
+    participants: List[GrantParticipantCreate] = Field(..., min_length=1)
+
+
 class GrantParticipantRead(BaseModel):
     id: UUID
     user_id: UUID
@@ -88,9 +115,111 @@ class GrantParticipantRoleUpdate(BaseModel):
     role: Literal["supervisor", "grantee"]
 
 
+class PendingActionRead(BaseModel):
+    action: Literal["submit_proof", "review_proof"]
+    role: str
+    grant_program_id: UUID
+    grant_program_name: str
+    stage_id: UUID
+    stage_order: int
+    requirement_id: UUID
+    requirement_name: str
+    requirement_description: Optional[str] = None
+    proof_url: Optional[str] = None
+
+
+class OverdueStageRead(BaseModel):
+    grant_program_id: UUID
+    grant_program_name: str
+    stage_id: UUID
+    stage_order: int
+    amount: float
+    due_at: datetime
+
+
+class ProgramSearchHit(BaseModel):
+    grant_program_id: UUID
+    name: str
+    status: str
+    rank: float
+
+
+class RequirementSearchHit(BaseModel):
+    grant_program_id: UUID
+    grant_program_name: str
+    stage_id: UUID
+    requirement_id: UUID
+    name: str
+    description: Optional[str] = None
+    status: Optional[str] = None
+    rank: float
+
+
+class SearchResultsRead(BaseModel):
+    programs: List[ProgramSearchHit] = Field(default_factory=list)
+    requirements: List[RequirementSearchHit] = Field(default_factory=list)
+
+
 class RequirementProofSubmit(BaseModel):
     proof_url: str = Field(..., max_length=500)
 
 
+class GrantTemplateStageCreate(BaseModel):
+    order: int
+    amount: float
+    requirements: List[RequirementCreate] = Field(default_factory=list)
+
+    class Config:
+        # Templates store no deadlines, so a `due_at` is rejected rather than silently dropped.
+        extra = "forbid"
+
+
+class GrantTemplateCreate(BaseModel):
+    name: str = Field(..., max_length=255)
+    stages: List[GrantTemplateStageCreate]
+
+
+class GrantTemplateStageRead(BaseModel):
+    id: UUID
+    order: int
+    amount: float
+    requirements: List[RequirementCreate] = Field(default_factory=list)
+
+    class Config:
+        from_attributes = True
+
+
+class GrantTemplateRead(BaseModel):
+    id: UUID
+    name: str
+    grantor_id: UUID
+    stages: List[GrantTemplateStageRead] = Field(default_factory=list)
+
+    class Config:
+        from_attributes = True
+
+
+class GrantTemplateCloneItem(BaseModel):
+    name: str = Field(..., max_length=255)
+    bank_account_number: str = Field(..., max_length=64)
+    participants: List[GrantParticipantCreate] = Field(default_factory=list)
+
+
+class GrantTemplateClone(BaseModel):
+    programs: List[GrantTemplateCloneItem] = Field(..., min_length=1, max_length=500)
+
+
+class GrantEventRead(BaseModel):
+    id: int
+    grant_program_id: UUID
+    kind: str
+    actor_id: Optional[UUID]
+    payload: dict[str, Any]
+    created_at: datetime
+
+    class Config:
+        from_attributes = True
+
+
 GrantProgramCreate.model_rebuild()
 GrantProgramRead.model_rebuild()
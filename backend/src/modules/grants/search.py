@@ -0,0 +1,134 @@
+"""
+Full-text search over program names and requirement names and descriptions.
+
+On Postgres, `grant_programs` and `requirements` carry a generated `search_vector` column
+(`to_tsvector('simple', ...)`, recomputed by the database on every write) with a GIN index. On SQLite the
+fallback is FTS5: `grant_programs_fts` and `requirements_fts` are kept current by triggers. They store the
+row id as an indexed token, so the triggers find the entry of an updated or deleted row through the index
+instead of scanning it, and searches are restricted to the text columns.
+
+The DDL runs with `create_all`; migration 0016 adds the Postgres side to existing databases. The vector
+columns are not mapped, so ORM loads never read them.
+"""
+import re
+
+from sqlalchemy import DDL, Select, column, event, func, literal_column, select, table
+
+from .models import GrantProgram, Requirement
+
+MAX_SEARCH_TERMS = 16
+
+_programs_fts = table("grant_programs_fts", column("grant_program_id"))
+_requirements_fts = table("requirements_fts", column("requirement_id"))
+
+_POSTGRES_DDL = [
+    """
+    ALTER TABLE grant_programs ADD COLUMN search_vector tsvector
+        GENERATED ALWAYS AS (to_tsvector('simple', coalesce(name, ''))) STORED
+    """,
+    "CREATE INDEX ix_grant_programs_search_vector ON grant_programs USING gin (search_vector)",
+    """
+    ALTER TABLE requirements ADD COLUMN search_vector tsvector
+        GENERATED ALWAYS AS (
+            setweight(to_tsvector('simple', coalesce(name, '')), 'A')
+            || setweight(to_tsvector('simple', coalesce(description, '')), 'B')
+        ) STORED
+    """,
+    "CREATE INDEX ix_requirements_search_vector ON requirements USING gin (search_vector)",
+]
+
+_SQLITE_PROGRAM_DDL = [
+    "CREATE VIRTUAL TABLE grant_programs_fts USING fts5(grant_program_id, name)",
+    """
+    CREATE TRIGGER grant_programs_fts_insert AFTER INSERT ON grant_programs BEGIN
+        INSERT INTO grant_programs_fts (grant_program_id, name) VALUES (new.id, new.name);
+    END
+    """,
+    """
+    CREATE TRIGGER grant_programs_fts_delete AFTER DELETE ON grant_programs BEGIN
+        DELETE FROM grant_programs_fts WHERE grant_programs_fts MATCH 'grant_program_id:"' || old.id || '"';
+    END
+    """,
+    """
+    CREATE TRIGGER grant_programs_fts_update AFTER UPDATE OF name ON grant_programs BEGIN
+        DELETE FROM grant_programs_fts WHERE grant_programs_fts MATCH 'grant_program_id:"' || old.id || '"';
+        INSERT INTO grant_programs_fts (grant_program_id, name) VALUES (new.id, new.name);
+    END
+    """,
+]
+
+_SQLITE_REQUIREMENT_DDL = [
+    "CREATE VIRTUAL TABLE requirements_fts USING fts5(requirement_id, name, description)",
+    """
+    CREATE TRIGGER requirements_fts_insert AFTER INSERT ON requirements BEGIN
+        INSERT INTO requirements_fts (requirement_id, name, description)
+        VALUES (new.id, new.name, new.description);
+    END
+    """,
+    """
+    CREATE TRIGGER requirements_fts_delete AFTER DELETE ON requirements BEGIN
+        DELETE FROM requirements_fts WHERE requirements_fts MATCH 'requirement_id:"' || old.id || '"';
+    END
+    """,
+    """
+    CREATE TRIGGER requirements_fts_update AFTER UPDATE OF name, description ON requirements BEGIN
+        DELETE FROM requirements_fts WHERE requirements_fts MATCH 'requirement_id:"' || old.id || '"';
+        INSERT INTO requirements_fts (requirement_id, name, description)
+        VALUES (new.id, new.name, new.description);
+    END
+    """,
+]
+
+for _statement in _POSTGRES_DDL[:2]:
+    event.listen(GrantProgram.__table__, "after_create", DDL(_statement).execute_if(dialect="postgresql"))
+for _statement in _POSTGRES_DDL[2:]:
+    event.listen(Requirement.__table__, "after_create", DDL(_statement).execute_if(dialect="postgresql"))
+for _statement in _SQLITE_PROGRAM_DDL:
+    event.listen(GrantProgram.__table__, "after_create", DDL(_statement).execute_if(dialect="sqlite"))
+for _statement in _SQLITE_REQUIREMENT_DDL:
+    event.listen(Requirement.__table__, "after_create", DDL(_statement).execute_if(dialect="sqlite"))
+
+
+def search_terms(query: str) -> list[str]:
+    """Words of a free-text query; every one of them must match."""
+    return re.findall(r"\w+", query.lower())[:MAX_SEARCH_TERMS]
+
+
+def ranked_programs(dialect: str, terms: list[str]) -> Select:
+    """`(id, rank)` of programs whose name matches all terms; higher rank is a better match."""
+    if dialect == "postgresql":
+        vector = literal_column("grant_programs.search_vector")
+        query = func.plainto_tsquery("simple", " ".join(terms))
+        return select(GrantProgram.id.label("id"), func.ts_rank(vector, query).label("rank")).where(
+            vector.op("@@")(query)
+        )
+    fts = literal_column("grant_programs_fts")
+    return (
+        select(GrantProgram.id.label("id"), (-func.bm25(fts, 0.0, 1.0)).label("rank"))
+        .select_from(_programs_fts)
+        .join(GrantProgram, GrantProgram.id == _programs_fts.c.grant_program_id)
+        .where(fts.op("MATCH")(_fts_query(["name"], terms)))
+    )
+
+
+def ranked_requirements(dialect: str, terms: list[str]) -> Select:
+    """`(id, rank)` of requirements whose name or description matches all terms, names weighted higher."""
+    if dialect == "postgresql":
+        vector = literal_column("requirements.search_vector")
+        query = func.plainto_tsquery("simple", " ".join(terms))
+        return select(Requirement.id.label("id"), func.ts_rank(vector, query).label("rank")).where(
+            vector.op("@@")(query)
+        )
+    fts = literal_column("requirements_fts")
+    return (
+        select(Requirement.id.label("id"), (-func.bm25(fts, 0.0, 2.0, 1.0)).label("rank"))
+        .select_from(_requirements_fts)
+        .join(Requirement, Requirement.id == _requirements_fts.c.requirement_id)
+        .where(fts.op("MATCH")(_fts_query(["name", "description"], terms)))
+    )
+
+
+def _fts_query(columns: list[str], terms: list[str]) -> str:
+    # Terms are plain words, quoted so FTS5 never reads them as operators.
+    phrases = " ".join(f'"{term}"' for term in terms)
+    return f"{{{' '.join(columns)}}} : ({phrases})"
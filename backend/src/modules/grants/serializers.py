@@ -0,0 +1,58 @@
+"""Prebuilt serializers for grant responses, shared by the service and the fast response path."""
+from typing import Callable, Iterable
+from uuid import UUID
+
+from pydantic import TypeAdapter
+
+from .models import GrantProgram
+from .schemas import GrantProgramRead, RequirementRead, StageRead
+
+program_adapter = TypeAdapter(GrantProgramRead)
+program_list_adapter = TypeAdapter(list[GrantProgramRead])
+
+
+def load_program(program: GrantProgram) -> GrantProgramRead:
+    return program_adapter.validate_python(program, from_attributes=True)
+
+
+def load_programs(programs: Iterable[GrantProgram]) -> list[GrantProgramRead]:
+    return program_list_adapter.validate_python(list(programs), from_attributes=True)
+
+
+def dump_program(program: GrantProgramRead) -> bytes:
+    return program_adapter.dump_json(program)
+
+
+def dump_programs(programs: list[GrantProgramRead]) -> bytes:
+    return program_list_adapter.dump_json(programs)
+
+
+def find_stage(program: GrantProgramRead, stage_id: UUID) -> StageRead:
+    for stage in program.stages:
+        if stage.id == stage_id:
+            return stage
+    raise LookupError(f"Stage {stage_id} is not in the document")
+
+
+def replace_requirement(program: GrantProgramRead, requirement: RequirementRead) -> None:
+    for stage in program.stages:
+        for index, entry in enumerate(stage.requirements):
+            if entry.id == requirement.id:
+                stage.requirements[index] = requirement
+                return
+    raise LookupError(f"Requirement {requirement.id} is not in the document")
+
+
+class DocumentPatch:
+    """Edits to a program's stored document, applied in place of a rebuild from the tables."""
+
+    def __init__(self, base_version: int, document: bytes):
+        self.base_version = base_version
+        self.document = document
+        self.edits: list[Callable[[GrantProgramRead], None]] = []
+
+    def apply(self) -> bytes:
+        program = program_adapter.validate_json(self.document)
+        for edit in self.edits:
+            edit(program)
+        return dump_program(program)
@@ -1,33 +1,95 @@
-from uuid import UUID
-
-from fastapi import HTTPException, status
+import logging
+from datetime import datetime, timezone
+from decimal import Decimal
+from pathlib import Path
+from typing import Any, Callable, NoReturn, Optional, Sequence
+from uuid import UUID, uuid4
+
+from fastapi import HTTPException, Request, status
 from sqlalchemy.ext.asyncio import AsyncSession
+from sqlalchemy.orm.exc import StaleDataError
 
 from src.modules.auth.models import User
 from src.modules.auth.repositories import UserRepository
 from src.core.config import settings
+from src.core.etag import compute_etag
+from src.modules.payment_middleware.repositories import PaymentContractRepository
+from src.modules.payments.repositories import PayoutScheduleRepository
+from src.modules.payments.scheduler import payout_due_at, payout_scheduler
 from src.modules.payments.services import PaymentService
-from .models import GrantProgram, Requirement, Stage, UserToGrant
-from .repositories import GrantRepository
+from src.modules.reports.repositories import RollupRepository
+from .audit import audit_log
+from .deadlines import overdue_event, swept_past
+from .search import search_terms
+from .events import GrantEvent, grant_events
+from .models import (
+    GrantProgram,
+    GrantTemplate,
+    GrantTemplateRequirement,
+    GrantTemplateStage,
+    Requirement,
+    Stage,
+    UserToGrant,
+)
+from .proofs import ProofStorage, proof_url, upload_chunks
+from .repositories import GrantRepository, RequirementContext, StoredDocument
+from .serializers import DocumentPatch, dump_program, find_stage, load_program, load_programs, replace_requirement
 from .schemas import (
+    GrantParticipantBulkCreate,
     GrantParticipantCreate,
     GrantParticipantRead,
     GrantParticipantRoleUpdate,
     GrantProgramCreate,
     GrantProgramRead,
     GrantBankAccountUpdate,
+    GrantEventRead,
+    GrantTemplateClone,
+    GrantTemplateCreate,
+    GrantTemplateRead,
+    OverdueStageRead,
+    PendingActionRead,
+    ProgramSearchHit,
+    RequirementCreate,
     RequirementProofSubmit,
     RequirementRead,
+    RequirementSearchHit,
+    SearchResultsRead,
     StageRead,
 )
 
 
+logger = logging.getLogger(__name__)
+
+CONTRACT_DESCRIPTION_PREFIX = "payment_contract_id:"
+MAX_PROGRAM_IDS = 100
+
+
+def _deposit_key(grant_program_id: UUID, claimed_at: datetime) -> str:
+    """Idempotency key of a program's funding deposit, fixed by the confirmation claim it belongs to."""
+    # SQLite hands back naive datetimes for timezone-aware columns.
+    claimed_at = claimed_at.replace(tzinfo=timezone.utc) if claimed_at.tzinfo is None else claimed_at
+    return f"grant-deposit:{grant_program_id}:{claimed_at.astimezone(timezone.utc):%Y%m%dT%H%M%S%f}"
+
+
 class GrantService:
-    def __init__(self, session: AsyncSession, payment_service: PaymentService | None = None):
+    def __init__(
+        self,
+        session: AsyncSession,
+        payment_service: PaymentService | None = None,
+        proof_storage: ProofStorage | None = None,
+    ):
         self.session = session
         self.repo = GrantRepository(session)
         self.payment_service = payment_service or PaymentService()
+        self.proof_storage = proof_storage or ProofStorage()
         self.user_repo = UserRepository(session)
+        self.rollups = RollupRepository(session)
+        # Services are built per request, so membership probes are cached for the request only.
+        self._role_cache: dict[tuple[UUID, UUID, frozenset[str]], bool] = {}
+        # State changes are published to subscribers only once the transaction that made them commits.
+        self._pending_events: list[GrantEvent] = []
+        # Writes to a known part of a program edit its stored document instead of rebuilding it at commit.
+        self._document_patches: dict[UUID, DocumentPatch] = {}
 
     async def create_program(self, payload: GrantProgramCreate, current_user: User) -> GrantProgramRead:
         self._validate_stage_order(payload)
@@ -36,12 +98,13 @@ class GrantService:
             name=payload.name,
             bank_account_number=payload.bank_account_number,
             grantor_id=current_user.id,
+            payout_policy=payload.payout_policy,
         )
         program.participants.append(UserToGrant(user_id=current_user.id, role="grantor"))
 
         unique_participants: dict[UUID, GrantParticipantCreate] = {}
-        for participant in payload.participants:
-            resolved_id = await self._resolve_user_identifier(participant)
+        resolved_ids = await self._resolve_user_identifiers(payload.participants)
+        for participant, resolved_id in zip(payload.participants, resolved_ids):
             if resolved_id in unique_participants:
                 continue
             if resolved_id == current_user.id:
@@ -51,21 +114,235 @@ class GrantService:
         for participant_id, participant in unique_participants.items():
             program.participants.append(UserToGrant(user_id=participant_id, role=participant.role))
 
+        contract_links = await self._resolve_contract_links(payload.stages)
         for stage_payload in sorted(payload.stages, key=lambda s: s.order):
-            stage = Stage(order=stage_payload.order, amount=stage_payload.amount)
+            stage = Stage(
+                order=stage_payload.order, amount=Decimal(str(stage_payload.amount)), due_at=stage_payload.due_at
+            )
             for req_payload in stage_payload.requirements:
-                requirement = Requirement(name=req_payload.name, description=req_payload.description)
+                requirement = Requirement(
+                    name=req_payload.name,
+                    description=req_payload.description,
+                    payment_contract_id=contract_links[id(req_payload)],
+                )
                 stage.requirements.append(requirement)
             program.stages.append(stage)
+        program.total_amount = sum((stage.amount for stage in program.stages), Decimal(0))
+        program.pending_requirements = sum(len(stage.requirements) for stage in program.stages)
 
         await self.repo.create(program)
-        await self.session.commit()
+        self._emit_membership("program.created", program, current_user, name=program.name)
+        await self._commit()
         reloaded = await self.repo.get(program.id)
-        return GrantProgramRead.model_validate(reloaded, from_attributes=True)
+        return load_program(reloaded)
+
+    async def create_template(self, payload: GrantTemplateCreate, current_user: User) -> GrantTemplateRead:
+        self._validate_stage_order(payload)
+        template = GrantTemplate(name=payload.name, grantor_id=current_user.id)
+        contract_links = await self._resolve_contract_links(payload.stages)
+        for stage_payload in sorted(payload.stages, key=lambda s: s.order):
+            stage = GrantTemplateStage(order=stage_payload.order, amount=Decimal(str(stage_payload.amount)))
+            for req_payload in stage_payload.requirements:
+                stage.requirements.append(
+                    GrantTemplateRequirement(
+                        name=req_payload.name,
+                        description=req_payload.description,
+                        payment_contract_id=contract_links[id(req_payload)],
+                    )
+                )
+            template.stages.append(stage)
+        await self.repo.create_template(template)
+        await self._commit()
+        reloaded = await self.repo.get_template(template.id)
+        return GrantTemplateRead.model_validate(reloaded, from_attributes=True)
+
+    async def list_templates(self, current_user: User) -> list[GrantTemplateRead]:
+        templates = await self.repo.list_templates(current_user.id)
+        return [GrantTemplateRead.model_validate(template, from_attributes=True) for template in templates]
+
+    async def clone_template(
+        self, template_id: str, payload: GrantTemplateClone, current_user: User
+    ) -> list[GrantProgramRead]:
+        template_uuid = self._parse_uuid(template_id)
+        summary = await self.repo.get_template_summary(template_uuid)
+        if not summary:
+            raise HTTPException(status_code=status.HTTP_404_NOT_FOUND, detail="Template not found")
+        if summary.grantor_id != current_user.id:
+            raise HTTPException(status_code=status.HTTP_403_FORBIDDEN, detail="Insufficient permissions")
+
+        resolved_ids = iter(
+            await self._resolve_user_identifiers([p for item in payload.programs for p in item.participants])
+        )
+        programs: list[dict[str, Any]] = []
+        memberships: list[dict[str, Any]] = []
+        for item in payload.programs:
+            program_id = uuid4()
+            programs.append(
+                {
+                    "id": program_id,
+                    "name": item.name,
+                    "bank_account_number": item.bank_account_number,
+                    "status": "draft",
+                    "grantor_id": current_user.id,
+                    "total_amount": summary.total_amount,
+                    "pending_requirements": summary.requirement_count,
+                }
+            )
+            roles = {current_user.id: "grantor"}
+            for participant in item.participants:
+                roles.setdefault(next(resolved_ids), participant.role)
+            memberships.extend(
+                {"grant_program_id": program_id, "user_id": user_id, "role": role} for user_id, role in roles.items()
+            )
+            self._pending_events.append(
+                GrantEvent(
+                    "program.created",
+                    program_id,
+                    {"name": item.name, "template_id": str(template_uuid)},
+                    frozenset(roles),
+                    current_user.id,
+                )
+            )
+
+        await self.repo.clone_template(template_uuid, programs, memberships)
+        await self._commit()
+        created = {program.id: program for program in await self.repo.list_by_ids(p["id"] for p in programs)}
+        return load_programs(created[p["id"]] for p in programs)
+
+    async def list_programs(
+        self,
+        current_user: User,
+        status: str | None = None,
+        order_by: str | None = None,
+        ids: list[UUID] | None = None,
+        include_archived: bool = False,
+    ) -> list[GrantProgramRead]:
+        """
+        Programs visible to the user. With `ids`, only those programs, in the requested order; ids that
+        do not exist or are not visible are left out. Archived programs are only read with `include_archived`.
+        """
+        programs: list[Any] = await self.repo.list_for_user(
+            current_user.id, status=status, order_by=order_by, ids=ids
+        )
+        if include_archived:
+            programs += await self.repo.list_archived_for_user(current_user.id, status=status, ids=ids)
+            if order_by:
+                programs.sort(key=lambda program: (*_ordering_key(program, order_by), str(program.id)))
+        if ids is not None and not order_by:
+            by_id = {program.id: program for program in programs}
+            programs = [by_id[program_id] for program_id in dict.fromkeys(ids) if program_id in by_id]
+        return load_programs(programs)
+
+    async def list_programs_etag(
+        self,
+        current_user: User,
+        status: str | None = None,
+        order_by: str | None = None,
+        ids: list[UUID] | None = None,
+        include_archived: bool = False,
+    ) -> str:
+        """
+        ETag for `list_programs` from one id/version probe. Every write that changes a program's
+        serialized form bumps its version, so unchanged lists can be answered with 304.
+        """
+        versions = await self.repo.list_versions_for_user(current_user.id, status=status, ids=ids)
+        if include_archived:
+            versions += await self.repo.list_archived_versions_for_user(current_user.id, status=status, ids=ids)
+        return compute_etag(
+            [
+                current_user.id,
+                status,
+                order_by,
+                ids,
+                include_archived,
+                *(f"{pid}:{version}" for pid, version in versions),
+            ]
+        )
+
+    async def list_pending_actions(self, current_user: User, limit: int = 100) -> list[PendingActionRead]:
+        rows = await self.repo.list_pending_actions(current_user.id, limit)
+        return [PendingActionRead.model_validate(row._mapping) for row in rows]
+
+    async def list_overdue_stages(self, current_user: User, limit: int = 100) -> list[OverdueStageRead]:
+        rows = await self.repo.list_overdue_for_user(current_user.id, datetime.now(timezone.utc), limit)
+        return [OverdueStageRead.model_validate(row._mapping) for row in rows]
+
+    async def search(self, query: str, current_user: User, limit: int = 20) -> SearchResultsRead:
+        terms = search_terms(query)
+        if not terms:
+            raise HTTPException(status_code=status.HTTP_400_BAD_REQUEST, detail="Search query has no words")
+        programs = await self.repo.search_programs(current_user.id, terms, limit)
+        requirements = await self.repo.search_requirements(current_user.id, terms, limit)
+        return SearchResultsRead(
+            programs=[ProgramSearchHit.model_validate(row._mapping) for row in programs],
+            requirements=[RequirementSearchHit.model_validate(row._mapping) for row in requirements],
+        )
+
+    async def get_program_json(
+        self, grant_program_id: str, current_user: User, include_archived: bool = False
+    ) -> bytes:
+        """The program response as JSON, served from the stored read-model document without loading the program."""
+        program_id = self._parse_uuid(grant_program_id)
+        if include_archived and await self._archived_version(program_id, current_user) is not None:
+            return dump_program(load_program(await self.repo.get_archived(program_id)))
+        document = await self.repo.get_document(program_id)
+        # Existence first, so an unknown id is a 404 rather than a failed membership check.
+        if document is None and await self.repo.get_version(program_id) is None:
+            raise HTTPException(status_code=status.HTTP_404_NOT_FOUND, detail="Grant program not found")
+        await self._ensure_role(program_id, current_user, allowed_roles=["grantor", "supervisor", "grantee"])
+        if document is None:
+            # Programs last written before `commands rebuild-documents` ran.
+            program = await self.repo.get(program_id)
+            if not program:
+                raise HTTPException(status_code=status.HTTP_404_NOT_FOUND, detail="Grant program not found")
+            document = dump_program(load_program(program))
+        return document
+
+    async def get_program_etag(
+        self, grant_program_id: str, current_user: User, include_archived: bool = False
+    ) -> str:
+        """ETag for `get_program_json` from a version probe and the membership check, before any children load."""
+        program_id = self._parse_uuid(grant_program_id)
+        if include_archived:
+            archived_version = await self._archived_version(program_id, current_user)
+            if archived_version is not None:
+                return compute_etag([program_id, archived_version, "archived"])
+        version = await self.repo.get_version(program_id)
+        if version is None:
+            raise HTTPException(status_code=status.HTTP_404_NOT_FOUND, detail="Grant program not found")
+        await self._ensure_role(program_id, current_user, allowed_roles=["grantor", "supervisor", "grantee"])
+        return compute_etag([program_id, version])
+
+    async def _archived_version(self, program_id: UUID, current_user: User) -> int | None:
+        """Version of the program if it is archived (403 if the user had no part in it), else None."""
+        access = await self.repo.get_archived_access(program_id, current_user.id)
+        if access is None:
+            return None
+        version, allowed = access
+        if not allowed:
+            raise HTTPException(status_code=status.HTTP_403_FORBIDDEN, detail="Insufficient permissions")
+        return version
 
-    async def list_programs(self, current_user: User) -> list[GrantProgramRead]:
-        programs = await self.repo.list_for_user(current_user.id)
-        return [GrantProgramRead.model_validate(p) for p in programs]
+    @staticmethod
+    def parse_program_ids(raw: str) -> list[UUID]:
+        ids = [GrantService._parse_uuid(value.strip()) for value in raw.split(",") if value.strip()]
+        if not ids or len(ids) > MAX_PROGRAM_IDS:
+            raise HTTPException(
+                status_code=status.HTTP_400_BAD_REQUEST,
+                detail=f"ids must list between 1 and {MAX_PROGRAM_IDS} grant program ids",
+            )
+        return ids
+
+    async def visible_program_ids(self, current_user: User) -> list[UUID]:
+        return [program_id for program_id, _ in await self.repo.list_versions_for_user(current_user.id)]
+
+    async def list_events(
+        self, grant_program_id: str, current_user: User, before: int | None = None, limit: int = 50
+    ) -> list[GrantEventRead]:
+        program_id = self._parse_uuid(grant_program_id)
+        await self._ensure_role(program_id, current_user, allowed_roles=["grantor", "supervisor", "grantee"])
+        events = await self.repo.list_events(program_id, before_id=before, limit=limit)
+        return [GrantEventRead.model_validate(event, from_attributes=True) for event in events]
 
     async def confirm_program(self, grant_program_id: str, current_user: User) -> GrantProgramRead:
         program_id = self._parse_uuid(grant_program_id)
@@ -73,26 +350,54 @@ class GrantService:
         if not program:
             raise HTTPException(status_code=status.HTTP_404_NOT_FOUND, detail="Grant not found")
 
-        self._ensure_role(program, current_user, allowed_roles=["grantor"])
-        if program.status != "draft":
+        await self._ensure_role(program.id, current_user, allowed_roles=["grantor"], grantor_id=program.grantor_id)
+        if program.status not in {"draft", "confirming"}:
             raise HTTPException(status_code=status.HTTP_400_BAD_REQUEST, detail="Grant already confirmed")
         if not program.stages:
             raise HTTPException(status_code=status.HTTP_400_BAD_REQUEST, detail="Stages must be configured")
 
-        total_amount = sum(float(stage.amount) for stage in program.stages)
-        deposit_result = await self.payment_service.deposit_grant(
-            participant_id=settings.app_bank_account_number, amount=total_amount
-        )
+        # The deposit is an HTTP call, so no row lock is held across it: a draft -> confirming claim commits
+        # first, and a second short transaction finalizes or releases it. A concurrent confirm of the draft
+        # gets a 409. A claim left `confirming` by an unanswered deposit is confirmed again under the same
+        # idempotency key, so the bank answers with the first deposit if it went through.
+        confirmed_at = program.confirmed_at
+        if program.status == "draft":
+            confirmed_at = datetime.now(timezone.utc)
+            if not await self.repo.transition_program(program.id, "draft", "confirming", confirmed_at=confirmed_at):
+                await self._raise_conflict()
+            await self.repo.refresh_documents([program.id])
+            await self.session.commit()
+        try:
+            deposit_result = await self.payment_service.deposit_grant(
+                participant_id=settings.app_bank_account_number,
+                amount=float(program.total_amount),
+                idempotency_key=_deposit_key(program.id, confirmed_at),
+            )
+        except Exception:
+            logger.exception("Deposit for grant %s got no answer", program.id)
+            raise HTTPException(
+                status_code=status.HTTP_502_BAD_GATEWAY, detail="Grant deposit did not complete, confirm again"
+            )
         if deposit_result.status not in {"deposited", "completed"}:
+            await self.repo.transition_program(program.id, "confirming", "draft", confirmed_at=None)
+            await self.repo.refresh_documents([program.id])
+            await self.session.commit()
             raise HTTPException(status_code=status.HTTP_502_BAD_GATEWAY, detail="Grant deposit failed")
 
-        program.status = "active"
+        if not await self.repo.transition_program(program.id, "confirming", "active"):
+            await self._raise_conflict()
         for index, stage in enumerate(sorted(program.stages, key=lambda s: s.order)):
             stage.completion_status = "active" if index == 0 else "pending"
-
-        await self.session.commit()
+            if index == 0:
+                self._emit("stage.activated", program.id, current_user, stage_id=stage.id)
+                await self._emit_missed_deadline(stage)
+        self._emit("program.confirmed", program.id, current_user, status="active")
+        await self.rollups.add(
+            confirmed_at, program.grantor_id, "active", committed_amount=program.total_amount, programs_confirmed=1
+        )
+        await self._commit()
         reloaded = await self.repo.get(program.id)
-        return GrantProgramRead.model_validate(reloaded, from_attributes=True)
+        return load_program(reloaded)
 
     async def invite_participant(
         self, grant_program_id: str, payload: GrantParticipantCreate, current_user: User
@@ -102,11 +407,11 @@ class GrantService:
         if not program:
             raise HTTPException(status_code=status.HTTP_404_NOT_FOUND, detail="Grant not found")
 
-        self._ensure_role(program, current_user, allowed_roles=["grantor"])
+        await self._ensure_role(program.id, current_user, allowed_roles=["grantor"], grantor_id=program.grantor_id)
         if payload.user_id == str(current_user.id):
             raise HTTPException(status_code=status.HTTP_400_BAD_REQUEST, detail="Grantor already assigned")
 
-        participant_uuid = await self._resolve_user_identifier(payload)
+        [participant_uuid] = await self._resolve_user_identifiers([payload])
         existing = next((p for p in program.participants if p.user_id == participant_uuid), None)
         if existing:
             if not existing.active:
@@ -117,7 +422,46 @@ class GrantService:
         else:
             program.participants.append(UserToGrant(user_id=participant_uuid, role=payload.role))
 
-        await self.session.commit()
+        await self.repo.touch(program.id)
+        self._emit_membership(
+            "participants.changed", program, current_user, invited=[{"user_id": participant_uuid, "role": payload.role}]
+        )
+        await self._commit()
+        reloaded = await self.repo.get(program.id)
+        return [GrantParticipantRead.model_validate(p, from_attributes=True) for p in reloaded.participants]
+
+    async def invite_participants(
+        self, grant_program_id: str, payload: GrantParticipantBulkCreate, current_user: User
+    ) -> list[GrantParticipantRead]:
+        program_id = self._parse_uuid(grant_program_id)
+        program = await self.repo.get(program_id)
+        if not program:
+            raise HTTPException(status_code=status.HTTP_404_NOT_FOUND, detail="Grant not found")
+
+        await self._ensure_role(program.id, current_user, allowed_roles=["grantor"], grantor_id=program.grantor_id)
+        resolved_ids = await self._resolve_user_identifiers(payload.participants)
+
+        # Bulk invites are idempotent: the grantor and already active participants are skipped.
+        existing_by_user = {p.user_id: p for p in program.participants}
+        invited: list[dict[str, Any]] = []
+        for participant, participant_uuid in zip(payload.participants, resolved_ids):
+            if participant_uuid == program.grantor_id:
+                continue
+            existing = existing_by_user.get(participant_uuid)
+            if existing:
+                if not existing.active:
+                    existing.active = True
+                    existing.role = participant.role
+                    invited.append({"user_id": participant_uuid, "role": participant.role})
+                continue
+            new_participant = UserToGrant(user_id=participant_uuid, role=participant.role)
+            program.participants.append(new_participant)
+            existing_by_user[participant_uuid] = new_participant
+            invited.append({"user_id": participant_uuid, "role": participant.role})
+
+        await self.repo.touch(program.id)
+        self._emit_membership("participants.changed", program, current_user, invited=invited)
+        await self._commit()
         reloaded = await self.repo.get(program.id)
         return [GrantParticipantRead.model_validate(p, from_attributes=True) for p in reloaded.participants]
 
@@ -130,14 +474,18 @@ class GrantService:
         if not program:
             raise HTTPException(status_code=status.HTTP_404_NOT_FOUND, detail="Grant not found")
 
-        self._ensure_role(program, current_user, allowed_roles=["grantor"])
+        await self._ensure_role(program.id, current_user, allowed_roles=["grantor"], grantor_id=program.grantor_id)
         participant = next((p for p in program.participants if p.id == participant_uuid), None)
         if not participant:
             raise HTTPException(status_code=status.HTTP_404_NOT_FOUND, detail="Participant not found")
         if participant.role == "grantor":
             raise HTTPException(status_code=status.HTTP_400_BAD_REQUEST, detail="Cannot change grantor role")
         participant.role = payload.role
-        await self.session.commit()
+        await self.repo.touch(program.id)
+        self._emit_membership(
+            "participants.changed", program, current_user, updated=[{"user_id": participant.user_id, "role": payload.role}]
+        )
+        await self._commit()
         reloaded = await self.repo.get(program.id)
         return [GrantParticipantRead.model_validate(p, from_attributes=True) for p in reloaded.participants]
 
@@ -150,7 +498,7 @@ class GrantService:
         if not program:
             raise HTTPException(status_code=status.HTTP_404_NOT_FOUND, detail="Grant not found")
 
-        self._ensure_role(program, current_user, allowed_roles=["grantor"])
+        await self._ensure_role(program.id, current_user, allowed_roles=["grantor"], grantor_id=program.grantor_id)
         if program.grantor_id == participant_uuid:
             raise HTTPException(status_code=status.HTTP_400_BAD_REQUEST, detail="Cannot remove grantor")
 
@@ -159,54 +507,121 @@ class GrantService:
             raise HTTPException(status_code=status.HTTP_404_NOT_FOUND, detail="Participant not found")
 
         await self.session.delete(participant)
-        await self.session.commit()
+        await self.repo.touch(program.id)
+        self._emit_membership(
+            "participants.changed", program, current_user, exclude=participant, removed=[participant.user_id]
+        )
+        await self._commit()
         reloaded = await self.repo.get(program.id)
         return [GrantParticipantRead.model_validate(p, from_attributes=True) for p in reloaded.participants]
 
     async def complete_requirement(self, requirement_id: str, current_user: User) -> RequirementRead:
         requirement_uuid = self._parse_uuid(requirement_id)
-        requirement = await self.repo.get_requirement(requirement_uuid)
-        if not requirement:
+        context = await self.repo.get_requirement_context(requirement_uuid)
+        if not context:
             raise HTTPException(status_code=status.HTTP_404_NOT_FOUND, detail="Requirement not found")
 
-        program = requirement.stage.grant_program
-        self._ensure_role(program, current_user, allowed_roles=["grantor", "supervisor"])
-        if requirement.stage.completion_status != "active":
+        requirement = context.requirement
+        await self._ensure_role(
+            context.grant_program_id,
+            current_user,
+            allowed_roles=["grantor", "supervisor"],
+            grantor_id=context.grantor_id,
+        )
+        if context.stage_status != "active":
             raise HTTPException(status_code=status.HTTP_400_BAD_REQUEST, detail="Stage is not active")
         if not requirement.proof_url:
             raise HTTPException(status_code=status.HTTP_400_BAD_REQUEST, detail="Proof not submitted yet")
-        requirement.status = "completed"
+        if requirement.status == "completed":
+            return RequirementRead.model_validate(requirement, from_attributes=True)
+        if not await self.repo.complete_requirement(requirement.id, requirement.version):
+            await self._raise_conflict()
+        await self.repo.apply_progress(context.grant_program_id, pending_requirements=-1)
+        self._emit(
+            "requirement.completed",
+            context.grant_program_id,
+            current_user,
+            requirement_id=requirement.id,
+            stage_id=requirement.stage_id,
+        )
+        completed = RequirementRead.model_validate(requirement, from_attributes=True)
+        completed.status = "completed"
 
-        await self.session.commit()
-        await self.session.refresh(requirement)
-        return RequirementRead.model_validate(requirement, from_attributes=True)
+        def edit(program: GrantProgramRead) -> None:
+            replace_requirement(program, completed)
+            program.pending_requirements -= 1
+
+        self._patch_document(context.grant_program_id, context.program_version, context.stored_document, edit)
+        await self._commit()
+        return completed
 
     async def submit_requirement_proof(
         self, requirement_id: str, payload: RequirementProofSubmit, current_user: User
     ) -> RequirementRead:
+        context = await self._get_proof_context(requirement_id, current_user)
+        return await self._record_proof(context, payload.proof_url, current_user)
+
+    async def upload_requirement_proof(
+        self, requirement_id: str, request: Request, current_user: User
+    ) -> RequirementRead:
+        # The body is still unread here: oversized or unauthorized uploads are refused before they are sent.
+        self.proof_storage.check_content_length(request.headers.get("content-length"))
+        context = await self._get_proof_context(requirement_id, current_user)
+        # End the read transaction before the copy; the requirement's version check guards the write after it.
+        await self.session.commit()
+        digest = await self.proof_storage.save(upload_chunks(request))
+        return await self._record_proof(context, proof_url(digest), current_user)
+
+    async def get_proof_path(self, digest: str, current_user: User) -> Path:
+        path = self.proof_storage.path_for(digest)
+        if not await self.repo.can_view_proof(proof_url(digest), current_user.id) or not path.is_file():
+            raise HTTPException(status_code=status.HTTP_404_NOT_FOUND, detail="Proof not found")
+        return path
+
+    async def _get_proof_context(self, requirement_id: str, current_user: User) -> RequirementContext:
         requirement_uuid = self._parse_uuid(requirement_id)
-        requirement = await self.repo.get_requirement(requirement_uuid)
-        if not requirement:
+        context = await self.repo.get_requirement_context(requirement_uuid)
+        if not context:
             raise HTTPException(status_code=status.HTTP_404_NOT_FOUND, detail="Requirement not found")
 
-        if requirement.description and str(requirement.description).startswith("payment_contract_id:"):
+        requirement = context.requirement
+        if requirement.payment_contract_id is not None:
             raise HTTPException(
                 status_code=status.HTTP_400_BAD_REQUEST,
                 detail="Proof cannot be submitted for smart-contract enforced stages",
             )
 
-        program = requirement.stage.grant_program
-        self._ensure_role(program, current_user, allowed_roles=["grantee"])
-        if program.status != "active" or requirement.stage.completion_status != "active":
+        await self._ensure_role(
+            context.grant_program_id, current_user, allowed_roles=["grantee"], grantor_id=context.grantor_id
+        )
+        if context.program_status != "active" or context.stage_status != "active":
             raise HTTPException(status_code=status.HTTP_400_BAD_REQUEST, detail="Stage is not active")
         if requirement.status == "completed":
             raise HTTPException(status_code=status.HTTP_400_BAD_REQUEST, detail="Requirement already completed")
+        return context
 
-        requirement.proof_url = payload.proof_url
+    async def _record_proof(self, context: RequirementContext, url: str, current_user: User) -> RequirementRead:
+        requirement = context.requirement
+        requirement.proof_url = url
         requirement.proof_submitted_by = current_user.id
-        await self.session.commit()
-        await self.session.refresh(requirement)
-        return RequirementRead.model_validate(requirement, from_attributes=True)
+        await self.repo.touch(context.grant_program_id)
+        self._emit(
+            "requirement.proof_submitted",
+            context.grant_program_id,
+            current_user,
+            requirement_id=requirement.id,
+            stage_id=requirement.stage_id,
+            proof_url=url,
+        )
+        submitted = RequirementRead.model_validate(requirement, from_attributes=True)
+        self._patch_document(
+            context.grant_program_id,
+            context.program_version,
+            context.stored_document,
+            lambda program: replace_requirement(program, submitted),
+        )
+        await self._commit()
+        return submitted
 
     async def complete_stage(self, stage_id: str, current_user: User) -> StageRead:
         stage_uuid = self._parse_uuid(stage_id)
@@ -215,11 +630,9 @@ class GrantService:
             raise HTTPException(status_code=status.HTTP_404_NOT_FOUND, detail="Stage not found")
 
         program = stage.grant_program
-        contract_requirement = any(
-            req.description and str(req.description).startswith("payment_contract_id:") for req in stage.requirements
-        )
+        contract_requirement = any(req.payment_contract_id is not None for req in stage.requirements)
         allowed_roles = ["grantor", "supervisor"] + (["grantee"] if contract_requirement else [])
-        self._ensure_role(program, current_user, allowed_roles=allowed_roles)
+        await self._ensure_role(program.id, current_user, allowed_roles=allowed_roles, grantor_id=program.grantor_id)
         if program.status != "active":
             raise HTTPException(status_code=status.HTTP_400_BAD_REQUEST, detail="Grant is not active")
         if stage.completion_status != "active":
@@ -231,26 +644,133 @@ class GrantService:
                 status_code=status.HTTP_400_BAD_REQUEST, detail="Cannot complete stage with pending requirements"
             )
 
-        stage.completion_status = "completed"
+        program_version = program.version
+        stored_document = await self.repo.get_stored_document(program.id)
+        completed_at = datetime.now(timezone.utc)
+        if not await self.repo.transition_stage(stage.id, "active", "completed", completed_at=completed_at):
+            await self._raise_conflict()
         next_stage = self._get_next_stage(program, stage.order)
         if next_stage:
-            next_stage.completion_status = "active"
+            activated = await self.repo.transition_stage(next_stage.id, "pending", "active")
         else:
-            program.status = "completed"
+            activated = await self.repo.transition_program(
+                program.id, "active", "completed", completed_at=completed_at
+            )
+        if not activated:
+            await self._raise_conflict()
+        await self.repo.apply_progress(program.id, completed_stages=1, disbursed_amount=stage.amount)
+        await self.rollups.add(
+            completed_at,
+            program.grantor_id,
+            "active",
+            disbursed_amount=stage.amount,
+            stages_completed=1,
+            programs_completed=0 if next_stage else 1,
+        )
+        if not next_stage:
+            await self.rollups.move_program(program.id, "active", "completed")
+        # Dated payouts are written in the completing transaction, so a committed stage always has its payout.
+        due_at = None if contract_requirement else payout_due_at(program.payout_policy, completed_at)
+        if due_at is not None:
+            PayoutScheduleRepository(self.session).schedule(stage, program, due_at)
+        self._emit(
+            "stage.completed",
+            program.id,
+            current_user,
+            stage_id=stage.id,
+            amount=str(stage.amount),
+            payout_due_at=due_at,
+        )
+        if next_stage:
+            self._emit("stage.activated", program.id, current_user, stage_id=next_stage.id)
+            await self._emit_missed_deadline(next_stage)
+        else:
+            self._emit("program.completed", program.id, current_user, status="completed")
 
-        await self.session.commit()
-        await self.session.refresh(stage)
+        def edit(document: GrantProgramRead) -> None:
+            find_stage(document, stage.id).completion_status = "completed"
+            if next_stage:
+                find_stage(document, next_stage.id).completion_status = "active"
+            else:
+                document.status = "completed"
+            document.completed_stages += 1
+            # Through the float's shortest repr, so the sum matches a rebuild from the NUMERIC column.
+            document.disbursed_amount = float(Decimal(str(document.disbursed_amount)) + stage.amount)
+
+        self._patch_document(program.id, program_version, stored_document, edit)
+        await self._commit()
 
-        if not contract_requirement:
+        if due_at is not None:
+            payout_scheduler.notify(due_at)
+        elif not contract_requirement:
             await self.payment_service.send_stage_payout(stage)
         return StageRead.model_validate(stage, from_attributes=True)
 
-    async def _ensure_user_exists(self, user_id: str) -> UUID:
-        parsed_id = self._parse_uuid(user_id)
-        exists = await self.user_repo.get_by_id(parsed_id)
-        if not exists:
-            raise HTTPException(status_code=status.HTTP_404_NOT_FOUND, detail="User not found")
-        return parsed_id
+    async def _commit(self) -> None:
+        events, self._pending_events = self._pending_events, []
+        patches, self._document_patches = self._document_patches, {}
+        unrecorded = await grant_events.stage(self.session, events)
+        try:
+            # Every write emits an event for its program, so the read model commits with the change.
+            stale = {event.grant_program_id for event in events}
+            for grant_program_id, patch in patches.items():
+                if await self._apply_patch(grant_program_id, patch):
+                    stale.discard(grant_program_id)
+            await self.repo.refresh_documents(stale)
+            await audit_log.stage(self.session, unrecorded)
+            await self.session.commit()
+        except StaleDataError:
+            await self._raise_conflict()
+        grant_events.dispatch(events)
+        audit_log.notify()
+
+    def _patch_document(
+        self,
+        grant_program_id: UUID,
+        program_version: int,
+        stored: Optional[StoredDocument],
+        edit: Callable[[GrantProgramRead], None],
+    ) -> None:
+        """
+        Edit the program's stored document at commit instead of rebuilding it. `program_version` is the version
+        read before this write; a missing document, or one behind that version, is left to the rebuild.
+        """
+        if stored is None or stored.version != program_version:
+            return
+        patch = self._document_patches.setdefault(grant_program_id, DocumentPatch(stored.version, stored.document))
+        patch.edits.append(edit)
+
+    async def _apply_patch(self, grant_program_id: UUID, patch: DocumentPatch) -> bool:
+        try:
+            document = patch.apply()
+        except LookupError:
+            return False
+        return await self.repo.patch_document(grant_program_id, patch.base_version, document)
+
+    async def _rollback(self) -> None:
+        self._pending_events.clear()
+        self._document_patches.clear()
+        await self.session.rollback()
+
+    async def _raise_conflict(self) -> NoReturn:
+        await self._rollback()
+        raise HTTPException(
+            status_code=status.HTTP_409_CONFLICT, detail="Grant was modified concurrently, retry the request"
+        )
+
+    def _emit(self, kind: str, grant_program_id: UUID, actor: User, **data: Any) -> None:
+        self._pending_events.append(GrantEvent(kind, grant_program_id, _jsonable(data), actor_id=actor.id))
+
+    async def _emit_missed_deadline(self, stage: Stage) -> None:
+        """Report a stage activated after its deadline, when the overdue sweeper has already passed it."""
+        if stage.due_at is not None and await swept_past(self.session, stage.id, stage.due_at):
+            self._pending_events.append(overdue_event(stage.grant_program_id, stage.id, stage.order, stage.due_at))
+
+    def _emit_membership(
+        self, kind: str, program: GrantProgram, actor: User, exclude: UserToGrant | None = None, **data: Any
+    ) -> None:
+        audience = frozenset(p.user_id for p in program.participants if p.active and p is not exclude)
+        self._pending_events.append(GrantEvent(kind, program.id, _jsonable(data), audience, actor.id))
 
     @staticmethod
     def _parse_uuid(user_id: str) -> UUID:
@@ -259,13 +779,18 @@ class GrantService:
         except ValueError:
             raise HTTPException(status_code=status.HTTP_400_BAD_REQUEST, detail="Invalid user id")
 
-    def _ensure_role(self, program: GrantProgram, user: User, allowed_roles: list[str]) -> None:
-        if program.grantor_id == user.id and "grantor" in allowed_roles:
-            return
-        participant_roles = [p.role for p in program.participants if str(p.user_id) == str(user.id) and p.active]
-        if any(role in allowed_roles for role in participant_roles):
+    async def _ensure_role(
+        self, grant_program_id: UUID, user: User, allowed_roles: list[str], grantor_id: UUID | None = None
+    ) -> None:
+        if grantor_id == user.id and "grantor" in allowed_roles:
             return
-        raise HTTPException(status_code=status.HTTP_403_FORBIDDEN, detail="Insufficient permissions")
+        key = (grant_program_id, user.id, frozenset(allowed_roles))
+        allowed = self._role_cache.get(key)
+        if allowed is None:
+            allowed = await self.repo.has_active_role(grant_program_id, user.id, allowed_roles)
+            self._role_cache[key] = allowed
+        if not allowed:
+            raise HTTPException(status_code=status.HTTP_403_FORBIDDEN, detail="Insufficient permissions")
 
     async def update_bank_account(
         self, grant_program_id: str, payload: GrantBankAccountUpdate, current_user: User
@@ -274,21 +799,75 @@ class GrantService:
         program = await self.repo.get(program_id)
         if not program:
             raise HTTPException(status_code=status.HTTP_404_NOT_FOUND, detail="Grant not found")
-        self._ensure_role(program, current_user, allowed_roles=["grantor"])
+        await self._ensure_role(program.id, current_user, allowed_roles=["grantor"], grantor_id=program.grantor_id)
         program.bank_account_number = payload.bank_account_number
-        await self.session.commit()
+        self._emit("program.bank_account_updated", program.id, current_user)
+        await self._commit()
         await self.session.refresh(program)
-        return GrantProgramRead.model_validate(program, from_attributes=True)
-
-    async def _resolve_user_identifier(self, participant: GrantParticipantCreate) -> UUID:
-        if participant.user_email:
-            user = await self.user_repo.get_by_email(participant.user_email)
-            if not user:
-                raise HTTPException(status_code=status.HTTP_404_NOT_FOUND, detail="User not found")
-            return user.id
-        if participant.user_id:
-            return await self._ensure_user_exists(participant.user_id)
-        raise HTTPException(status_code=status.HTTP_400_BAD_REQUEST, detail="User identifier missing")
+        return load_program(program)
+
+    async def _resolve_user_identifiers(self, participants: Sequence[GrantParticipantCreate]) -> list[UUID]:
+        """
+        Resolve participants to user ids, preserving input order. Emails and ids are each
+        looked up with a single IN query; every unknown identifier is listed in the 404.
+        """
+        emails = {p.user_email for p in participants if p.user_email}
+        ids = {self._parse_uuid(p.user_id) for p in participants if not p.user_email and p.user_id}
+        users_by_email = {u.email: u.id for u in await self.user_repo.list_by_emails(emails)} if emails else {}
+        existing_ids = await self.user_repo.list_existing_ids(ids) if ids else set()
+
+        resolved: list[UUID] = []
+        missing: list[str] = []
+        for participant in participants:
+            if participant.user_email:
+                user_id = users_by_email.get(participant.user_email)
+                if user_id is None:
+                    missing.append(participant.user_email)
+                else:
+                    resolved.append(user_id)
+            elif participant.user_id:
+                parsed_id = self._parse_uuid(participant.user_id)
+                if parsed_id not in existing_ids:
+                    missing.append(participant.user_id)
+                else:
+                    resolved.append(parsed_id)
+            else:
+                raise HTTPException(status_code=status.HTTP_400_BAD_REQUEST, detail="User identifier missing")
+
+        if missing:
+            raise HTTPException(status_code=status.HTTP_404_NOT_FOUND, detail=f"User not found: {', '.join(missing)}")
+        return resolved
+
+    async def _resolve_contract_links(self, stages: Sequence[Any]) -> dict[int, UUID | None]:
+        """
+        Payment contract of each requirement payload (keyed by `id()`), from the explicit field or a
+        `payment_contract_id:<uuid>` description. All referenced contracts are checked with one query.
+        """
+        links: dict[int, UUID | None] = {}
+        for stage_payload in stages:
+            for req_payload in stage_payload.requirements:
+                links[id(req_payload)] = self._contract_link(req_payload)
+        referenced = {contract_id for contract_id in links.values() if contract_id is not None}
+        if referenced:
+            existing = await PaymentContractRepository(self.session).list_existing_ids(referenced)
+            missing = sorted(str(contract_id) for contract_id in referenced - existing)
+            if missing:
+                raise HTTPException(
+                    status_code=status.HTTP_404_NOT_FOUND, detail=f"Payment contract not found: {', '.join(missing)}"
+                )
+        return links
+
+    @staticmethod
+    def _contract_link(requirement: RequirementCreate) -> UUID | None:
+        if requirement.payment_contract_id is not None:
+            return requirement.payment_contract_id
+        description = requirement.description or ""
+        if not description.startswith(CONTRACT_DESCRIPTION_PREFIX):
+            return None
+        try:
+            return UUID(description[len(CONTRACT_DESCRIPTION_PREFIX):].strip())
+        except ValueError:
+            raise HTTPException(status_code=status.HTTP_400_BAD_REQUEST, detail="Invalid payment contract id")
 
     @staticmethod
     def _get_next_stage(program: GrantProgram, current_order: int) -> Stage | None:
@@ -307,3 +886,25 @@ class GrantService:
                 status_code=status.HTTP_400_BAD_REQUEST,
                 detail="Stages must be sequential and start at 1",
             )
+
+
+def _ordering_key(program: Any, order_by: str) -> tuple:
+    """Python twin of PROGRAM_ORDERINGS, for lists merged from the hot and archive tables."""
+    if order_by == "progress":
+        value = program.disbursed_amount / program.total_amount if program.total_amount else None
+    else:
+        value = getattr(program, order_by)
+    # Descending, programs without a value last.
+    return (value is None, -(value or 0))
+
+
+def _jsonable(value: Any) -> Any:
+    if isinstance(value, UUID):
+        return str(value)
+    if isinstance(value, datetime):
+        return value.isoformat()
+    if isinstance(value, dict):
+        return {key: _jsonable(item) for key, item in value.items()}
+    if isinstance(value, list):
+        return [_jsonable(item) for item in value]
+    return value
@@ -0,0 +1,20 @@
+from datetime import datetime, timezone
+
+from sqlalchemy import JSON, Column, DateTime, String
+
+from src.core.database import Base
+
+
+class JobCheckpoint(Base):
+    """Where a resumable batch job stopped; `position` is job-specific."""
+
+    __tablename__ = "job_checkpoints"
+
+    name = Column(String(length=100), primary_key=True)
+    position = Column(JSON, nullable=False)
+    updated_at = Column(
+        DateTime(timezone=True),
+        nullable=False,
+        default=lambda: datetime.now(timezone.utc),
+        onupdate=lambda: datetime.now(timezone.utc),
+    )
@@ -0,0 +1,41 @@
+from typing import Any, Optional
+
+from sqlalchemy import delete, select
+from sqlalchemy.dialects import postgresql, sqlite
+from sqlalchemy.ext.asyncio import AsyncSession
+
+from .models import JobCheckpoint
+
+
+class JobCheckpointRepository:
+    def __init__(self, session: AsyncSession):
+        self.session = session
+
+    async def get(self, name: str, lock: bool = False) -> Optional[dict[str, Any]]:
+        """
+        The saved position. `lock` holds the row until commit so concurrent runs of the job take turns; the row is
+        created first if the job never saved, since there would be nothing to lock otherwise.
+        """
+        if lock:
+            dialect_insert = postgresql.insert if self.session.bind.dialect.name == "postgresql" else sqlite.insert
+            await self.session.execute(
+                dialect_insert(JobCheckpoint)
+                .values(name=name, position={})
+                .on_conflict_do_nothing(index_elements=[JobCheckpoint.name])
+            )
+            stmt = select(JobCheckpoint.position).where(JobCheckpoint.name == name).with_for_update()
+        else:
+            stmt = select(JobCheckpoint.position).where(JobCheckpoint.name == name)
+        result = await self.session.execute(stmt)
+        # An empty position is a row created by a locking read before the job saved anything.
+        return result.scalar_one_or_none() or None
+
+    async def save(self, name: str, position: dict[str, Any]) -> None:
+        checkpoint = await self.session.get(JobCheckpoint, name)
+        if checkpoint is None:
+            self.session.add(JobCheckpoint(name=name, position=position))
+        else:
+            checkpoint.position = position
+
+    async def clear(self, name: str) -> None:
+        await self.session.execute(delete(JobCheckpoint).where(JobCheckpoint.name == name))
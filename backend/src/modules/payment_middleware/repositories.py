@@ -1,4 +1,4 @@
-from typing import List, Optional
+from typing import Iterable, List, Optional
 from uuid import UUID
 
 from sqlalchemy import select
@@ -25,6 +25,12 @@ class PaymentContractRepository:
         result = await self.session.execute(select(PaymentContract).where(PaymentContract.id == contract_id))
         return result.scalar_one_or_none()
 
+    async def list_existing_ids(self, contract_ids: Iterable[UUID]) -> set[UUID]:
+        result = await self.session.execute(
+            select(PaymentContract.id).where(PaymentContract.id.in_(list(contract_ids)))
+        )
+        return set(result.scalars().all())
+
     async def delete(self, contract: PaymentContract) -> None:
         await self.session.delete(contract)
         await self.session.commit()
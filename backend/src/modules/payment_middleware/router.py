@@ -1,4 +1,4 @@
-from typing import List
+from typing import List, Optional
 
 from fastapi import APIRouter, Depends, status
 
@@ -79,9 +79,12 @@ async def process_purchase(
 
 @router.post("/process-purchase-with-contract", response_model=TransactionResponse)
 async def process_purchase_with_contract(
-    contract_id: str, purchase_info: PurchaseInfo, service: PaymentMiddlewareService = Depends(get_service)
+    contract_id: str,
+    purchase_info: PurchaseInfo,
+    stage_id: Optional[str] = None,
+    service: PaymentMiddlewareService = Depends(get_service),
 ) -> TransactionResponse:
-    return await service.process_purchase_with_contract(contract_id, purchase_info)
+    return await service.process_purchase_with_contract(contract_id, purchase_info, stage_id=stage_id)
 
 
 @router.post("/deposit", response_model=TransactionResponse)
@@ -1,5 +1,6 @@
 import uuid
 from datetime import datetime
+from decimal import Decimal
 from typing import Any, Dict, List, Optional
 
 import httpx
@@ -7,6 +8,7 @@ from fastapi import HTTPException, status
 from sqlalchemy.ext.asyncio import AsyncSession
 
 from src.core.config import settings
+from src.modules.grants.repositories import GrantRepository
 from .models import PaymentContract
 from .repositories import PaymentContractRepository
 from .schemas import (
@@ -161,6 +163,7 @@ class RulesEngine:
 
 class PaymentMiddlewareService:
     def __init__(self, session: AsyncSession, bank_client: Optional[BankAPIClient] = None):
+        self.session = session
         self.repo = PaymentContractRepository(session)
         global shared_bank_client
         if shared_bank_client is None:
@@ -245,7 +248,9 @@ class PaymentMiddlewareService:
             )
         return await self.bank_client.payment(purchase_info)
 
-    async def process_purchase_with_contract(self, contract_id: str, purchase_info: PurchaseInfo) -> TransactionResponse:
+    async def process_purchase_with_contract(
+        self, contract_id: str, purchase_info: PurchaseInfo, stage_id: Optional[str] = None
+    ) -> TransactionResponse:
         rules = self.rules_engine.check_purchase(purchase_info)
         if not rules.allowed:
             raise HTTPException(
@@ -265,7 +270,20 @@ class PaymentMiddlewareService:
                 status_code=status.HTTP_400_BAD_REQUEST,
                 detail=f"Insufficient funds. Balance: {balance.balance}, Required: {purchase_info.cost}",
             )
-        return await self.bank_client.payment(purchase_info)
+        if stage_id is None:
+            return await self.bank_client.payment(purchase_info)
+
+        # The budget check and the increment are one statement. The reservation commits before the bank is
+        # called, so no row lock is held across the payment; a failed payment gives the spend back.
+        stage_uuid = self._parse_id(stage_id, "stage")
+        amount = Decimal(str(purchase_info.cost))
+        await self._reserve_stage_spend(stage_uuid, contract.id, amount)
+        await self.session.commit()
+        try:
+            return await self.bank_client.payment(purchase_info)
+        except BaseException:
+            await self._release_stage_spend(stage_uuid, amount)
+            raise
 
     async def deposit(self, request: DepositRequest) -> TransactionResponse:
         return await self.bank_client.deposit(request)
@@ -279,13 +297,45 @@ class PaymentMiddlewareService:
     async def transactions(self, card_number: str) -> List[TransactionResponse]:
         return await self.bank_client.get_transactions(card_number)
 
-    async def _get_contract_or_404(self, contract_id: str) -> PaymentContract:
+    async def _reserve_stage_spend(self, stage_id: uuid.UUID, contract_id: uuid.UUID, amount: Decimal) -> None:
+        grants = GrantRepository(self.session)
+        grant_program_id = await grants.add_stage_spend(stage_id, contract_id, amount)
+        if grant_program_id is not None:
+            # Keeps program ETags and the stored document honest: the stage's serialized spend just changed.
+            await grants.touch(grant_program_id)
+            await grants.refresh_documents([grant_program_id])
+            return
+
+        stage = await grants.get_contract_stage(stage_id, contract_id)
+        if stage is None:
+            raise HTTPException(status_code=status.HTTP_404_NOT_FOUND, detail="Stage is not enforced by this contract")
+        if stage.completion_status != "active":
+            raise HTTPException(status_code=status.HTTP_409_CONFLICT, detail="Stage is not active")
+        remaining = Decimal(stage.amount) - Decimal(stage.spent_amount)
+        raise HTTPException(
+            status_code=status.HTTP_400_BAD_REQUEST,
+            detail=f"Stage budget exceeded. Remaining: {remaining}, Required: {amount}",
+        )
+
+    async def _release_stage_spend(self, stage_id: uuid.UUID, amount: Decimal) -> None:
+        """Compensate a committed reservation whose payment failed, in its own short transaction."""
+        await self.session.rollback()
+        grants = GrantRepository(self.session)
+        grant_program_id = await grants.release_stage_spend(stage_id, amount)
+        if grant_program_id is not None:
+            await grants.touch(grant_program_id)
+            await grants.refresh_documents([grant_program_id])
+        await self.session.commit()
+
+    @staticmethod
+    def _parse_id(value: str, label: str) -> uuid.UUID:
         try:
-            parsed_id = uuid.UUID(str(contract_id))
+            return uuid.UUID(str(value))
         except ValueError:
-            raise HTTPException(status_code=status.HTTP_400_BAD_REQUEST, detail="Invalid contract id")
+            raise HTTPException(status_code=status.HTTP_400_BAD_REQUEST, detail=f"Invalid {label} id")
 
-        contract = await self.repo.get(parsed_id)
+    async def _get_contract_or_404(self, contract_id: str) -> PaymentContract:
+        contract = await self.repo.get(self._parse_id(contract_id, "contract"))
         if not contract:
             raise HTTPException(status_code=status.HTTP_404_NOT_FOUND, detail="Contract not found")
         return contract
@@ -0,0 +1,49 @@
+"""
+Admin commands for the payments module.
+
+    python -m src.modules.payments.commands reconcile-payouts [--restart] [--checkpoint-every 10000]
+
+Discrepancies are printed as one JSON object per line; the summary goes to stderr.
+"""
+import argparse
+import asyncio
+import sys
+from collections import Counter
+
+from sqlalchemy.ext.asyncio import AsyncSession, async_sessionmaker
+
+from src.core.database import SessionLocal
+from .reconciliation import CHECKPOINT_EVERY, PayoutReconciler
+
+
+async def reconcile_payouts(
+    restart: bool = False,
+    checkpoint_every: int = CHECKPOINT_EVERY,
+    session_factory: async_sessionmaker[AsyncSession] = SessionLocal,
+) -> Counter:
+    reconciler = PayoutReconciler(session_factory, checkpoint_every=checkpoint_every)
+    found: Counter = Counter()
+    async for discrepancy in reconciler.run(resume=not restart):
+        found[discrepancy.kind] += 1
+        print(discrepancy.to_json())
+    summary = ", ".join(f"{count} {kind}" for kind, count in sorted(found.items())) or "no discrepancies"
+    print(f"Reconciled {reconciler.stages_checked} stage payout(s): {summary}", file=sys.stderr)
+    return found
+
+
+def main(argv: list[str] | None = None) -> int:
+    parser = argparse.ArgumentParser(prog="python -m src.modules.payments.commands")
+    subcommands = parser.add_subparsers(dest="command", required=True)
+    reconcile = subcommands.add_parser(
+        "reconcile-payouts", help="Match completed stages against the bank transfer statement"
+    )
+    reconcile.add_argument("--restart", action="store_true", help="Ignore the saved checkpoint and start over")
+    reconcile.add_argument("--checkpoint-every", type=int, default=CHECKPOINT_EVERY)
+    args = parser.parse_args(argv)
+
+    found = asyncio.run(reconcile_payouts(args.restart, args.checkpoint_every))
+    return 1 if found else 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -1,3 +1,6 @@
+import json
+from typing import AsyncIterator
+
 import httpx
 
 from src.core.config import settings
@@ -16,7 +19,9 @@ class SimplePaymentGateway:
             response.raise_for_status()
             return response.json()
 
-    async def deposit(self, *, card_number: str, amount: float, reference: str | None = None) -> dict:
+    async def deposit(
+        self, *, card_number: str, amount: float, reference: str | None = None, idempotency_key: str | None = None
+    ) -> dict:
         """
         Top up the app holding account in the bank. Reference is ignored by the fake bank
         but kept for parity with real gateways.
@@ -24,24 +29,31 @@ class SimplePaymentGateway:
         payload = {"card_number": card_number, "amount": amount, "reference": reference}
         async with httpx.AsyncClient() as client:
             response = await client.post(
-                f"{self.base_url}/deposit", headers=self._headers(), json=payload, timeout=30.0
+                f"{self.base_url}/deposit", headers=self._headers(idempotency_key), json=payload, timeout=30.0
             )
             response.raise_for_status()
             return response.json()
 
-    async def send_payment(self, participant_id: str, amount: float, reference: str) -> dict:
+    async def send_payment(
+        self, participant_id: str, amount: float, reference: str, idempotency_key: str | None = None
+    ) -> dict:
         """
         In dev we target the fake_bank, which exposes /transfer instead of /payments.
         We treat participant_id as the destination card/account and use the app holding account as the source.
+        A request repeated with the same `idempotency_key` returns the first transfer instead of paying again.
         """
         payload = {
             "from_card": settings.app_bank_account_number,
             "to_card": participant_id,
             "amount": amount,
             "reference": reference,
+            # The fake bank stores the reference as the transfer description; reconciliation matches on it.
+            "description": reference,
         }
         async with httpx.AsyncClient() as client:
-            response = await client.post(f"{self.base_url}/transfer", headers=self._headers(), json=payload, timeout=30.0)
+            response = await client.post(
+                f"{self.base_url}/transfer", headers=self._headers(idempotency_key), json=payload, timeout=30.0
+            )
             response.raise_for_status()
             return response.json()
 
@@ -53,5 +65,25 @@ class SimplePaymentGateway:
             response.raise_for_status()
             return response.json()
 
-    def _headers(self) -> dict[str, str]:
-        return {"Authorization": f"Bearer {self.api_key}", "Content-Type": "application/json"}
+    async def iter_statement(self, from_card: str, after_card: str | None = None) -> AsyncIterator[dict]:
+        """
+        Transfers sent from `from_card`, one entry per `GrantStage:<id>` reference, ordered by
+        (to_card, reference). The statement is streamed, so it can be read in constant memory.
+        """
+        params = {"from_card": from_card}
+        if after_card is not None:
+            params["after_card"] = after_card
+        async with httpx.AsyncClient() as client:
+            async with client.stream(
+                "GET", f"{self.base_url}/transfers/statement", headers=self._headers(), params=params, timeout=None
+            ) as response:
+                response.raise_for_status()
+                async for line in response.aiter_lines():
+                    if line:
+                        yield json.loads(line)
+
+    def _headers(self, idempotency_key: str | None = None) -> dict[str, str]:
+        headers = {"Authorization": f"Bearer {self.api_key}", "Content-Type": "application/json"}
+        if idempotency_key is not None:
+            headers["Idempotency-Key"] = idempotency_key
+        return headers
@@ -0,0 +1,34 @@
+import uuid
+
+from sqlalchemy import Column, DateTime, ForeignKey, Index, Integer, Numeric, String
+from sqlalchemy.dialects.postgresql import UUID
+
+from src.core.database import Base
+
+
+class PayoutSchedule(Base):
+    """A stage payout due at `due_at`, sent by `scheduler.PayoutScheduler`."""
+
+    __tablename__ = "payout_schedules"
+    __table_args__ = (
+        # Serves both the claim query and the scheduler's next-due lookup.
+        Index("ix_payout_schedules_status_due_at", "status", "due_at"),
+    )
+
+    id = Column(UUID(as_uuid=True), primary_key=True, default=uuid.uuid4)
+    stage_id = Column(UUID(as_uuid=True), ForeignKey("stages.id", ondelete="CASCADE"), nullable=False, unique=True)
+    grant_program_id = Column(
+        UUID(as_uuid=True), ForeignKey("grant_programs.id", ondelete="CASCADE"), nullable=False, index=True
+    )
+    bank_account_number = Column(String(length=64), nullable=False)
+    amount = Column(Numeric(10, 2), nullable=False)
+    due_at = Column(DateTime(timezone=True), nullable=False)
+    status = Column(String(length=20), nullable=False, default="pending")  # pending, processing, paid, failed
+    attempts = Column(Integer, nullable=False, default=0)
+    claimed_at = Column(DateTime(timezone=True), nullable=True)
+    paid_at = Column(DateTime(timezone=True), nullable=True)
+    transaction_id = Column(String(length=255), nullable=True)
+    last_error = Column(String(length=500), nullable=True)
+    # Idempotency key of the transfer the payout went out in, fixed at its first claim. Resends reuse it, so
+    # the bank never executes a transfer twice.
+    transfer_key = Column(String(length=128), nullable=True, index=True)
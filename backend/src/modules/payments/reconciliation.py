@@ -0,0 +1,321 @@
+"""
+Reconciliation of completed grant stages against the bank's transfer statement.
+
+Both sides are read as streams sorted by (account, stage id): completed stages from a server-side cursor,
+bank transfers from the streamed `/transfers/statement` (one entry per `GrantStage:<id>` reference). A
+merge join walks them once in constant memory; only the transfers of the current account are held, to
+check netted transfers that cover several stages.
+
+Findings:
+- `missing`: a completed stage with no transfer. Payouts stuck in `processing` past their claim lease are
+  expected too, so a send that never happened shows up here.
+- `duplicate`: a stage referenced by more than one transfer.
+- `mismatched`: a transfer whose amount differs from the stages it covers.
+- `unexpected`: a transfer referencing a stage that is not awaiting payment.
+
+After each account (every `checkpoint_every` stages) the last finished account is saved to
+`job_checkpoints`, so an interrupted run can resume where it stopped. A finished run clears the checkpoint.
+"""
+import json
+import logging
+from datetime import datetime, timedelta, timezone
+from decimal import Decimal
+from typing import Any, AsyncIterator, Callable, Generic, NamedTuple, Optional, TypeVar
+from uuid import UUID
+
+from sqlalchemy import Select, and_, exists, func, or_, select, union_all
+from sqlalchemy.ext.asyncio import AsyncSession, async_sessionmaker
+
+from src.core.config import settings
+from src.modules.grants.models import (
+    GrantProgram,
+    GrantProgramArchive,
+    Requirement,
+    RequirementArchive,
+    Stage,
+    StageArchive,
+)
+from src.modules.jobs.repositories import JobCheckpointRepository
+from .gateway import SimplePaymentGateway
+from .models import PayoutSchedule
+
+logger = logging.getLogger(__name__)
+
+CHECKPOINT_NAME = "payout_reconciliation"
+STREAM_BATCH_SIZE = 1000
+CHECKPOINT_EVERY = 10_000
+GRANT_REFERENCE_PREFIX = "GrantStage:"
+CENTS = Decimal("0.01")
+
+T = TypeVar("T")
+
+
+class ExpectedPayout(NamedTuple):
+    account: str
+    stage_id: UUID
+    amount: Decimal
+
+
+class StatementEntry(NamedTuple):
+    account: str
+    stage_id: UUID
+    transaction_id: str
+    amount: Decimal
+
+
+class Discrepancy(NamedTuple):
+    kind: str
+    account: str
+    stage_ids: tuple[UUID, ...]
+    transaction_ids: tuple[str, ...] = ()
+    expected: Optional[Decimal] = None
+    actual: Optional[Decimal] = None
+
+    def to_json(self) -> str:
+        return json.dumps(
+            {
+                "kind": self.kind,
+                "account": self.account,
+                "stage_ids": [str(stage_id) for stage_id in self.stage_ids],
+                "transaction_ids": list(self.transaction_ids),
+                "expected": None if self.expected is None else str(self.expected),
+                "actual": None if self.actual is None else str(self.actual),
+            }
+        )
+
+
+StatementSource = Callable[[Optional[str]], AsyncIterator[StatementEntry]]
+
+
+class _Transfer:
+    """A bank transfer seen in the current account, with the expected amounts of the stages it covered."""
+
+    __slots__ = ("amount", "expected", "stage_ids")
+
+    def __init__(self, amount: Decimal):
+        self.amount = amount
+        self.expected = Decimal(0)
+        self.stage_ids: list[UUID] = []
+
+
+class _Sorted(Generic[T]):
+    """Peekable view of a stream that must be ascending by (account, stage_id)."""
+
+    def __init__(self, name: str, stream: AsyncIterator[T]):
+        self.name = name
+        self._stream = stream
+        self._head: Optional[T] = None
+        self._last_key: Optional[tuple[str, UUID]] = None
+        self._done = False
+
+    async def peek(self) -> Optional[T]:
+        if self._head is None and not self._done:
+            try:
+                self._head = await anext(self._stream)
+            except StopAsyncIteration:
+                self._done = True
+                return None
+            key = _key(self._head)
+            if self._last_key is not None and key < self._last_key:
+                raise RuntimeError(f"{self.name} stream is not sorted by (account, stage id) at {key}")
+            self._last_key = key
+        return self._head
+
+    async def pop(self) -> T:
+        head = await self.peek()
+        assert head is not None
+        self._head = None
+        return head
+
+
+class PayoutReconciler:
+    def __init__(
+        self,
+        session_factory: async_sessionmaker[AsyncSession],
+        statement: StatementSource | None = None,
+        batch_size: int = STREAM_BATCH_SIZE,
+        checkpoint_every: int = CHECKPOINT_EVERY,
+    ):
+        self.session_factory = session_factory
+        self.statement = statement or bank_statement
+        self.batch_size = batch_size
+        self.checkpoint_every = checkpoint_every
+        self.stages_checked = 0
+
+    async def run(self, resume: bool = True) -> AsyncIterator[Discrepancy]:
+        """Yield discrepancies in account order, starting after the saved checkpoint when `resume` is set."""
+        after_account = await self._load_checkpoint() if resume else None
+        expected = _Sorted("grant", self._expected_payouts(after_account))
+        bank = _Sorted("bank", self.statement(after_account))
+        account: Optional[str] = None
+        transfers: dict[str, _Transfer] = {}
+        since_checkpoint = 0
+
+        while True:
+            payout, entry = await expected.peek(), await bank.peek()
+            if payout is None and entry is None:
+                break
+            key = min(_key(item) for item in (payout, entry) if item is not None)
+            if key[0] != account:
+                if account is not None:
+                    for discrepancy in _close_account(account, transfers):
+                        yield discrepancy
+                    if since_checkpoint >= self.checkpoint_every:
+                        await self._save_checkpoint(account)
+                        since_checkpoint = 0
+                account, transfers = key[0], {}
+
+            matched: Optional[ExpectedPayout] = None
+            if payout is not None and _key(payout) == key:
+                matched = await expected.pop()
+                self.stages_checked += 1
+                since_checkpoint += 1
+            entries: list[StatementEntry] = []
+            while entry is not None and _key(entry) == key:
+                entries.append(await bank.pop())
+                entry = await bank.peek()
+
+            if matched is None:
+                for item in entries:
+                    yield Discrepancy(
+                        "unexpected", item.account, (item.stage_id,), (item.transaction_id,), actual=item.amount
+                    )
+                continue
+            if not entries:
+                yield Discrepancy("missing", matched.account, (matched.stage_id,), (), matched.amount)
+                continue
+            if len(entries) > 1:
+                yield Discrepancy(
+                    "duplicate",
+                    matched.account,
+                    (matched.stage_id,),
+                    tuple(item.transaction_id for item in entries),
+                    matched.amount,
+                    sum((item.amount for item in entries), Decimal(0)),
+                )
+            for item in entries:
+                transfer = transfers.setdefault(item.transaction_id, _Transfer(item.amount))
+                transfer.expected += matched.amount
+                transfer.stage_ids.append(matched.stage_id)
+
+        if account is not None:
+            for discrepancy in _close_account(account, transfers):
+                yield discrepancy
+        await self._clear_checkpoint()
+
+    async def _expected_payouts(self, after_account: Optional[str]) -> AsyncIterator[ExpectedPayout]:
+        async with self.session_factory() as session:
+            stmt = self._expected_query(session, after_account)
+            result = await session.stream(stmt.execution_options(yield_per=self.batch_size))
+            async for rows in result.partitions():
+                for account, stage_id, amount in rows:
+                    yield ExpectedPayout(account, stage_id, Decimal(amount).quantize(CENTS))
+
+    @staticmethod
+    def _expected_query(session: AsyncSession, after_account: Optional[str]) -> Select:
+        """
+        Completed stages that should have been paid, with the account the payout went (or goes) to.
+        Archived programs are included: their transfers stay on the bank statement.
+        """
+        collate = session.bind.dialect.name == "postgresql"
+
+        def _account(*candidates):
+            account = func.coalesce(*candidates)
+            # Byte order, to match the ordering the merge join and the bank statement use.
+            return (account.collate("C") if collate else account).label("account")
+
+        # Scheduled payouts are only expected once they have been attempted, or their claim went stale.
+        stuck_before = datetime.now(timezone.utc) - timedelta(seconds=settings.payout_claim_lease_seconds)
+        awaiting_send = or_(
+            PayoutSchedule.status == "pending",
+            and_(PayoutSchedule.status == "processing", PayoutSchedule.claimed_at >= stuck_before),
+        )
+        contract_enforced = exists().where(
+            Requirement.stage_id == Stage.id, Requirement.payment_contract_id.is_not(None)
+        )
+        hot = (
+            select(
+                _account(PayoutSchedule.bank_account_number, GrantProgram.bank_account_number),
+                Stage.id.label("stage_id"),
+                Stage.amount.label("amount"),
+            )
+            .join(GrantProgram, GrantProgram.id == Stage.grant_program_id)
+            .outerjoin(PayoutSchedule, PayoutSchedule.stage_id == Stage.id)
+            .where(
+                Stage.completion_status == "completed",
+                ~contract_enforced,
+                # Stages paid right away have no schedule row.
+                or_(PayoutSchedule.id.is_(None), ~awaiting_send),
+            )
+        )
+        archived_contract_enforced = exists().where(
+            RequirementArchive.stage_id == StageArchive.id, RequirementArchive.payment_contract_id.is_not(None)
+        )
+        archived = (
+            select(
+                _account(StageArchive.payout_bank_account_number, GrantProgramArchive.bank_account_number),
+                StageArchive.id.label("stage_id"),
+                StageArchive.amount.label("amount"),
+            )
+            .join(GrantProgramArchive, GrantProgramArchive.id == StageArchive.grant_program_id)
+            .where(StageArchive.completion_status == "completed", ~archived_contract_enforced)
+        )
+        expected = union_all(hot, archived).subquery()
+        stmt = select(expected.c.account, expected.c.stage_id, expected.c.amount).order_by(
+            expected.c.account, expected.c.stage_id
+        )
+        if after_account is not None:
+            stmt = stmt.where(expected.c.account > after_account)
+        return stmt
+
+    async def _load_checkpoint(self) -> Optional[str]:
+        async with self.session_factory() as session:
+            position = await JobCheckpointRepository(session).get(CHECKPOINT_NAME)
+        return None if position is None else position["account"]
+
+    async def _save_checkpoint(self, account: str) -> None:
+        async with self.session_factory() as session:
+            await JobCheckpointRepository(session).save(CHECKPOINT_NAME, {"account": account})
+            await session.commit()
+
+    async def _clear_checkpoint(self) -> None:
+        async with self.session_factory() as session:
+            await JobCheckpointRepository(session).clear(CHECKPOINT_NAME)
+            await session.commit()
+
+
+async def bank_statement(after_account: Optional[str]) -> AsyncIterator[StatementEntry]:
+    """Transfers from the app holding account, as reported by the bank."""
+    gateway = SimplePaymentGateway()
+    async for row in gateway.iter_statement(settings.app_bank_account_number, after_account):
+        entry = _parse_statement_row(row)
+        if entry is not None:
+            yield entry
+
+
+def _parse_statement_row(row: dict[str, Any]) -> Optional[StatementEntry]:
+    reference = str(row.get("reference", ""))
+    if row.get("status") != "completed" or not reference.startswith(GRANT_REFERENCE_PREFIX):
+        return None
+    try:
+        stage_id = UUID(reference[len(GRANT_REFERENCE_PREFIX):])
+    except ValueError:
+        logger.warning("Skipping statement entry with malformed reference %s", reference)
+        return None
+    amount = Decimal(str(row["amount"])).quantize(CENTS)
+    return StatementEntry(str(row["to_card"]), stage_id, str(row["transaction_id"]), amount)
+
+
+def _close_account(account: str, transfers: dict[str, _Transfer]) -> list[Discrepancy]:
+    """Transfers whose amount differs from the total of the stages they covered."""
+    return [
+        Discrepancy(
+            "mismatched", account, tuple(transfer.stage_ids), (transaction_id,), transfer.expected, transfer.amount
+        )
+        for transaction_id, transfer in transfers.items()
+        if transfer.expected.quantize(CENTS) != transfer.amount
+    ]
+
+
+def _key(item: ExpectedPayout | StatementEntry) -> tuple[str, UUID]:
+    return item.account, item.stage_id
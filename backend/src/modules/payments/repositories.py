@@ -0,0 +1,127 @@
+from collections import Counter
+from datetime import datetime, timedelta
+from typing import Optional, Sequence
+from uuid import UUID, uuid4
+
+from sqlalchemy import and_, case, func, literal, or_, select, update
+from sqlalchemy.ext.asyncio import AsyncSession
+
+from src.modules.grants.models import GrantProgram, Stage
+from .models import PayoutSchedule
+
+LEASE_EXPIRED_ERROR = "claim lease expired; resent under the same transfer key"
+
+
+class PayoutScheduleRepository:
+    def __init__(self, session: AsyncSession):
+        self.session = session
+
+    def schedule(self, stage: Stage, program: GrantProgram, due_at: datetime) -> PayoutSchedule:
+        """Add a pending payout to the caller's transaction."""
+        payout = PayoutSchedule(
+            stage_id=stage.id,
+            grant_program_id=program.id,
+            bank_account_number=program.bank_account_number,
+            amount=stage.amount,
+            due_at=due_at,
+            status="pending",
+            attempts=0,
+        )
+        self.session.add(payout)
+        return payout
+
+    async def pending_due_times(self) -> list[datetime]:
+        result = await self.session.execute(
+            select(PayoutSchedule.due_at).where(PayoutSchedule.status == "pending").distinct()
+        )
+        return list(result.scalars().all())
+
+    async def next_due(self, lease: timedelta) -> Optional[datetime]:
+        """The earliest time a payout becomes claimable: a pending due time or the end of a processing lease."""
+        pending = await self.session.scalar(
+            select(func.min(PayoutSchedule.due_at)).where(PayoutSchedule.status == "pending")
+        )
+        claimed = await self.session.scalar(
+            select(func.min(PayoutSchedule.claimed_at)).where(PayoutSchedule.status == "processing")
+        )
+        candidates = [value for value in (pending, None if claimed is None else claimed + lease) if value is not None]
+        return min(candidates, default=None)
+
+    async def claim_due(self, now: datetime, limit: int, lease: timedelta) -> list[PayoutSchedule]:
+        """
+        Move up to `limit` due payouts to `processing`. Rows locked by another worker's claim are skipped
+        rather than waited on, so several schedulers can drain the same table. Rows whose `processing` claim
+        is older than `lease` were left by a worker that died mid-send and are claimed again.
+
+        A payout keeps the `transfer_key` of its first claim (`<claim id>:<account>`), and resends go out
+        under it, so the bank executes the transfer at most once. The rows sharing a key are claimed
+        together, beyond `limit` if it cut the group; a group partly locked by another worker is left alone.
+        """
+        claimable = or_(
+            and_(PayoutSchedule.status == "pending", PayoutSchedule.due_at <= now),
+            and_(PayoutSchedule.status == "processing", PayoutSchedule.claimed_at < now - lease),
+        )
+        result = await self.session.execute(
+            select(PayoutSchedule.id, PayoutSchedule.transfer_key)
+            .where(claimable)
+            .order_by(PayoutSchedule.due_at, PayoutSchedule.bank_account_number, PayoutSchedule.transfer_key)
+            .limit(limit)
+            .with_for_update(skip_locked=True)
+        )
+        rows = {row.id: row.transfer_key for row in result.all()}
+        keys = {key for key in rows.values() if key is not None}
+        if keys:
+            result = await self.session.execute(
+                select(PayoutSchedule.id, PayoutSchedule.transfer_key)
+                .where(PayoutSchedule.transfer_key.in_(keys), claimable)
+                .with_for_update(skip_locked=True)
+            )
+            rows.update({row.id: row.transfer_key for row in result.all()})
+            result = await self.session.execute(
+                select(PayoutSchedule.transfer_key, func.count())
+                .where(PayoutSchedule.transfer_key.in_(keys))
+                .group_by(PayoutSchedule.transfer_key)
+            )
+            locked = Counter(key for key in rows.values() if key is not None)
+            incomplete = {key for key, total in result.all() if total != locked[key]}
+            rows = {payout_id: key for payout_id, key in rows.items() if key not in incomplete}
+        if not rows:
+            return []
+        claim_id = uuid4().hex
+        result = await self.session.scalars(
+            update(PayoutSchedule)
+            .where(PayoutSchedule.id.in_(list(rows)), claimable)
+            .values(
+                status="processing",
+                claimed_at=now,
+                attempts=PayoutSchedule.attempts + 1,
+                last_error=case(
+                    (PayoutSchedule.status == "processing", LEASE_EXPIRED_ERROR), else_=PayoutSchedule.last_error
+                ),
+                transfer_key=func.coalesce(
+                    PayoutSchedule.transfer_key, literal(f"{claim_id}:") + PayoutSchedule.bank_account_number
+                ),
+            )
+            .returning(PayoutSchedule),
+            execution_options={"synchronize_session": False},
+        )
+        return list(result.all())
+
+    async def mark_paid(self, payout_ids: Sequence[UUID], transaction_id: str, paid_at: datetime) -> None:
+        """Settle payouts sent together; they share the transfer's transaction id."""
+        await self.session.execute(
+            update(PayoutSchedule)
+            .where(PayoutSchedule.id.in_(payout_ids))
+            .values(status="paid", paid_at=paid_at, transaction_id=transaction_id, last_error=None)
+        )
+
+    async def mark_failed(self, payout_ids: Sequence[UUID], error: str, retry_at: Optional[datetime]) -> None:
+        """Put the payouts back in the queue at `retry_at`, or give up on them when no retry is left."""
+        values: dict[str, object] = {"last_error": error[:500]}
+        if retry_at is None:
+            values["status"] = "failed"
+        else:
+            values.update(status="pending", due_at=retry_at)
+        await self.session.execute(
+            update(PayoutSchedule).where(PayoutSchedule.id.in_(payout_ids)).values(**values)
+        )
@@ -0,0 +1,213 @@
+"""
+In-process scheduler for dated stage payouts.
+
+Due times of pending `payout_schedules` rows sit in a min-heap. The scheduler task sleeps until the
+earliest one (or until `notify` pushes an earlier one), claims the due rows with `FOR UPDATE SKIP LOCKED`
+and sends them through the payment gateway. Several workers can run it against the same table: a row is
+claimed by exactly one of them. Each worker also re-reads the next due time from the index every
+`RESYNC_SECONDS`, which picks up rows another worker scheduled and then went away. A claim is a lease of
+`PAYOUT_CLAIM_LEASE_SECONDS`: rows still `processing` after it (the worker died between claim and
+settlement) are claimed and sent again.
+
+Every transfer carries an idempotency key, fixed when its payouts are first claimed and reused by every
+resend: a lease-expired claim and a retry after a failed or timed-out call go out under the same key, so
+a transfer the bank already executed is answered with that transaction instead of being paid twice.
+
+Claimed payouts to the same bank account are netted into one transfer. With `PAYOUT_NETTING_WINDOW_SECONDS`
+set, immediate payouts take this path too: they fall due at the end of the window they completed in, so
+every stage paid to an account within one window shares a transfer.
+"""
+import asyncio
+import heapq
+import logging
+from collections import defaultdict
+from contextlib import asynccontextmanager
+from datetime import datetime, timedelta, timezone
+from typing import AsyncIterator, Iterable, Optional
+
+from sqlalchemy.ext.asyncio import AsyncSession, async_sessionmaker
+
+from src.core.config import settings
+from .models import PayoutSchedule
+from .repositories import LEASE_EXPIRED_ERROR, PayoutScheduleRepository
+from .services import PaymentService
+
+logger = logging.getLogger(__name__)
+
+CLAIM_BATCH_SIZE = 100
+RESYNC_SECONDS = 600
+MAX_ATTEMPTS = 5
+
+
+def payout_due_at(policy: str, approved_at: datetime, netting_window: int | None = None) -> Optional[datetime]:
+    """When a stage approved at `approved_at` should be paid; None means pay right away, without netting."""
+    if policy == "next_month":
+        first = approved_at.astimezone(timezone.utc).replace(day=1, hour=0, minute=0, second=0, microsecond=0)
+        return (first + timedelta(days=32)).replace(day=1)
+    window = settings.payout_netting_window_seconds if netting_window is None else netting_window
+    if window > 0:
+        # Fixed windows aligned to the epoch, so every worker puts a stage in the same window.
+        window_end = (int(approved_at.timestamp()) // window + 1) * window
+        return datetime.fromtimestamp(window_end, timezone.utc)
+    return None
+
+
+def _as_utc(value: datetime) -> datetime:
+    # SQLite hands back naive datetimes for timezone-aware columns.
+    return value.replace(tzinfo=timezone.utc) if value.tzinfo is None else value.astimezone(timezone.utc)
+
+
+class PayoutScheduler:
+    def __init__(
+        self,
+        batch_size: int = CLAIM_BATCH_SIZE,
+        resync_seconds: float = RESYNC_SECONDS,
+        lease_seconds: int | None = None,
+    ):
+        self.batch_size = batch_size
+        self.resync_seconds = resync_seconds
+        self.lease = timedelta(
+            seconds=settings.payout_claim_lease_seconds if lease_seconds is None else lease_seconds
+        )
+        self._heap: list[datetime] = []
+        self._queued: set[datetime] = set()
+        self._wakeup = asyncio.Event()
+        self._session_factory: Optional[async_sessionmaker[AsyncSession]] = None
+        self._payment_service: Optional[PaymentService] = None
+        self._task: Optional[asyncio.Task] = None
+
+    def notify(self, due_at: datetime) -> None:
+        """Tell the scheduler about a committed payout; it wakes early if this one is due sooner."""
+        if self._session_factory is None:
+            return
+        if self._push([due_at]):
+            self._wakeup.set()
+
+    @asynccontextmanager
+    async def running(
+        self, session_factory: async_sessionmaker[AsyncSession], payment_service: PaymentService | None = None
+    ) -> AsyncIterator["PayoutScheduler"]:
+        self._session_factory = session_factory
+        self._payment_service = payment_service or PaymentService()
+        async with session_factory() as session:
+            repo = PayoutScheduleRepository(session)
+            self._push(await repo.pending_due_times())
+            # Claims a previous run of this worker left behind.
+            next_due = await repo.next_due(self.lease)
+            if next_due is not None:
+                self._push([next_due])
+        self._task = asyncio.create_task(self._run())
+        try:
+            yield self
+        finally:
+            self._task.cancel()
+            try:
+                await self._task
+            except asyncio.CancelledError:
+                pass
+            self._session_factory = None
+            self._payment_service = None
+            self._task = None
+            self._heap.clear()
+            self._queued.clear()
+
+    @property
+    def next_wakeup(self) -> Optional[datetime]:
+        return self._heap[0] if self._heap else None
+
+    async def run_due(self, now: datetime | None = None) -> int:
+        """Claim and send every payout due at `now`, one transfer per account and key; returns the number paid."""
+        if self._session_factory is None:
+            return 0
+        now = now or datetime.now(timezone.utc)
+        paid = 0
+        while True:
+            async with self._session_factory() as session:
+                claimed = await PayoutScheduleRepository(session).claim_due(now, self.batch_size, self.lease)
+                await session.commit()
+            if not claimed:
+                break
+            reclaimed = [payout for payout in claimed if payout.last_error == LEASE_EXPIRED_ERROR]
+            if reclaimed:
+                logger.warning("Resending %d payout(s) whose claim lease expired", len(reclaimed))
+            by_transfer: dict[tuple[str, str], list[PayoutSchedule]] = defaultdict(list)
+            for payout in claimed:
+                by_transfer[(payout.bank_account_number, payout.transfer_key)].append(payout)
+            for (bank_account_number, _), payouts in by_transfer.items():
+                paid += await self._send(bank_account_number, payouts, now)
+        async with self._session_factory() as session:
+            next_due = await PayoutScheduleRepository(session).next_due(self.lease)
+        if next_due is not None:
+            self._push([next_due])
+        return paid
+
+    async def _run(self) -> None:
+        while True:
+            await self._sleep_until_due()
+            try:
+                await self.run_due()
+            except Exception:
+                logger.exception("Scheduled payout run failed")
+
+    async def _sleep_until_due(self) -> None:
+        while True:
+            now = datetime.now(timezone.utc)
+            if self._heap and self._heap[0] <= now:
+                while self._heap and self._heap[0] <= now:
+                    self._queued.discard(heapq.heappop(self._heap))
+                return
+            delay = self.resync_seconds
+            if self._heap:
+                delay = min(delay, (self._heap[0] - now).total_seconds())
+            self._wakeup.clear()
+            try:
+                await asyncio.wait_for(self._wakeup.wait(), delay)
+            except asyncio.TimeoutError:
+                if not self._heap or self._heap[0] > datetime.now(timezone.utc):
+                    await self._resync()
+
+    async def _resync(self) -> None:
+        assert self._session_factory is not None
+        try:
+            async with self._session_factory() as session:
+                next_due = await PayoutScheduleRepository(session).next_due(self.lease)
+        except Exception:
+            logger.exception("Failed to read next payout due time")
+            return
+        if next_due is not None:
+            self._push([next_due])
+
+    async def _send(self, bank_account_number: str, payouts: list[PayoutSchedule], now: datetime) -> int:
+        assert self._session_factory is not None and self._payment_service is not None
+        payout_ids = [payout.id for payout in payouts]
+        try:
+            result = await self._payment_service.send_netted_payout(bank_account_number, payouts)
+        except Exception as exc:
+            logger.exception("Payout of %d stage(s) to %s failed", len(payouts), bank_account_number)
+            attempts = max(payout.attempts for payout in payouts)
+            retry_at = now + timedelta(minutes=2**attempts) if attempts < MAX_ATTEMPTS else None
+            async with self._session_factory() as session:
+                await PayoutScheduleRepository(session).mark_failed(payout_ids, str(exc), retry_at)
+                await session.commit()
+            if retry_at is not None:
+                self._push([retry_at])
+            return 0
+        async with self._session_factory() as session:
+            await PayoutScheduleRepository(session).mark_paid(
+                payout_ids, result.transaction_id, datetime.now(timezone.utc)
+            )
+            await session.commit()
+        return len(payouts)
+
+    def _push(self, due_times: Iterable[datetime]) -> bool:
+        """Add due times to the heap; True if the earliest one changed."""
+        earliest = self.next_wakeup
+        for due_at in due_times:
+            due_at = _as_utc(due_at)
+            if due_at not in self._queued:
+                self._queued.add(due_at)
+                heapq.heappush(self._heap, due_at)
+        return self.next_wakeup != earliest
+
+
+payout_scheduler = PayoutScheduler()
@@ -1,5 +1,9 @@
+from decimal import Decimal
+from typing import Sequence
+
 from src.modules.grants.models import Stage
 from .gateway import SimplePaymentGateway
+from .models import PayoutSchedule
 from .schemas import PaymentCreate, PaymentStatus
 
 
@@ -22,8 +26,27 @@ class PaymentService:
             participant_id=str(stage.grant_program.bank_account_number),
             amount=float(stage.amount),
             reference=f"GrantStage:{stage.id}",
+            idempotency_key=f"stage-payout:{stage.id}",
+        )
+
+    async def send_netted_payout(self, bank_account_number: str, payouts: Sequence[PayoutSchedule]) -> PaymentStatus:
+        """
+        One transfer covering every payout to the same account; the reference lists all their stages. The
+        payouts share the `transfer_key` of their claim, sent as the idempotency key.
+        """
+        stage_ids = ",".join(sorted(str(payout.stage_id) for payout in payouts))
+        response = await self.gateway.send_payment(
+            participant_id=bank_account_number,
+            amount=float(sum((Decimal(payout.amount) for payout in payouts), Decimal(0))),
+            reference=f"GrantStage:{stage_ids}",
+            idempotency_key=payouts[0].transfer_key,
         )
+        return PaymentStatus(transaction_id=response.get("transaction_id", ""), status=response.get("status", "unknown"))
 
-    async def deposit_grant(self, *, participant_id: str, amount: float) -> PaymentStatus:
-        response = await self.gateway.deposit(card_number=participant_id, amount=amount, reference="Grant funding")
+    async def deposit_grant(
+        self, *, participant_id: str, amount: float, idempotency_key: str | None = None
+    ) -> PaymentStatus:
+        response = await self.gateway.deposit(
+            card_number=participant_id, amount=amount, reference="Grant funding", idempotency_key=idempotency_key
+        )
         return PaymentStatus(transaction_id=response.get("transaction_id", ""), status=response.get("status", "unknown"))
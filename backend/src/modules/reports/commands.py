@@ -0,0 +1,35 @@
+"""
+Admin commands for the reports module.
+
+    python -m src.modules.reports.commands rebuild-rollups
+"""
+import argparse
+import asyncio
+import sys
+
+from sqlalchemy.ext.asyncio import AsyncSession, async_sessionmaker
+
+from src.core.database import SessionLocal
+from .repositories import RollupRepository
+
+
+async def rebuild_rollups(session_factory: async_sessionmaker[AsyncSession] = SessionLocal) -> int:
+    async with session_factory() as session:
+        buckets = await RollupRepository(session).rebuild()
+        await session.commit()
+    print(f"Rebuilt {buckets} disbursement rollup bucket(s)")
+    return buckets
+
+
+def main(argv: list[str] | None = None) -> int:
+    parser = argparse.ArgumentParser(prog="python -m src.modules.reports.commands")
+    subcommands = parser.add_subparsers(dest="command", required=True)
+    subcommands.add_parser("rebuild-rollups", help="Recompute disbursement rollups from grant transition timestamps")
+    parser.parse_args(argv)
+
+    asyncio.run(rebuild_rollups())
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,23 @@
+from sqlalchemy import Column, Date, Integer, Numeric, String
+from sqlalchemy.dialects.postgresql import UUID
+
+from src.core.database import Base
+
+
+class DisbursementRollup(Base):
+    """
+    Monthly totals per grantor and program status, maintained in the same transaction as the grant transitions that
+    change them. Committed amounts are booked in the month a program is confirmed, disbursed amounts in the month a
+    stage completes. A program's figures sit under its current status and move to `completed` when it completes.
+    """
+
+    __tablename__ = "disbursement_rollups"
+
+    month = Column(Date, primary_key=True)
+    grantor_id = Column(UUID(as_uuid=True), primary_key=True)
+    status = Column(String(length=50), primary_key=True)
+    committed_amount = Column(Numeric(14, 2), nullable=False, default=0, server_default="0")
+    disbursed_amount = Column(Numeric(14, 2), nullable=False, default=0, server_default="0")
+    programs_confirmed = Column(Integer, nullable=False, default=0, server_default="0")
+    programs_completed = Column(Integer, nullable=False, default=0, server_default="0")
+    stages_completed = Column(Integer, nullable=False, default=0, server_default="0")
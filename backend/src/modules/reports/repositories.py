@@ -0,0 +1,160 @@
+from collections import defaultdict
+from datetime import date, datetime
+from decimal import Decimal
+from typing import Optional
+from uuid import UUID
+
+from sqlalchemy import Date, delete, func, insert, or_, select
+from sqlalchemy.dialects import postgresql, sqlite
+from sqlalchemy.ext.asyncio import AsyncSession
+from sqlalchemy.ext.compiler import compiles
+from sqlalchemy.sql.functions import FunctionElement
+
+from src.modules.grants.models import GrantProgram, GrantProgramArchive, Stage, StageArchive
+from .models import DisbursementRollup
+
+ROLLUP_MEASURES = (
+    "committed_amount",
+    "disbursed_amount",
+    "programs_confirmed",
+    "programs_completed",
+    "stages_completed",
+)
+
+
+class month_start(FunctionElement):
+    """First day of the month of a timestamp, as a date."""
+
+    type = Date()
+    inherit_cache = True
+
+
+@compiles(month_start)
+def _month_start_postgresql(element, compiler, **kw):
+    return f"CAST(date_trunc('month', {compiler.process(element.clauses, **kw)}) AS DATE)"
+
+
+@compiles(month_start, "sqlite")
+def _month_start_sqlite(element, compiler, **kw):
+    return f"date({compiler.process(element.clauses, **kw)}, 'start of month')"
+
+
+def to_month(value: datetime | date) -> date:
+    return date(value.year, value.month, 1)
+
+
+Bucket = tuple[date, UUID, str]
+
+
+class RollupRepository:
+    def __init__(self, session: AsyncSession):
+        self.session = session
+
+    async def add(self, occurred_at: datetime | date, grantor_id: UUID, status: str, **deltas: Decimal | int) -> None:
+        """Add deltas to the grantor's `status` bucket for the month of `occurred_at`, creating the bucket if needed."""
+        dialect_insert = postgresql.insert if self.session.bind.dialect.name == "postgresql" else sqlite.insert
+        stmt = dialect_insert(DisbursementRollup).values(
+            month=to_month(occurred_at), grantor_id=grantor_id, status=status, **deltas
+        )
+        stmt = stmt.on_conflict_do_update(
+            index_elements=[DisbursementRollup.month, DisbursementRollup.grantor_id, DisbursementRollup.status],
+            set_={name: getattr(DisbursementRollup, name) + stmt.excluded[name] for name in deltas},
+        )
+        await self.session.execute(stmt)
+
+    async def move_program(self, grant_program_id: UUID, from_status: str, to_status: str) -> None:
+        """Move everything booked for a program from its `from_status` buckets to its `to_status` buckets."""
+        facts = await self._facts(GrantProgram, Stage, GrantProgram.id == grant_program_id)
+        for (month, grantor_id, _), measures in facts.items():
+            moved = {name: value for name, value in measures.items() if value}
+            await self.add(month, grantor_id, from_status, **{name: -value for name, value in moved.items()})
+            await self.add(month, grantor_id, to_status, **moved)
+
+    async def series(
+        self,
+        start: date,
+        end: date,
+        grantor_id: Optional[UUID] = None,
+        by_grantor: bool = False,
+        status: Optional[str] = None,
+        by_status: bool = False,
+    ) -> list[dict]:
+        columns = [DisbursementRollup.month]
+        if by_grantor:
+            columns.append(DisbursementRollup.grantor_id)
+        if by_status:
+            columns.append(DisbursementRollup.status)
+        sums = [func.sum(getattr(DisbursementRollup, name)) for name in ROLLUP_MEASURES]
+        stmt = (
+            select(*columns, *(total.label(name) for total, name in zip(sums, ROLLUP_MEASURES)))
+            .where(DisbursementRollup.month >= start, DisbursementRollup.month <= end)
+            .group_by(*columns)
+            # Buckets emptied by `move_program` are not reported, as a rebuild would not create them.
+            .having(or_(*(total != 0 for total in sums)))
+            .order_by(*columns)
+        )
+        if grantor_id is not None:
+            stmt = stmt.where(DisbursementRollup.grantor_id == grantor_id)
+        if status is not None:
+            stmt = stmt.where(DisbursementRollup.status == status)
+        result = await self.session.execute(stmt)
+        return [dict(row._mapping) for row in result.all()]
+
+    async def rebuild(self) -> int:
+        """Recompute every bucket from program and stage transition timestamps; returns the bucket count."""
+        # Archived programs keep their timestamps, so history survives `archive-programs`.
+        buckets = await self._facts(GrantProgram, Stage)
+        for bucket, measures in (await self._facts(GrantProgramArchive, StageArchive)).items():
+            for name, value in measures.items():
+                buckets[bucket][name] += value
+
+        await self.session.execute(delete(DisbursementRollup))
+        if buckets:
+            await self.session.execute(
+                insert(DisbursementRollup),
+                [
+                    {"month": month, "grantor_id": grantor_id, "status": status, **measures}
+                    for (month, grantor_id, status), measures in buckets.items()
+                ],
+            )
+        return len(buckets)
+
+    async def _facts(self, program, stage, *criteria) -> dict[Bucket, dict[str, Decimal | int]]:
+        """
+        Bucketed measures of the programs matching `criteria`, from their transition timestamps. Transitions
+        without a timestamp (made before they were recorded) are left out.
+        """
+        buckets: dict[Bucket, dict[str, Decimal | int]] = defaultdict(lambda: dict.fromkeys(ROLLUP_MEASURES, 0))
+
+        confirmed_month = month_start(program.confirmed_at)
+        confirmed = await self.session.execute(
+            select(confirmed_month, program.grantor_id, program.status, func.sum(program.total_amount), func.count())
+            .where(program.confirmed_at.is_not(None), *criteria)
+            .group_by(confirmed_month, program.grantor_id, program.status)
+        )
+        for month, grantor_id, status, committed, count in confirmed.all():
+            bucket = buckets[(month, grantor_id, status)]
+            bucket["committed_amount"] += committed
+            bucket["programs_confirmed"] += count
+
+        completed_month = month_start(program.completed_at)
+        completed = await self.session.execute(
+            select(completed_month, program.grantor_id, program.status, func.count())
+            .where(program.completed_at.is_not(None), *criteria)
+            .group_by(completed_month, program.grantor_id, program.status)
+        )
+        for month, grantor_id, status, count in completed.all():
+            buckets[(month, grantor_id, status)]["programs_completed"] += count
+
+        stage_month = month_start(stage.completed_at)
+        disbursed = await self.session.execute(
+            select(stage_month, program.grantor_id, program.status, func.sum(stage.amount), func.count())
+            .join(program, program.id == stage.grant_program_id)
+            .where(stage.completed_at.is_not(None), *criteria)
+            .group_by(stage_month, program.grantor_id, program.status)
+        )
+        for month, grantor_id, status, amount, count in disbursed.all():
+            bucket = buckets[(month, grantor_id, status)]
+            bucket["disbursed_amount"] += amount
+            bucket["stages_completed"] += count
+        return buckets
@@ -0,0 +1,37 @@
+from datetime import date
+from typing import Optional
+from uuid import UUID
+
+from fastapi import APIRouter, Depends, Query
+from sqlalchemy.ext.asyncio import AsyncSession
+
+from src.core.database import get_session
+from src.core.security import get_current_user
+from src.modules.auth.models import User
+from .schemas import DisbursementPoint
+from .services import ReportService
+
+router = APIRouter(prefix="/reports", tags=["reports"])
+
+
+@router.get("/disbursements", response_model=list[DisbursementPoint])
+async def disbursement_series(
+    start: Optional[date] = None,
+    end: Optional[date] = None,
+    grantor_id: Optional[UUID] = None,
+    by_grantor: bool = False,
+    program_status: Optional[str] = Query(None, alias="status"),
+    by_status: bool = False,
+    session: AsyncSession = Depends(get_session),
+    current_user: User = Depends(get_current_user),
+) -> list[DisbursementPoint]:
+    service = ReportService(session)
+    return await service.disbursement_series(
+        current_user,
+        start=start,
+        end=end,
+        grantor_id=grantor_id,
+        by_grantor=by_grantor,
+        program_status=program_status,
+        by_status=by_status,
+    )
@@ -0,0 +1,16 @@
+from datetime import date
+from typing import Optional
+from uuid import UUID
+
+from pydantic import BaseModel
+
+
+class DisbursementPoint(BaseModel):
+    month: date
+    grantor_id: Optional[UUID] = None
+    status: Optional[str] = None
+    committed_amount: float
+    disbursed_amount: float
+    programs_confirmed: int
+    programs_completed: int
+    stages_completed: int
@@ -0,0 +1,81 @@
+from datetime import date, datetime, timezone
+from typing import Optional
+from uuid import UUID
+
+from fastapi import HTTPException, status
+from sqlalchemy.ext.asyncio import AsyncSession
+
+from src.core.config import settings
+from src.modules.auth.models import User
+from .repositories import ROLLUP_MEASURES, RollupRepository, to_month
+from .schemas import DisbursementPoint
+
+MAX_SERIES_MONTHS = 120
+
+
+class ReportService:
+    def __init__(self, session: AsyncSession):
+        self.session = session
+        self.rollups = RollupRepository(session)
+
+    async def disbursement_series(
+        self,
+        current_user: User,
+        start: Optional[date] = None,
+        end: Optional[date] = None,
+        grantor_id: Optional[UUID] = None,
+        by_grantor: bool = False,
+        program_status: Optional[str] = None,
+        by_status: bool = False,
+    ) -> list[DisbursementPoint]:
+        """
+        Monthly committed vs disbursed totals between `start` and `end` (inclusive, by month), optionally limited to
+        or split by current program status. Portfolio-wide figures are limited to REPORT_VIEWER_EMAILS; everyone
+        else sees their own programs as grantor.
+        """
+        if current_user.email not in settings.report_viewer_emails:
+            if grantor_id not in (None, current_user.id):
+                raise HTTPException(status_code=status.HTTP_403_FORBIDDEN, detail="Insufficient permissions")
+            grantor_id = current_user.id
+
+        end_month = to_month(end or datetime.now(timezone.utc))
+        start_month = to_month(start) if start else _shift_month(end_month, -11)
+        if start_month > end_month:
+            raise HTTPException(status_code=status.HTTP_400_BAD_REQUEST, detail="start must not be after end")
+        months = _months_between(start_month, end_month)
+        if len(months) > MAX_SERIES_MONTHS:
+            raise HTTPException(
+                status_code=status.HTTP_400_BAD_REQUEST, detail=f"Range is limited to {MAX_SERIES_MONTHS} months"
+            )
+
+        rows = await self.rollups.series(
+            start_month,
+            end_month,
+            grantor_id=grantor_id,
+            by_grantor=by_grantor,
+            status=program_status,
+            by_status=by_status,
+        )
+        if by_grantor or by_status:
+            return [DisbursementPoint(**row) for row in rows]
+        # Single series: months without activity are returned as zeros so charts need no gap filling.
+        by_month = {row["month"]: row for row in rows}
+        empty = dict.fromkeys(ROLLUP_MEASURES, 0)
+        return [
+            DisbursementPoint(
+                **{**empty, **by_month.get(month, {}), "month": month, "grantor_id": grantor_id, "status": program_status}
+            )
+            for month in months
+        ]
+
+
+def _shift_month(month: date, delta: int) -> date:
+    index = month.year * 12 + month.month - 1 + delta
+    return date(index // 12, index % 12 + 1, 1)
+
+
+def _months_between(start: date, end: date) -> list[date]:
+    months = [start]
+    while months[-1] < end:
+        months.append(_shift_month(months[-1], 1))
+    return months
@@ -19,7 +19,7 @@ if str(PROJECT_ROOT) not in sys.path:
     sys.path.append(str(PROJECT_ROOT))
 
 from src.main import app  # noqa: E402
-from src.core.database import Base, get_session  # noqa: E402
+from src.core.database import Base, get_session, get_session_factory  # noqa: E402
 from src.core.security import get_current_user  # noqa: E402
 from src.modules.auth.models import User  # noqa: E402
 from src.modules.payments.services import PaymentService  # noqa: E402
@@ -44,12 +44,14 @@ async def client(session_factory):
             yield session
 
     app.dependency_overrides[get_session] = override_get_session
+    app.dependency_overrides[get_session_factory] = lambda: session_factory
 
     transport = ASGITransport(app=app)
     async with AsyncClient(transport=transport, base_url="http://test") as async_client:
         yield async_client
 
     app.dependency_overrides.pop(get_session, None)
+    app.dependency_overrides.pop(get_session_factory, None)
     app.dependency_overrides.pop(get_current_user, None)
 
 
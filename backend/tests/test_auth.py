@@ -2,9 +2,11 @@ from uuid import UUID
 
 import pytest
 from httpx import AsyncClient
+from sqlalchemy import event
 
 from src.core import security
 from src.modules.auth.models import User
+from src.modules.auth.services import suggestion_cache
 
 
 @pytest.mark.asyncio
@@ -59,3 +61,63 @@ async def test_duplicate_email_and_bad_password(client: AsyncClient):
 
     bad_login = await client.post("/api/v1/auth/login", json={"email": payload["email"], "password": "bad"})
     assert bad_login.status_code == 401
+
+
+@pytest.mark.asyncio
+async def test_user_suggestions_match_email_and_name_prefixes(
+    client: AsyncClient, session_factory, users, use_current_user
+):
+    suggestion_cache.clear()
+    use_current_user(users["grantor"])
+
+    by_email = await client.get("/api/v1/auth/users/suggest", params={"q": "SUPER"})
+    assert by_email.status_code == 200
+    assert [user["email"] for user in by_email.json()] == ["supervisor@example.com"]
+    assert set(by_email.json()[0]) == {"id", "name", "email"}
+
+    # "Extra Supervisor" matches by name; "Grantee" and "Grantor" by email, in email order.
+    assert [user["name"] for user in (await client.get("/api/v1/auth/users/suggest", params={"q": "ex"})).json()] == [
+        "Extra Supervisor"
+    ]
+    grant = (await client.get("/api/v1/auth/users/suggest", params={"q": "grant", "limit": 1})).json()
+    assert [user["email"] for user in grant] == ["grantee@example.com"]
+
+    statements: list[str] = []
+
+    def _record(conn, cursor, statement, parameters, context, executemany):
+        statements.append(statement)
+
+    engine = session_factory.kw["bind"].sync_engine
+    event.listen(engine, "before_cursor_execute", _record)
+    try:
+        cached = await client.get("/api/v1/auth/users/suggest", params={"q": "super"})
+    finally:
+        event.remove(engine, "before_cursor_execute", _record)
+    assert cached.json() == by_email.json()
+    assert statements == []
+
+    await client.post(
+        "/api/v1/auth/register", json={"name": "Superb", "email": "superb@example.com", "password": "verysecret"}
+    )
+    refreshed = (await client.get("/api/v1/auth/users/suggest", params={"q": "super"})).json()
+    assert [user["email"] for user in refreshed] == ["superb@example.com", "supervisor@example.com"]
+
+    assert (await client.get("/api/v1/auth/users/suggest", params={"q": " s "})).status_code == 400
+    assert (await client.get("/api/v1/auth/users/suggest", params={"q": "su\U0010ffff"})).json() == []
+
+    await client.post(
+        "/api/v1/auth/register", json={"name": "Émile Zola", "email": "ezola@example.com", "password": "verysecret"}
+    )
+    assert [user["name"] for user in (await client.get("/api/v1/auth/users/suggest", params={"q": "Émi"})).json()] == [
+        "Émile Zola"
+    ]
+
+
+@pytest.mark.asyncio
+async def test_list_users_is_keyset_paginated(client: AsyncClient, users, use_current_user):
+    use_current_user(users["grantor"])
+    first = await client.get("/api/v1/auth/users", params={"limit": 2})
+    assert first.status_code == 200
+    assert [user["email"] for user in first.json()] == ["extra.supervisor@example.com", "grantee@example.com"]
+    rest = await client.get("/api/v1/auth/users", params={"after": first.json()[-1]["email"]})
+    assert [user["email"] for user in rest.json()] == ["grantor@example.com", "supervisor@example.com"]
@@ -1,6 +1,29 @@
+import asyncio
+import csv
+import hashlib
+import io
+import json
+from datetime import datetime, timedelta, timezone
+from decimal import Decimal
+from uuid import UUID, uuid4
+
 import pytest
 from httpx import AsyncClient
+from sqlalchemy import delete, event, func, select, update
 
+from src.core.config import settings
+from src.modules.auth.models import User
+from src.modules.grants import commands
+from src.modules.grants.audit import audit_log
+from src.modules.grants.deadlines import CHECKPOINT_NAME, OverdueSweeper
+from src.modules.grants.events import MAX_NOTIFY_PAYLOAD_BYTES, GrantEvent, GrantEventBroker, grant_events
+from src.modules.grants.models import GrantAuditOutbox, GrantProgram, GrantProgramDocument, Stage
+from src.modules.grants.repositories import GrantRepository
+from src.modules.grants.services import GrantService
+from src.modules.jobs.models import JobCheckpoint
+from src.modules.jobs.repositories import JobCheckpointRepository
+from src.modules.payments.reconciliation import PayoutReconciler, StatementEntry
+from src.modules.payments.schemas import PaymentStatus
 from src.modules.payments.services import PaymentService
 
 
@@ -94,7 +117,7 @@ async def test_grant_confirmation_triggers_deposit(monkeypatch, client: AsyncCli
     deposit_calls = {}
     original_deposit = PaymentService.deposit_grant
 
-    async def fake_deposit(self, *, participant_id: str, amount: float):
+    async def fake_deposit(self, *, participant_id: str, amount: float, idempotency_key: str | None = None):
         deposit_calls["participant_id"] = participant_id
         deposit_calls["amount"] = amount
         return await original_deposit(self, participant_id=participant_id, amount=amount)
@@ -121,6 +144,54 @@ async def test_grant_confirmation_triggers_deposit(monkeypatch, client: AsyncCli
     assert deposit_calls["amount"] == 1250.0
 
 
+@pytest.mark.asyncio
+async def test_confirmation_claims_the_program_before_depositing(
+    monkeypatch, client: AsyncClient, session_factory, users, use_current_user
+):
+    use_current_user(users["grantor"])
+    grant = (
+        await client.post(
+            "/api/v1/grants/",
+            json={
+                "name": "Two-phase Confirm",
+                "bank_account_number": "BANK-2PC",
+                "stages": [{"order": 1, "amount": 300, "requirements": []}],
+                "participants": [],
+            },
+        )
+    ).json()
+    outcomes = ["declined", "timeout", "completed"]
+    calls = []
+
+    async def fake_deposit(self, *, participant_id: str, amount: float, idempotency_key: str | None = None):
+        async with session_factory() as session:
+            # The claim is committed before the bank is called.
+            program_status = await session.scalar(
+                select(GrantProgram.status).where(GrantProgram.id == UUID(grant["id"]))
+            )
+        calls.append((program_status, idempotency_key))
+        outcome = outcomes.pop(0)
+        if outcome == "timeout":
+            raise TimeoutError("read timeout")
+        return PaymentStatus(transaction_id="tx-deposit", status=outcome)
+
+    monkeypatch.setattr(PaymentService, "deposit_grant", fake_deposit)
+
+    # A declined deposit releases the claim.
+    assert (await client.post(f"/api/v1/grants/{grant['id']}/confirm")).status_code == 502
+    assert (await client.get(f"/api/v1/grants/{grant['id']}")).json()["status"] == "draft"
+    # An unanswered one keeps it, and the next confirm resends under the same key.
+    assert (await client.post(f"/api/v1/grants/{grant['id']}/confirm")).status_code == 502
+    assert (await client.get(f"/api/v1/grants/{grant['id']}")).json()["status"] == "confirming"
+    confirmed = await client.post(f"/api/v1/grants/{grant['id']}/confirm")
+    assert confirmed.status_code == 200
+    assert confirmed.json()["status"] == "active"
+
+    assert [program_status for program_status, _ in calls] == ["confirming"] * 3
+    keys = [key for _, key in calls]
+    assert keys[0] != keys[1] and keys[1] == keys[2]
+
+
 @pytest.mark.asyncio
 async def test_grantor_can_promote_to_supervisor(client: AsyncClient, users, use_current_user):
     use_current_user(users["grantor"])
@@ -212,6 +283,12 @@ async def test_stage_payout_skipped_for_contract_stage(monkeypatch, client: Asyn
 
     monkeypatch.setattr(PaymentService, "send_stage_payout", fake_payout)
 
+    contract_response = await client.post(
+        "/api/v1/payment-middleware/contracts",
+        json={"name": "Groceries", "contract_type": "mcc_limit", "parameters": {"allowed_mcc": ["5411"]}},
+    )
+    contract_id = contract_response.json()["contract_id"]
+
     payload = {
         "name": "Contract Stage",
         "bank_account_number": "BANK-PAY",
@@ -219,7 +296,7 @@ async def test_stage_payout_skipped_for_contract_stage(monkeypatch, client: Asyn
             {
                 "order": 1,
                 "amount": 150,
-                "requirements": [{"name": "Smart", "description": "payment_contract_id:abc"}],
+                "requirements": [{"name": "Smart", "description": f"payment_contract_id:{contract_id}"}],
             },
         ],
         "participants": [{"user_id": str(users["grantee"].id), "role": "grantee"}],
@@ -227,6 +304,12 @@ async def test_stage_payout_skipped_for_contract_stage(monkeypatch, client: Asyn
 
     create_response = await client.post("/api/v1/grants/", json=payload)
     assert create_response.status_code == 201
+    assert create_response.json()["stages"][0]["requirements"][0]["payment_contract_id"] == contract_id
+
+    unknown_contract = {"name": "Smart", "payment_contract_id": str(uuid4())}
+    missing = {**payload, "stages": [{"order": 1, "amount": 150, "requirements": [unknown_contract]}]}
+    assert (await client.post("/api/v1/grants/", json=missing)).status_code == 404
+
     stage_id = create_response.json()["stages"][0]["id"]
     await client.post(f"/api/v1/grants/{create_response.json()['id']}/confirm")
 
@@ -357,3 +440,1039 @@ async def test_supervisor_cannot_complete_requirement_without_proof(client: Asyn
     without_proof = await client.post(f"/api/v1/grants/requirements/{requirement_id}/complete")
     assert without_proof.status_code == 400
     assert without_proof.json()["detail"] == "Proof not submitted yet"
+
+
+@pytest.mark.asyncio
+async def test_bulk_invite_resolves_participants_and_reports_missing(client: AsyncClient, users, use_current_user):
+    use_current_user(users["grantor"])
+    payload = {
+        "name": "Bulk Invite Program",
+        "bank_account_number": "BANK-444",
+        "stages": [{"order": 1, "amount": 100, "requirements": []}],
+        "participants": [],
+    }
+    create_response = await client.post("/api/v1/grants/", json=payload)
+    assert create_response.status_code == 201
+    grant_id = create_response.json()["id"]
+
+    missing = await client.post(
+        f"/api/v1/grants/{grant_id}/invite/bulk",
+        json={
+            "participants": [
+                {"user_email": users["grantee"].email, "role": "grantee"},
+                {"user_email": "nobody@example.com", "role": "grantee"},
+                {"user_id": "00000000-0000-0000-0000-000000000001", "role": "supervisor"},
+            ]
+        },
+    )
+    assert missing.status_code == 404
+    assert "nobody@example.com" in missing.json()["detail"]
+    assert "00000000-0000-0000-0000-000000000001" in missing.json()["detail"]
+
+    bulk = await client.post(
+        f"/api/v1/grants/{grant_id}/invite/bulk",
+        json={
+            "participants": [
+                {"user_email": users["grantee"].email, "role": "grantee"},
+                {"user_id": str(users["supervisor"].id), "role": "supervisor"},
+                {"user_email": users["extra_supervisor"].email, "role": "supervisor"},
+                {"user_id": str(users["grantor"].id), "role": "supervisor"},
+            ]
+        },
+    )
+    assert bulk.status_code == 200
+    roles = {p["user_id"]: p["role"] for p in bulk.json()}
+    assert roles == {
+        str(users["grantor"].id): "grantor",
+        str(users["grantee"].id): "grantee",
+        str(users["supervisor"].id): "supervisor",
+        str(users["extra_supervisor"].id): "supervisor",
+    }
+
+    # Re-sending the same batch leaves the participant list unchanged.
+    repeat = await client.post(
+        f"/api/v1/grants/{grant_id}/invite/bulk",
+        json={"participants": [{"user_email": users["grantee"].email, "role": "grantee"}]},
+    )
+    assert repeat.status_code == 200
+    assert len(repeat.json()) == 4
+
+
+@pytest.mark.asyncio
+async def test_removed_participant_loses_access(client: AsyncClient, users, use_current_user):
+    use_current_user(users["grantor"])
+    payload = {
+        "name": "Membership Program",
+        "bank_account_number": "BANK-555",
+        "stages": [{"order": 1, "amount": 100, "requirements": [{"name": "Doc", "description": "Upload doc"}]}],
+        "participants": [{"user_id": str(users["grantee"].id), "role": "grantee"}],
+    }
+    create_response = await client.post("/api/v1/grants/", json=payload)
+    assert create_response.status_code == 201
+    grant = create_response.json()
+    requirement_id = grant["stages"][0]["requirements"][0]["id"]
+    grantee_participant = next(p for p in grant["participants"] if p["role"] == "grantee")
+    await client.post(f"/api/v1/grants/{grant['id']}/confirm")
+
+    remove_resp = await client.delete(f"/api/v1/grants/{grant['id']}/participants/{grantee_participant['id']}")
+    assert remove_resp.status_code == 200
+
+    use_current_user(users["grantee"])
+    proof = await client.post(f"/api/v1/grants/requirements/{requirement_id}/proof", json={"proof_url": "https://file"})
+    assert proof.status_code == 403
+
+
+@pytest.mark.asyncio
+async def test_proof_submission_uses_targeted_queries(client: AsyncClient, session_factory, users, use_current_user):
+    use_current_user(users["grantor"])
+    payload = {
+        "name": "Query Budget",
+        "bank_account_number": "BANK-666",
+        "stages": [{"order": 1, "amount": 100, "requirements": [{"name": "Doc", "description": "Upload doc"}]}],
+        "participants": [
+            {"user_id": str(users["grantee"].id), "role": "grantee"},
+            {"user_id": str(users["supervisor"].id), "role": "supervisor"},
+            {"user_id": str(users["extra_supervisor"].id), "role": "supervisor"},
+        ],
+    }
+    create_response = await client.post("/api/v1/grants/", json=payload)
+    assert create_response.status_code == 201
+    grant = create_response.json()
+    requirement_id = grant["stages"][0]["requirements"][0]["id"]
+    await client.post(f"/api/v1/grants/{grant['id']}/confirm")
+
+    statements: list[str] = []
+
+    def _record(conn, cursor, statement, parameters, context, executemany):
+        statements.append(statement)
+
+    engine = session_factory.kw["bind"].sync_engine
+    event.listen(engine, "before_cursor_execute", _record)
+    try:
+        use_current_user(users["grantee"])
+        proof = await client.post(
+            f"/api/v1/grants/requirements/{requirement_id}/proof", json={"proof_url": "https://file"}
+        )
+    finally:
+        event.remove(engine, "before_cursor_execute", _record)
+
+    assert proof.status_code == 200
+    selects = [s for s in statements if s.lstrip().upper().startswith("SELECT")]
+    # Requirement context (with the stored document, patched in place) and membership probe.
+    assert len(selects) == 2
+    assert not any("user_to_grant.role AS" in s or "FROM users" in s for s in selects)
+
+
+@pytest.mark.asyncio
+async def test_concurrent_stage_completion_returns_conflict(
+    monkeypatch, client: AsyncClient, session_factory, users, use_current_user
+):
+    use_current_user(users["grantor"])
+    payload = {
+        "name": "Race Program",
+        "bank_account_number": "BANK-777",
+        "stages": [{"order": 1, "amount": 100, "requirements": []}, {"order": 2, "amount": 200, "requirements": []}],
+        "participants": [{"user_id": str(users["supervisor"].id), "role": "supervisor"}],
+    }
+    create_response = await client.post("/api/v1/grants/", json=payload)
+    assert create_response.status_code == 201
+    grant = create_response.json()
+    stage_id = grant["stages"][0]["id"]
+    await client.post(f"/api/v1/grants/{grant['id']}/confirm")
+
+    payout_calls = []
+
+    async def fake_payout(self, stage):
+        payout_calls.append(str(stage.id))
+
+    monkeypatch.setattr(PaymentService, "send_stage_payout", fake_payout)
+
+    # The competing click completes the stage right after this request has read it.
+    original_get_stage = GrantRepository.get_stage
+    raced = False
+
+    async def get_stage_then_race(self, stage_uuid):
+        nonlocal raced
+        stage = await original_get_stage(self, stage_uuid)
+        if not raced:
+            raced = True
+            async with session_factory() as other_session:
+                await GrantService(other_session).complete_stage(stage_id, users["supervisor"])
+        return stage
+
+    monkeypatch.setattr(GrantRepository, "get_stage", get_stage_then_race)
+
+    use_current_user(users["supervisor"])
+    loser = await client.post(f"/api/v1/grants/stages/{stage_id}/complete")
+    assert loser.status_code == 409
+    assert payout_calls == [stage_id]
+
+    grants = await client.get("/api/v1/grants/")
+    stages = grants.json()[0]["stages"]
+    assert [s["completion_status"] for s in stages] == ["completed", "active"]
+
+
+@pytest.mark.asyncio
+async def test_progress_counters_follow_transitions(client: AsyncClient, session_factory, users, use_current_user):
+    use_current_user(users["grantor"])
+    payload = {
+        "name": "Counter Program",
+        "bank_account_number": "BANK-888",
+        "stages": [
+            {"order": 1, "amount": 100, "requirements": [{"name": "Doc", "description": "Upload doc"}]},
+            {"order": 2, "amount": 250, "requirements": [{"name": "Report", "description": "Final report"}]},
+        ],
+        "participants": [{"user_id": str(users["grantee"].id), "role": "grantee"}],
+    }
+    create_response = await client.post("/api/v1/grants/", json=payload)
+    assert create_response.status_code == 201
+    grant = create_response.json()
+    assert grant["total_amount"] == 350
+    assert grant["pending_requirements"] == 2
+    requirement_id = grant["stages"][0]["requirements"][0]["id"]
+    await client.post(f"/api/v1/grants/{grant['id']}/confirm")
+
+    use_current_user(users["grantee"])
+    await client.post(f"/api/v1/grants/requirements/{requirement_id}/proof", json={"proof_url": "https://file"})
+    use_current_user(users["grantor"])
+    await client.post(f"/api/v1/grants/requirements/{requirement_id}/complete")
+    stage_resp = await client.post(f"/api/v1/grants/stages/{grant['stages'][0]['id']}/complete")
+    assert stage_resp.status_code == 200
+
+    empty = await client.post(
+        "/api/v1/grants/", json={"name": "No Budget", "bank_account_number": "BANK-0", "stages": [], "participants": []}
+    )
+    by_progress = await client.get("/api/v1/grants/", params={"order_by": "progress"})
+    assert [p["id"] for p in by_progress.json()] == [grant["id"], empty.json()["id"]]
+
+    listed = await client.get("/api/v1/grants/", params={"status": "active", "order_by": "progress"})
+    assert listed.status_code == 200
+    program = listed.json()[0]
+    assert program["disbursed_amount"] == 100
+    assert program["completed_stages"] == 1
+    assert program["pending_requirements"] == 1
+
+    assert await commands.verify_counters(session_factory) == 0
+
+    async with session_factory() as session:
+        await session.execute(
+            update(GrantProgram).where(GrantProgram.id == UUID(grant["id"])).values(completed_stages=7)
+        )
+        await session.commit()
+    assert await commands.verify_counters(session_factory) == 1
+    assert await commands.recompute_counters(session_factory) == 1
+    assert await commands.verify_counters(session_factory) == 0
+
+
+@pytest.mark.asyncio
+async def test_grant_list_supports_conditional_get(client: AsyncClient, users, use_current_user):
+    use_current_user(users["grantor"])
+    payload = {
+        "name": "ETag Program",
+        "bank_account_number": "BANK-999",
+        "stages": [{"order": 1, "amount": 100, "requirements": [{"name": "Doc", "description": "Upload doc"}]}],
+        "participants": [{"user_id": str(users["grantee"].id), "role": "grantee"}],
+    }
+    create_response = await client.post("/api/v1/grants/", json=payload)
+    grant = create_response.json()
+    await client.post(f"/api/v1/grants/{grant['id']}/confirm")
+
+    first = await client.get("/api/v1/grants/")
+    assert first.status_code == 200
+    etag = first.headers["etag"]
+
+    cached = await client.get("/api/v1/grants/", headers={"If-None-Match": etag})
+    assert cached.status_code == 304
+    assert cached.headers["etag"] == etag
+    assert cached.content == b""
+
+    # A child-only write (proof submission) still invalidates the list.
+    use_current_user(users["grantee"])
+    requirement_id = grant["stages"][0]["requirements"][0]["id"]
+    await client.post(f"/api/v1/grants/requirements/{requirement_id}/proof", json={"proof_url": "https://file"})
+    use_current_user(users["grantor"])
+    refreshed = await client.get("/api/v1/grants/", headers={"If-None-Match": etag})
+    assert refreshed.status_code == 200
+    assert refreshed.headers["etag"] != etag
+    assert refreshed.json()[0]["stages"][0]["requirements"][0]["proof_url"] == "https://file"
+
+
+@pytest.mark.asyncio
+async def test_export_streams_visible_portfolio(client: AsyncClient, users, use_current_user):
+    use_current_user(users["grantor"])
+    payload = {
+        "name": "Export Program",
+        "bank_account_number": "BANK-EXP",
+        "stages": [
+            {"order": 1, "amount": 150.5, "requirements": [{"name": "Doc", "description": "Upload doc"}]},
+            {"order": 2, "amount": 50, "requirements": []},
+        ],
+        "participants": [{"user_id": str(users["grantee"].id), "role": "grantee"}],
+    }
+    grant = (await client.post("/api/v1/grants/", json=payload)).json()
+    use_current_user(users["supervisor"])
+    await client.post("/api/v1/grants/", json={**payload, "name": "Hidden Program", "participants": []})
+
+    use_current_user(users["grantee"])
+    response = await client.get("/api/v1/grants/export")
+    assert response.status_code == 200
+    assert response.headers["content-type"].startswith("application/x-ndjson")
+    records = [json.loads(line) for line in response.text.splitlines()]
+    assert [record["type"] for record in records] == [
+        "program",
+        "stage",
+        "stage",
+        "requirement",
+        "participant",
+        "participant",
+    ]
+    assert records[0]["id"] == grant["id"]
+    assert records[0]["total_amount"] == "200.50"
+    assert records[1]["amount"] == "150.50"
+    assert {record["email"] for record in records[4:]} == {"grantor@example.com", "grantee@example.com"}
+
+    csv_response = await client.get("/api/v1/grants/export", params={"format": "csv"})
+    assert csv_response.headers["content-type"].startswith("text/csv")
+    rows = list(csv.DictReader(io.StringIO(csv_response.text)))
+    assert [(row["stage_order"], row["requirement_name"]) for row in rows] == [("1", "Doc"), ("2", "")]
+    assert {row["grant_program_name"] for row in rows} == {"Export Program"}
+
+
+@pytest.mark.asyncio
+async def test_event_broker_routes_by_program_and_drops_oldest():
+    broker = GrantEventBroker(queue_size=2)
+    program_id, other_program_id = uuid4(), uuid4()
+    member, newcomer = uuid4(), uuid4()
+
+    with broker.subscribe(member, [program_id]) as subscription, broker.subscribe(newcomer, []) as late:
+        broker.publish(GrantEvent("stage.activated", other_program_id, {}))
+        for index in range(3):
+            broker.publish(GrantEvent("requirement.proof_submitted", program_id, {"index": index}))
+        assert [subscription.queue.get_nowait().data["index"] for _ in range(2)] == [1, 2]
+
+        # Membership events move subscriptions between programs without reconnecting.
+        broker.publish(GrantEvent("participants.changed", program_id, {}, frozenset({newcomer})))
+        assert subscription.queue.get_nowait().kind == "participants.changed"
+        assert late.queue.get_nowait().kind == "participants.changed"
+        broker.publish(GrantEvent("stage.completed", program_id, {}))
+        assert subscription.queue.empty()
+        assert late.queue.get_nowait().kind == "stage.completed"
+
+    assert not broker._by_program and not broker._by_user
+
+
+@pytest.mark.asyncio
+async def test_large_membership_events_are_notified_by_reference(
+    client: AsyncClient, session_factory, users, use_current_user
+):
+    async with session_factory() as session:
+        members = [User(name=f"Member {i}", email=f"member{i}@example.com", hashed_password="pwd") for i in range(200)]
+        session.add_all(members)
+        await session.commit()
+    use_current_user(users["grantor"])
+    payload = {
+        "name": "Crowded Program",
+        "bank_account_number": "BANK-CROWD",
+        "stages": [],
+        "participants": [{"user_id": str(member.id), "role": "grantee"} for member in members[:150]],
+    }
+    grant = (await client.post("/api/v1/grants/", json=payload)).json()
+    with grant_events.subscribe(users["grantor"].id, [UUID(grant["id"])]) as subscription:
+        invite = await client.post(
+            f"/api/v1/grants/{grant['id']}/invite/bulk",
+            json={"participants": [{"user_id": str(member.id), "role": "grantee"} for member in members[150:]]},
+        )
+        assert invite.status_code == 200
+        event = subscription.queue.get_nowait()
+    assert event.kind == "participants.changed"
+    assert len(event.to_json().encode()) >= MAX_NOTIFY_PAYLOAD_BYTES
+
+    engine = session_factory.kw["bind"]
+    async with session_factory() as session:
+        payloads, unrecorded = await grant_events._notify_payloads(session, [event])
+        await session.commit()
+    # Sent by id instead, already in the audit log, and loaded back whole by listeners.
+    assert [len(p.encode()) < MAX_NOTIFY_PAYLOAD_BYTES for p in payloads] == [True]
+    assert unrecorded == []
+    assert await grant_events._load_event(engine, payloads[0]) == event
+    small = GrantEvent("stage.activated", event.grant_program_id, {"stage_id": "s"}, actor_id=users["grantor"].id)
+    async with session_factory() as session:
+        assert await grant_events._notify_payloads(session, [small]) == ([small.to_json()], [small])
+
+
+@pytest.mark.asyncio
+async def test_grant_transitions_are_published_after_commit(client: AsyncClient, users, use_current_user):
+    use_current_user(users["grantor"])
+    payload = {
+        "name": "Live Program",
+        "bank_account_number": "BANK-LIVE",
+        "stages": [{"order": 1, "amount": 100, "requirements": [{"name": "Doc", "description": "Upload doc"}]}],
+        "participants": [
+            {"user_id": str(users["grantee"].id), "role": "grantee"},
+            {"user_id": str(users["supervisor"].id), "role": "supervisor"},
+        ],
+    }
+    with grant_events.subscribe(users["grantee"].id, []) as subscription:
+        grant = (await client.post("/api/v1/grants/", json=payload)).json()
+        await client.post(f"/api/v1/grants/{grant['id']}/confirm")
+        requirement_id = grant["stages"][0]["requirements"][0]["id"]
+        use_current_user(users["supervisor"])
+        rejected = await client.post(f"/api/v1/grants/requirements/{requirement_id}/complete")
+        assert rejected.status_code == 400
+        use_current_user(users["grantee"])
+        await client.post(f"/api/v1/grants/requirements/{requirement_id}/proof", json={"proof_url": "https://file"})
+
+        kinds = []
+        while not subscription.queue.empty():
+            event = subscription.queue.get_nowait()
+            assert str(event.grant_program_id) == grant["id"]
+            kinds.append(event.kind)
+        assert kinds == ["program.created", "stage.activated", "program.confirmed", "requirement.proof_submitted"]
+        assert event.to_sse().startswith(b"event: requirement.proof_submitted\ndata: ")
+
+
+@pytest.mark.asyncio
+async def test_proof_upload_is_content_addressed_and_supports_ranges(
+    monkeypatch, tmp_path, client: AsyncClient, users, use_current_user
+):
+    monkeypatch.setattr(settings, "proof_storage_dir", str(tmp_path))
+    use_current_user(users["grantor"])
+    payload = {
+        "name": "Upload Program",
+        "bank_account_number": "BANK-UP",
+        "stages": [
+            {
+                "order": 1,
+                "amount": 100,
+                "requirements": [
+                    {"name": "Report", "description": "Upload report"},
+                    {"name": "Copy", "description": "Upload copy"},
+                ],
+            }
+        ],
+        "participants": [{"user_id": str(users["grantee"].id), "role": "grantee"}],
+    }
+    grant = (await client.post("/api/v1/grants/", json=payload)).json()
+    await client.post(f"/api/v1/grants/{grant['id']}/confirm")
+    first_id, second_id = (req["id"] for req in grant["stages"][0]["requirements"])
+    content = b"%PDF-1.7 proof body " * 1000
+    digest = hashlib.sha256(content).hexdigest()
+
+    use_current_user(users["grantee"])
+    uploads = [
+        await client.post(
+            f"/api/v1/grants/requirements/{requirement_id}/proof/upload",
+            files={"file": ("report.pdf", content, "application/pdf")},
+        )
+        for requirement_id in (first_id, second_id)
+    ]
+    assert [upload.status_code for upload in uploads] == [200, 200]
+    assert {upload.json()["proof_url"] for upload in uploads} == {f"/api/v1/grants/proofs/{digest}"}
+    stored = [path for path in tmp_path.rglob("*") if path.is_file()]
+    assert stored == [tmp_path / digest[:2] / digest[2:4] / digest]
+
+    use_current_user(users["grantor"])
+    full = await client.get(f"/api/v1/grants/proofs/{digest}")
+    assert full.status_code == 200
+    assert full.content == content
+    assert full.headers["accept-ranges"] == "bytes"
+
+    partial = await client.get(f"/api/v1/grants/proofs/{digest}", headers={"Range": "bytes=5-14"})
+    assert partial.status_code == 206
+    assert partial.content == content[5:15]
+    assert partial.headers["content-range"] == f"bytes 5-14/{len(content)}"
+
+    suffix = await client.get(f"/api/v1/grants/proofs/{digest}", headers={"Range": "bytes=-4"})
+    assert suffix.content == content[-4:]
+
+    unsatisfiable = await client.get(f"/api/v1/grants/proofs/{digest}", headers={"Range": "bytes=999999-"})
+    assert unsatisfiable.status_code == 416
+
+    cached = await client.get(f"/api/v1/grants/proofs/{digest}", headers={"If-None-Match": f'"{digest}"'})
+    assert cached.status_code == 304
+
+    use_current_user(users["extra_supervisor"])
+    outsider = await client.get(f"/api/v1/grants/proofs/{digest}")
+    assert outsider.status_code == 404
+
+
+@pytest.mark.asyncio
+async def test_rejected_proof_uploads_are_refused_before_the_body_is_read(
+    monkeypatch, tmp_path, client: AsyncClient, users, use_current_user
+):
+    monkeypatch.setattr(settings, "proof_storage_dir", str(tmp_path))
+    monkeypatch.setattr(settings, "proof_max_bytes", 64 * 1024)
+    use_current_user(users["grantor"])
+    payload = {
+        "name": "Upload Limits",
+        "bank_account_number": "BANK-LIM",
+        "stages": [{"order": 1, "amount": 100, "requirements": [{"name": "Report"}]}],
+        "participants": [{"user_id": str(users["grantee"].id), "role": "grantee"}],
+    }
+    grant = (await client.post("/api/v1/grants/", json=payload)).json()
+    await client.post(f"/api/v1/grants/{grant['id']}/confirm")
+    url = f"/api/v1/grants/requirements/{grant['stages'][0]['requirements'][0]['id']}/proof/upload"
+    boundary = "proof-boundary"
+    headers = {"Content-Type": f"multipart/form-data; boundary={boundary}"}
+
+    def multipart(content: bytes) -> bytes:
+        return (
+            f'--{boundary}\r\nContent-Disposition: form-data; name="file"; filename="report.pdf"\r\n'
+            f"Content-Type: application/pdf\r\n\r\n"
+        ).encode() + content + f"\r\n--{boundary}--\r\n".encode()
+
+    sent_chunks: list[int] = []
+
+    async def body(data: bytes):
+        for start in range(0, len(data), 4096):
+            sent_chunks.append(start)
+            yield data[start:start + 4096]
+
+    async def upload(data: bytes):
+        return await client.post(url, content=body(data), headers={**headers, "Content-Length": str(len(data))})
+
+    use_current_user(users["extra_supervisor"])
+    assert (await upload(multipart(b"x" * 1024))).status_code == 403
+    use_current_user(users["grantee"])
+    assert (await upload(multipart(b"x" * 1024 * 1024))).status_code == 413
+    assert sent_chunks == []
+
+    # Declared within the allowance for multipart framing, but the file itself is over the limit.
+    too_large = multipart(b"x" * (64 * 1024 + 1))
+    assert (await upload(too_large)).status_code == 413
+    assert [path for path in tmp_path.rglob("*") if path.is_file()] == []
+
+    accepted = await upload(multipart(b"y" * 1000))
+    assert accepted.status_code == 200
+    digest = hashlib.sha256(b"y" * 1000).hexdigest()
+    assert accepted.json()["proof_url"] == f"/api/v1/grants/proofs/{digest}"
+    assert [path for path in tmp_path.rglob("*") if path.is_file()] == [tmp_path / digest[:2] / digest[2:4] / digest]
+
+
+@pytest.mark.asyncio
+async def test_audit_log_batches_transitions_into_timeline(
+    client: AsyncClient, session_factory, users, use_current_user
+):
+    engine = session_factory.kw["bind"]
+    audit_inserts = []
+
+    def _count_inserts(conn, cursor, statement, parameters, context, executemany):
+        if statement.startswith("INSERT INTO grant_events "):
+            audit_inserts.append(statement)
+
+    use_current_user(users["grantor"])
+    payload = {
+        "name": "Audited Program",
+        "bank_account_number": "BANK-AUD",
+        "stages": [{"order": 1, "amount": 100, "requirements": []}],
+        "participants": [],
+    }
+    # No writer is running: every change leaves its events in the outbox, committed with the change.
+    grant = (await client.post("/api/v1/grants/", json=payload)).json()
+    await client.post(f"/api/v1/grants/{grant['id']}/confirm")
+    await client.post(
+        f"/api/v1/grants/{grant['id']}/invite", json={"user_id": str(users["grantee"].id), "role": "grantee"}
+    )
+    await client.post(f"/api/v1/grants/stages/{grant['stages'][0]['id']}/complete")
+    async with session_factory() as session:
+        assert await session.scalar(select(func.count()).select_from(GrantAuditOutbox)) == 4
+
+    event.listen(engine.sync_engine, "before_cursor_execute", _count_inserts)
+    try:
+        async with audit_log.running(session_factory):
+            pass
+    finally:
+        event.remove(engine.sync_engine, "before_cursor_execute", _count_inserts)
+    # The writer drained the whole backlog at once, as one multi-row insert.
+    assert len(audit_inserts) == 1
+    async with session_factory() as session:
+        assert await session.scalar(select(func.count()).select_from(GrantAuditOutbox)) == 0
+
+    use_current_user(users["grantee"])
+    timeline = (await client.get(f"/api/v1/grants/{grant['id']}/events")).json()
+    assert [entry["kind"] for entry in timeline] == [
+        "program.completed",
+        "stage.completed",
+        "participants.changed",
+        "program.confirmed",
+        "stage.activated",
+        "program.created",
+    ]
+    assert {entry["actor_id"] for entry in timeline} == {str(users["grantor"].id)}
+    assert timeline[2]["payload"]["invited"] == [{"user_id": str(users["grantee"].id), "role": "grantee"}]
+
+    older = (await client.get(f"/api/v1/grants/{grant['id']}/events", params={"before": timeline[1]["id"], "limit": 2}))
+    assert [entry["id"] for entry in older.json()] == [timeline[2]["id"], timeline[3]["id"]]
+
+    use_current_user(users["extra_supervisor"])
+    forbidden = await client.get(f"/api/v1/grants/{grant['id']}/events")
+    assert forbidden.status_code == 403
+
+    assert await commands.archive_events(older_than_days=-1, batch_size=4, session_factory=session_factory) == 6
+    use_current_user(users["grantor"])
+    assert (await client.get(f"/api/v1/grants/{grant['id']}/events")).json() == []
+
+
+@pytest.mark.asyncio
+async def test_audit_writer_drains_the_outbox_without_waiting_for_the_interval(
+    monkeypatch, client: AsyncClient, session_factory, users, use_current_user
+):
+    engine = session_factory.kw["bind"]
+    audit_inserts = []
+
+    def _count_inserts(conn, cursor, statement, parameters, context, executemany):
+        if statement.startswith("INSERT INTO grant_events "):
+            audit_inserts.append(statement)
+
+    async def _inserts_reach(count: int) -> None:
+        # Watches statements only: the test must not share the connection with the writer mid-transaction.
+        for _ in range(500):
+            if len(audit_inserts) >= count:
+                return
+            await asyncio.sleep(0.01)
+
+    monkeypatch.setattr(audit_log, "flush_interval", 60)
+    monkeypatch.setattr(audit_log, "max_batch", 1)
+    use_current_user(users["grantor"])
+
+    def _payload(name: str) -> dict:
+        return {
+            "name": name,
+            "bank_account_number": "BANK-AUD",
+            "stages": [{"order": 1, "amount": 100, "requirements": []}],
+            "participants": [],
+        }
+
+    for index in range(3):
+        await client.post("/api/v1/grants/", json=_payload(f"Backlog {index}"))
+    event.listen(engine.sync_engine, "before_cursor_execute", _count_inserts)
+    try:
+        async with audit_log.running(session_factory):
+            # A backlog is copied batch after batch, not one batch per interval.
+            await _inserts_reach(3)
+            assert len(audit_inserts) == 3
+            # Let the writer find the outbox empty and go idle before the test uses the shared connection.
+            await asyncio.sleep(0.1)
+            # A commit wakes the idle writer.
+            async with session_factory() as session:
+                await audit_log.stage(session, [GrantEvent("program.created", uuid4(), {})])
+                await session.commit()
+            audit_log.notify()
+            await _inserts_reach(4)
+            assert len(audit_inserts) == 4
+    finally:
+        event.remove(engine.sync_engine, "before_cursor_execute", _count_inserts)
+
+
+@pytest.mark.asyncio
+async def test_template_clone_copies_rows_server_side(client: AsyncClient, session_factory, users, use_current_user):
+    use_current_user(users["grantor"])
+    template_payload = {
+        "name": "Round template",
+        "stages": [
+            {"order": 1, "amount": 120.5, "requirements": [{"name": "Plan", "description": "Upload plan"}]},
+            {
+                "order": 2,
+                "amount": 80,
+                "requirements": [{"name": "Report", "description": None}, {"name": "Receipts", "description": "All"}],
+            },
+        ],
+    }
+    dated = {**template_payload, "stages": [{"order": 1, "amount": 10, "due_at": "2030-01-01T00:00:00Z"}]}
+    assert (await client.post("/api/v1/grants/templates", json=dated)).status_code == 422
+    template = (await client.post("/api/v1/grants/templates", json=template_payload)).json()
+    assert [stage["order"] for stage in template["stages"]] == [1, 2]
+    assert [t["id"] for t in (await client.get("/api/v1/grants/templates")).json()] == [template["id"]]
+
+    clone_payload = {
+        "programs": [
+            {
+                "name": f"Round program {index}",
+                "bank_account_number": f"BANK-{index}",
+                "participants": [
+                    {"user_email": "grantee@example.com", "role": "grantee"},
+                    {"user_id": str(users["supervisor"].id), "role": "supervisor"},
+                ],
+            }
+            for index in range(25)
+        ]
+    }
+    engine = session_factory.kw["bind"]
+    statements = []
+
+    def _record(conn, cursor, statement, parameters, context, executemany):
+        statements.append(statement)
+
+    event.listen(engine.sync_engine, "before_cursor_execute", _record)
+    try:
+        response = await client.post(f"/api/v1/grants/templates/{template['id']}/clone", json=clone_payload)
+    finally:
+        event.remove(engine.sync_engine, "before_cursor_execute", _record)
+    assert response.status_code == 201
+    writes = [statement.split()[0] for statement in statements if not statement.startswith("SELECT")]
+    # Programs, memberships, stages, requirements, documents and the audit outbox row: one INSERT each, however
+    # many programs are cloned.
+    assert writes.count("INSERT") == 6
+
+    programs = response.json()
+    assert [program["name"] for program in programs] == [f"Round program {index}" for index in range(25)]
+    program = programs[0]
+    assert program["status"] == "draft"
+    assert program["total_amount"] == 200.5
+    assert program["pending_requirements"] == 3
+    assert sorted(len(stage["requirements"]) for stage in program["stages"]) == [1, 2]
+    assert {p["role"] for p in program["participants"]} == {"grantor", "grantee", "supervisor"}
+    stage_ids = {stage["id"] for p in programs for stage in p["stages"]}
+    assert len(stage_ids) == 50
+
+    confirm = await client.post(f"/api/v1/grants/{program['id']}/confirm")
+    assert confirm.status_code == 200
+    assert [stage["completion_status"] for stage in confirm.json()["stages"]] == ["active", "pending"]
+
+    use_current_user(users["supervisor"])
+    forbidden = await client.post(f"/api/v1/grants/templates/{template['id']}/clone", json=clone_payload)
+    assert forbidden.status_code == 403
+
+
+@pytest.mark.asyncio
+async def test_get_program_and_batch_fetch_by_ids(client: AsyncClient, session_factory, users, use_current_user):
+    use_current_user(users["grantor"])
+    created = []
+    for name in ("Detail A", "Detail B"):
+        payload = {
+            "name": name,
+            "bank_account_number": "BANK-DETAIL",
+            "stages": [{"order": 1, "amount": 100, "requirements": [{"name": "Doc"}]}],
+            "participants": [{"user_id": str(users["grantee"].id), "role": "grantee"}],
+        }
+        created.append((await client.post("/api/v1/grants/", json=payload)).json())
+    use_current_user(users["supervisor"])
+    hidden = (
+        await client.post(
+            "/api/v1/grants/",
+            json={"name": "Hidden", "bank_account_number": "BANK-HID", "stages": [], "participants": []},
+        )
+    ).json()
+
+    statements: list[str] = []
+
+    def _record(conn, cursor, statement, parameters, context, executemany):
+        statements.append(statement)
+
+    engine = session_factory.kw["bind"].sync_engine
+    use_current_user(users["grantee"])
+    event.listen(engine, "before_cursor_execute", _record)
+    try:
+        detail = await client.get(f"/api/v1/grants/{created[0]['id']}")
+        detail_selects = len(statements)
+        not_modified = await client.get(
+            f"/api/v1/grants/{created[0]['id']}", headers={"If-None-Match": detail.headers["etag"]}
+        )
+        statements.clear()
+        ids = ",".join([created[1]["id"], hidden["id"], created[0]["id"]])
+        batch = await client.get("/api/v1/grants/", params={"ids": ids})
+        batch_selects = len(statements)
+    finally:
+        event.remove(engine, "before_cursor_execute", _record)
+
+    assert detail.status_code == 200
+    assert detail.json()["name"] == "Detail A"
+    # Version probe, membership probe, then the stored document by primary key.
+    assert detail_selects == 3
+    assert not_modified.status_code == 304
+    assert batch.status_code == 200
+    assert [program["name"] for program in batch.json()] == ["Detail B", "Detail A"]
+    # Version probe plus one IN query per relationship level, whatever the number of ids.
+    assert batch_selects == 6
+
+    assert (await client.get(f"/api/v1/grants/{hidden['id']}")).status_code == 403
+    assert (await client.get(f"/api/v1/grants/{uuid4()}")).status_code == 404
+    assert (await client.get("/api/v1/grants/", params={"ids": "not-a-uuid"})).status_code == 400
+
+
+@pytest.mark.asyncio
+async def test_pending_actions_across_programs(client: AsyncClient, session_factory, users, use_current_user):
+    use_current_user(users["grantor"])
+    programs = []
+    for name in ("Actions A", "Actions B"):
+        payload = {
+            "name": name,
+            "bank_account_number": "BANK-ACT",
+            "stages": [
+                {"order": 1, "amount": 100, "requirements": [{"name": "Report"}, {"name": "Invoice"}]},
+                {"order": 2, "amount": 100, "requirements": [{"name": "Later"}]},
+            ],
+            "participants": [
+                {"user_id": str(users["grantee"].id), "role": "grantee"},
+                {"user_id": str(users["supervisor"].id), "role": "supervisor"},
+            ],
+        }
+        program = (await client.post("/api/v1/grants/", json=payload)).json()
+        programs.append(program)
+    # Only the first program is confirmed; draft programs have no active stage.
+    await client.post(f"/api/v1/grants/{programs[0]['id']}/confirm")
+    report, invoice = programs[0]["stages"][0]["requirements"]
+
+    use_current_user(users["grantee"])
+    await client.post(f"/api/v1/grants/requirements/{report['id']}/proof", json={"proof_url": "https://file"})
+
+    statements: list[str] = []
+
+    def _record(conn, cursor, statement, parameters, context, executemany):
+        statements.append(statement)
+
+    engine = session_factory.kw["bind"].sync_engine
+    event.listen(engine, "before_cursor_execute", _record)
+    try:
+        grantee_actions = await client.get("/api/v1/grants/pending-actions")
+    finally:
+        event.remove(engine, "before_cursor_execute", _record)
+    assert grantee_actions.status_code == 200
+    assert [(a["action"], a["requirement_id"]) for a in grantee_actions.json()] == [("submit_proof", invoice["id"])]
+    assert len(statements) == 1
+
+    use_current_user(users["supervisor"])
+    supervisor_actions = (await client.get("/api/v1/grants/pending-actions")).json()
+    assert [(a["action"], a["requirement_id"]) for a in supervisor_actions] == [("review_proof", report["id"])]
+    assert supervisor_actions[0]["grant_program_name"] == "Actions A"
+    assert supervisor_actions[0]["stage_order"] == 1
+    assert supervisor_actions[0]["proof_url"] == "https://file"
+
+    use_current_user(users["extra_supervisor"])
+    assert (await client.get("/api/v1/grants/pending-actions")).json() == []
+
+
+@pytest.mark.asyncio
+async def test_overdue_stages_are_swept_once_from_checkpoint(
+    client: AsyncClient, session_factory, users, use_current_user
+):
+    now = datetime.now(timezone.utc)
+    use_current_user(users["grantor"])
+    late = {
+        "name": "Late Program",
+        "bank_account_number": "BANK-LATE",
+        "stages": [
+            {"order": 1, "amount": 100, "due_at": (now - timedelta(days=2)).isoformat()},
+            # Activated only after the sweeper has moved past its deadline.
+            {"order": 2, "amount": 100, "due_at": (now - timedelta(days=3)).isoformat()},
+        ],
+        "participants": [{"user_id": str(users["grantee"].id), "role": "grantee"}],
+    }
+    on_time = {
+        "name": "On Time Program",
+        "bank_account_number": "BANK-ON-TIME",
+        "stages": [{"order": 1, "amount": 100, "due_at": (now + timedelta(days=1)).isoformat()}],
+        "participants": [{"user_id": str(users["grantee"].id), "role": "grantee"}],
+    }
+    late_grant = (await client.post("/api/v1/grants/", json=late)).json()
+    on_time_grant = (await client.post("/api/v1/grants/", json=on_time)).json()
+    await client.post(f"/api/v1/grants/{late_grant['id']}/confirm")
+    await client.post(f"/api/v1/grants/{on_time_grant['id']}/confirm")
+    first, second = late_grant["stages"]
+
+    use_current_user(users["grantee"])
+    overdue = (await client.get("/api/v1/grants/overdue-stages")).json()
+    assert [stage["stage_id"] for stage in overdue] == [first["id"]]
+
+    # The first locking read creates the checkpoint row, so even the first sweeps take turns.
+    async with session_factory() as session:
+        checkpoints = JobCheckpointRepository(session)
+        assert await checkpoints.get(CHECKPOINT_NAME, lock=True) is None
+        assert await session.scalar(select(JobCheckpoint.position).where(JobCheckpoint.name == CHECKPOINT_NAME)) == {}
+
+    sweeper = OverdueSweeper(batch_size=1)
+    with grant_events.subscribe(users["grantee"].id, [UUID(late_grant["id"]), UUID(on_time_grant["id"])]) as sub:
+        assert await sweeper.sweep(session_factory) == 1
+        assert await sweeper.sweep(session_factory) == 0
+
+        use_current_user(users["grantor"])
+        assert (await client.post(f"/api/v1/grants/stages/{first['id']}/complete")).status_code == 200
+        assert await sweeper.sweep(session_factory) == 0
+        assert await sweeper.sweep(session_factory, now=now + timedelta(days=2)) == 1
+
+        overdue_events = []
+        while not sub.queue.empty():
+            event = sub.queue.get_nowait()
+            if event.kind == "stage.overdue":
+                overdue_events.append(event.data["stage_id"])
+    assert overdue_events == [first["id"], second["id"], on_time_grant["stages"][0]["id"]]
+
+
+@pytest.mark.asyncio
+async def test_search_ranks_matches_in_accessible_programs(client: AsyncClient, users, use_current_user):
+    use_current_user(users["grantor"])
+    payload = {
+        "name": "Ocean Robotics Fellowship",
+        "bank_account_number": "BANK-SEARCH",
+        "stages": [
+            {
+                "order": 1,
+                "amount": 100,
+                "requirements": [
+                    {"name": "Robotics prototype", "description": "Underwater drone demo"},
+                    {"name": "Budget", "description": "Spending plan for the robotics lab"},
+                    {"name": "Report"},
+                ],
+            }
+        ],
+        "participants": [{"user_id": str(users["grantee"].id), "role": "grantee"}],
+    }
+    grant = (await client.post("/api/v1/grants/", json=payload)).json()
+    use_current_user(users["supervisor"])
+    await client.post(
+        "/api/v1/grants/",
+        json={"name": "Private Robotics Lab", "bank_account_number": "BANK-PRIV", "stages": [], "participants": []},
+    )
+
+    use_current_user(users["grantee"])
+    results = (await client.get("/api/v1/grants/search", params={"q": "Robotics"})).json()
+    assert [hit["grant_program_id"] for hit in results["programs"]] == [grant["id"]]
+    # A match in the name outranks one in the description.
+    assert [hit["name"] for hit in results["requirements"]] == ["Robotics prototype", "Budget"]
+    assert results["requirements"][0]["grant_program_name"] == "Ocean Robotics Fellowship"
+
+    both = (await client.get("/api/v1/grants/search", params={"q": "drone robotics"})).json()
+    assert [hit["name"] for hit in both["requirements"]] == ["Robotics prototype"]
+    assert both["programs"] == []
+
+    assert (await client.get("/api/v1/grants/search", params={"q": '"*'})).status_code == 400
+
+    use_current_user(users["extra_supervisor"])
+    assert (await client.get("/api/v1/grants/search", params={"q": "robotics"})).json() == {
+        "programs": [],
+        "requirements": [],
+    }
+
+
+@pytest.mark.asyncio
+async def test_archived_programs_leave_hot_tables_and_stay_readable(
+    client: AsyncClient, session_factory, users, use_current_user
+):
+    use_current_user(users["grantor"])
+    grants = []
+    for name in ("Finished Program", "Running Program"):
+        payload = {
+            "name": name,
+            "bank_account_number": "BANK-ARCHIVE",
+            "stages": [{"order": 1, "amount": 100, "requirements": []}, {"order": 2, "amount": 50, "requirements": []}],
+            "participants": [{"user_id": str(users["grantee"].id), "role": "grantee"}],
+        }
+        grant = (await client.post("/api/v1/grants/", json=payload)).json()
+        await client.post(f"/api/v1/grants/{grant['id']}/confirm")
+        grants.append(grant)
+    finished, running = grants
+    for stage in finished["stages"]:
+        assert (await client.post(f"/api/v1/grants/stages/{stage['id']}/complete")).status_code == 200
+    async with session_factory() as session:
+        await session.execute(
+            update(GrantProgram)
+            .where(GrantProgram.id == UUID(finished["id"]))
+            .values(completed_at=datetime.now(timezone.utc) - timedelta(days=400))
+        )
+        await session.commit()
+
+    use_current_user(users["grantee"])
+    before = (await client.get(f"/api/v1/grants/{finished['id']}")).json()
+
+    assert await commands.archive_programs(older_than_days=180, batch_size=1, session_factory=session_factory) == 1
+    async with session_factory() as session:
+        assert await session.get(GrantProgram, UUID(finished["id"])) is None
+        assert (await session.execute(select(Stage.grant_program_id).distinct())).scalars().all() == [
+            UUID(running["id"])
+        ]
+
+    hot = (await client.get("/api/v1/grants/")).json()
+    assert [program["id"] for program in hot] == [running["id"]]
+    with_archive = (await client.get("/api/v1/grants/", params={"include_archived": "true", "order_by": "progress"}))
+    assert [program["id"] for program in with_archive.json()] == [finished["id"], running["id"]]
+    assert with_archive.headers["etag"] != (await client.get("/api/v1/grants/")).headers["etag"]
+
+    # Out of the hot tables, the program is not found unless the archive is asked for.
+    assert (await client.get(f"/api/v1/grants/{finished['id']}")).status_code == 404
+    archived = await client.get(f"/api/v1/grants/{finished['id']}", params={"include_archived": "true"})
+    assert archived.status_code == 200
+    assert archived.json() == before
+    use_current_user(users["extra_supervisor"])
+    assert (
+        await client.get(f"/api/v1/grants/{finished['id']}", params={"include_archived": "true"})
+    ).status_code == 403
+
+    # Transfers of archived stages still reconcile against the statement.
+    statement = sorted(
+        (
+            StatementEntry("BANK-ARCHIVE", UUID(stage["id"]), f"tx-{stage['order']}", Decimal(str(stage["amount"])))
+            for stage in finished["stages"]
+        ),
+        key=lambda entry: entry.stage_id,
+    )
+
+    async def fake_statement(after_account):
+        for entry in statement:
+            yield entry
+
+    reconciler = PayoutReconciler(session_factory, statement=fake_statement)
+    assert [d async for d in reconciler.run()] == []
+    assert reconciler.stages_checked == 2
+
+
+@pytest.mark.asyncio
+async def test_program_detail_is_served_from_the_stored_document(
+    client: AsyncClient, session_factory, users, use_current_user
+):
+    use_current_user(users["grantor"])
+    payload = {
+        "name": "Read Model",
+        "bank_account_number": "BANK-DOC",
+        "stages": [
+            {
+                "order": order,
+                "amount": 10,
+                "requirements": [{"name": f"Doc {order}.{n}"} for n in range(1 if order == 1 else 5)],
+            }
+            for order in range(1, 21)
+        ],
+        "participants": [{"user_id": str(users["grantee"].id), "role": "grantee"}],
+    }
+    grant = (await client.post("/api/v1/grants/", json=payload)).json()
+    await client.post(f"/api/v1/grants/{grant['id']}/confirm")
+    requirement_id = grant["stages"][0]["requirements"][0]["id"]
+
+    use_current_user(users["grantee"])
+    proof = await client.post(f"/api/v1/grants/requirements/{requirement_id}/proof", json={"proof_url": "https://doc"})
+    assert proof.status_code == 200
+    use_current_user(users["grantor"])
+    assert (await client.post(f"/api/v1/grants/requirements/{requirement_id}/complete")).status_code == 200
+    assert (await client.post(f"/api/v1/grants/stages/{grant['stages'][0]['id']}/complete")).status_code == 200
+
+    statements: list[str] = []
+
+    def _record(conn, cursor, statement, parameters, context, executemany):
+        statements.append(statement)
+
+    engine = session_factory.kw["bind"].sync_engine
+    event.listen(engine, "before_cursor_execute", _record)
+    try:
+        detail = await client.get(f"/api/v1/grants/{grant['id']}")
+    finally:
+        event.remove(engine, "before_cursor_execute", _record)
+    assert detail.status_code == 200
+    # 20 stages and 96 requirements cost the same as an empty program.
+    assert len(statements) == 3
+    body = detail.json()
+    assert body["status"] == "active"
+    assert [stage["completion_status"] for stage in body["stages"][:2]] == ["completed", "active"]
+    assert body["stages"][0]["requirements"][0]["proof_url"] == "https://doc"
+    assert body["stages"][0]["requirements"][0]["status"] == "completed"
+    assert (body["completed_stages"], body["disbursed_amount"]) == (1, 10)
+    # The writes patched the stored document; it is the same as serializing the program from the tables now.
+    assert body == (await client.get("/api/v1/grants/", params={"ids": grant["id"]})).json()[0]
+
+    # The documents are derived data: dropped, the detail view falls back to the tables until they are rebuilt.
+    async with session_factory() as session:
+        await session.execute(delete(GrantProgramDocument))
+        await session.commit()
+    assert (await client.get(f"/api/v1/grants/{grant['id']}")).json() == body
+    assert await commands.rebuild_documents(batch_size=1, session_factory=session_factory) == 1
+    async with session_factory() as session:
+        document = await GrantRepository(session).get_document(UUID(grant["id"]))
+    assert json.loads(document) == body
@@ -1,6 +1,10 @@
+from uuid import uuid4
+
 import pytest
 from httpx import AsyncClient
 
+from src.modules.payment_middleware.services import BankAPIClient
+
 
 @pytest.mark.asyncio
 async def test_contract_create_list_execute(client: AsyncClient):
@@ -109,3 +113,57 @@ async def test_deposit_and_balance(client: AsyncClient):
     tx_resp = await client.get("/api/v1/payment-middleware/transactions/1111222233334444")
     assert tx_resp.status_code == 200
     assert len(tx_resp.json()) >= 1
+
+
+@pytest.mark.asyncio
+async def test_purchase_tagged_with_stage_tracks_spend(monkeypatch, client: AsyncClient, users, use_current_user):
+    use_current_user(users["grantor"])
+    contract_id = (
+        await client.post(
+            "/api/v1/payment-middleware/contracts",
+            json={"name": "Groceries", "contract_type": "mcc_limit", "parameters": {"allowed_mcc": ["5411"]}},
+        )
+    ).json()["contract_id"]
+    create_resp = await client.post(
+        "/api/v1/grants/",
+        json={
+            "name": "Spend Tracking",
+            "bank_account_number": "BANK-SPEND",
+            "stages": [
+                {"order": 1, "amount": 300, "requirements": [{"name": "Food", "payment_contract_id": contract_id}]}
+            ],
+            "participants": [{"user_id": str(users["grantee"].id), "role": "grantee"}],
+        },
+    )
+    program_id = create_resp.json()["id"]
+    stage_id = create_resp.json()["stages"][0]["id"]
+    purchase = {"mcc": "5411", "cost": 200.0, "merchant_id": "store_01", "card_number": "1234567812345678"}
+    url = f"/api/v1/payment-middleware/process-purchase-with-contract?contract_id={contract_id}&stage_id={stage_id}"
+
+    # Pending stages do not accept spend yet.
+    assert (await client.post(url, json=purchase)).status_code == 409
+    await client.post(f"/api/v1/grants/{program_id}/confirm")
+
+    ok_resp = await client.post(url, json=purchase)
+    assert ok_resp.status_code == 200
+
+    over_budget = await client.post(url, json={**purchase, "cost": 150.0})
+    assert over_budget.status_code == 400
+    assert "budget" in over_budget.json()["detail"]
+
+    unknown_stage = url.replace(stage_id, str(uuid4()))
+    assert (await client.post(unknown_stage, json=purchase)).status_code == 404
+
+    async def _declined(self, purchase_info):
+        raise ValueError("Insufficient funds")
+
+    # The reservation is committed before the bank is called and given back when the payment fails.
+    monkeypatch.setattr(BankAPIClient, "payment", _declined)
+    with pytest.raises(ValueError):
+        await client.post(url, json={**purchase, "cost": 100.0})
+
+    programs = (await client.get("/api/v1/grants/")).json()
+    stage = next(p for p in programs if p["id"] == program_id)["stages"][0]
+    assert stage["spent_amount"] == 200.0
+    detail = (await client.get(f"/api/v1/grants/{program_id}")).json()
+    assert detail["stages"][0]["spent_amount"] == 200.0
@@ -0,0 +1,296 @@
+from datetime import datetime, timedelta, timezone
+from decimal import Decimal
+from uuid import UUID, uuid4
+
+import pytest
+from httpx import AsyncClient
+from sqlalchemy import select, update
+
+from src.core.config import settings
+from src.modules.payments.gateway import SimplePaymentGateway
+from src.modules.jobs.repositories import JobCheckpointRepository
+from src.modules.payments.models import PayoutSchedule
+from src.modules.payments.reconciliation import CHECKPOINT_NAME, PayoutReconciler, StatementEntry
+from src.modules.payments.scheduler import PayoutScheduler, payout_due_at
+from src.modules.payments.schemas import PaymentStatus
+from src.modules.payments.services import PaymentService
+
+
+def test_next_month_policy_rolls_over_year_end():
+    approved = datetime(2025, 12, 31, 23, 30, tzinfo=timezone.utc)
+    assert payout_due_at("next_month", approved) == datetime(2026, 1, 1, tzinfo=timezone.utc)
+    assert payout_due_at("immediate", approved) is None
+
+
+@pytest.mark.asyncio
+async def test_scheduled_payout_is_sent_when_due(
+    monkeypatch, client: AsyncClient, session_factory, users, use_current_user
+):
+    sent = []
+
+    async def fake_send(self, bank_account_number, payouts):
+        sent.append((bank_account_number, [float(payout.amount) for payout in payouts]))
+        return PaymentStatus(transaction_id="tx-1", status="completed")
+
+    monkeypatch.setattr(PaymentService, "send_netted_payout", fake_send)
+    use_current_user(users["grantor"])
+    grant = (
+        await client.post(
+            "/api/v1/grants/",
+            json={
+                "name": "Monthly Payouts",
+                "bank_account_number": "BANK-SCHED",
+                "payout_policy": "next_month",
+                "stages": [{"order": 1, "amount": 250, "requirements": []}],
+                "participants": [],
+            },
+        )
+    ).json()
+    assert grant["payout_policy"] == "next_month"
+    await client.post(f"/api/v1/grants/{grant['id']}/confirm")
+    assert (await client.post(f"/api/v1/grants/stages/{grant['stages'][0]['id']}/complete")).status_code == 200
+
+    due = payout_due_at("next_month", datetime.now(timezone.utc))
+    scheduler = PayoutScheduler()
+    async with scheduler.running(session_factory):
+        # Loaded from the table at startup; nothing is sent before the due time.
+        assert scheduler.next_wakeup == due
+        assert await scheduler.run_due(now=due - timedelta(seconds=1)) == 0
+        assert await scheduler.run_due(now=due) == 1
+        assert await scheduler.run_due(now=due) == 0
+
+    assert sent == [("BANK-SCHED", [250.0])]
+    async with session_factory() as session:
+        payout = (await session.execute(select(PayoutSchedule))).scalar_one()
+    assert (payout.status, payout.attempts, payout.transaction_id) == ("paid", 1, "tx-1")
+
+
+@pytest.mark.asyncio
+async def test_stale_payout_claims_are_reported_and_claimed_again(
+    monkeypatch, client: AsyncClient, session_factory, users, use_current_user
+):
+    sent = []
+
+    async def fake_send(self, bank_account_number, payouts):
+        sent.append(([payout.stage_id for payout in payouts], {payout.transfer_key for payout in payouts}))
+        return PaymentStatus(transaction_id="tx-retry", status="completed")
+
+    monkeypatch.setattr(PaymentService, "send_netted_payout", fake_send)
+    use_current_user(users["grantor"])
+    grant = (
+        await client.post(
+            "/api/v1/grants/",
+            json={
+                "name": "Crashed Payout",
+                "bank_account_number": "BANK-CRASH",
+                "payout_policy": "next_month",
+                "stages": [{"order": 1, "amount": 80, "requirements": []}],
+                "participants": [],
+            },
+        )
+    ).json()
+    await client.post(f"/api/v1/grants/{grant['id']}/confirm")
+    await client.post(f"/api/v1/grants/stages/{grant['stages'][0]['id']}/complete")
+    stage_id = UUID(grant["stages"][0]["id"])
+
+    async def claimed(ago: timedelta) -> datetime:
+        # What a worker that died between claiming and settling leaves behind.
+        now = datetime.now(timezone.utc)
+        async with session_factory() as session:
+            await session.execute(
+                update(PayoutSchedule).values(
+                    status="processing", claimed_at=now - ago, attempts=1, transfer_key="crashed-claim:BANK-CRASH"
+                )
+            )
+            await session.commit()
+        return now
+
+    async def no_transfers(after_account):
+        return
+        yield
+
+    async def findings() -> list[tuple[str, tuple[UUID, ...]]]:
+        return [(d.kind, d.stage_ids) async for d in PayoutReconciler(session_factory, statement=no_transfers).run()]
+
+    now = await claimed(timedelta(seconds=10))
+    assert await findings() == []
+    async with PayoutScheduler(lease_seconds=300).running(session_factory) as scheduler:
+        assert await scheduler.run_due(now=now) == 0
+
+    now = await claimed(timedelta(hours=1))
+    assert await findings() == [("missing", (stage_id,))]
+    async with PayoutScheduler(lease_seconds=300).running(session_factory) as scheduler:
+        assert scheduler.next_wakeup == now - timedelta(hours=1) + timedelta(seconds=300)
+        assert await scheduler.run_due(now=now) == 1
+
+    # Resent under the key of the lost claim, so a bank that executed it answers with the first transfer.
+    assert sent == [([stage_id], {"crashed-claim:BANK-CRASH"})]
+    async with session_factory() as session:
+        payout = (await session.execute(select(PayoutSchedule))).scalar_one()
+    assert (payout.status, payout.attempts, payout.transaction_id) == ("paid", 2, "tx-retry")
+
+
+@pytest.mark.asyncio
+async def test_payouts_to_one_account_are_netted_within_window(
+    monkeypatch, client: AsyncClient, session_factory, users, use_current_user
+):
+    transfers = []
+
+    async def fake_send_payment(self, participant_id, amount, reference, idempotency_key=None):
+        transfers.append((participant_id, amount, reference))
+        return {"transaction_id": f"tx-{len(transfers)}", "status": "completed"}
+
+    monkeypatch.setattr(SimplePaymentGateway, "send_payment", fake_send_payment)
+    monkeypatch.setattr(settings, "payout_netting_window_seconds", 3600)
+    use_current_user(users["grantor"])
+    stage_ids = []
+    programs = [("Netted A", "BANK-NET", 100), ("Netted B", "BANK-NET", 50), ("Other", "BANK-OWN", 70)]
+    for name, account, amount in programs:
+        grant = (
+            await client.post(
+                "/api/v1/grants/",
+                json={
+                    "name": name,
+                    "bank_account_number": account,
+                    "stages": [{"order": 1, "amount": amount, "requirements": []}],
+                    "participants": [],
+                },
+            )
+        ).json()
+        await client.post(f"/api/v1/grants/{grant['id']}/confirm")
+        assert (await client.post(f"/api/v1/grants/stages/{grant['stages'][0]['id']}/complete")).status_code == 200
+        stage_ids.append(grant["stages"][0]["id"])
+    # Held for the window instead of being paid on completion.
+    assert transfers == []
+
+    async with session_factory() as session:
+        due_times = set((await session.execute(select(PayoutSchedule.due_at))).scalars().all())
+    window_end = max(due_times).replace(tzinfo=timezone.utc)
+    async with PayoutScheduler().running(session_factory) as scheduler:
+        assert await scheduler.run_due(now=window_end) == 3
+
+    netted = next(transfer for transfer in transfers if transfer[0] == "BANK-NET")
+    assert len(transfers) == 2
+    assert netted[1] == 150.0
+    assert set(netted[2].removeprefix("GrantStage:").split(",")) == set(stage_ids[:2])
+    async with session_factory() as session:
+        payouts = (await session.execute(select(PayoutSchedule))).scalars().all()
+    assert {payout.status for payout in payouts} == {"paid"}
+    assert len({payout.transaction_id for payout in payouts if payout.bank_account_number == "BANK-NET"}) == 1
+
+
+@pytest.mark.asyncio
+async def test_failed_transfers_are_retried_under_their_idempotency_key(
+    monkeypatch, client: AsyncClient, session_factory, users, use_current_user
+):
+    attempts = []
+
+    async def flaky_send_payment(self, participant_id, amount, reference, idempotency_key=None):
+        attempts.append((amount, idempotency_key))
+        if len(attempts) == 1:
+            # The bank may have executed the transfer before the response was lost.
+            raise TimeoutError("read timeout")
+        return {"transaction_id": "tx-once", "status": "completed"}
+
+    monkeypatch.setattr(SimplePaymentGateway, "send_payment", flaky_send_payment)
+    monkeypatch.setattr(settings, "payout_netting_window_seconds", 3600)
+    use_current_user(users["grantor"])
+    for name, amount in (("Retried A", 30), ("Retried B", 20)):
+        grant = (
+            await client.post(
+                "/api/v1/grants/",
+                json={
+                    "name": name,
+                    "bank_account_number": "BANK-RETRY",
+                    "stages": [{"order": 1, "amount": amount, "requirements": []}],
+                    "participants": [],
+                },
+            )
+        ).json()
+        await client.post(f"/api/v1/grants/{grant['id']}/confirm")
+        await client.post(f"/api/v1/grants/stages/{grant['stages'][0]['id']}/complete")
+
+    async with session_factory() as session:
+        window_end = max((await session.execute(select(PayoutSchedule.due_at))).scalars().all())
+    window_end = window_end.replace(tzinfo=timezone.utc)
+    async with PayoutScheduler().running(session_factory) as scheduler:
+        assert await scheduler.run_due(now=window_end) == 0
+    # A batch smaller than the netted transfer: the retry still claims every payout under its key together.
+    async with PayoutScheduler(batch_size=1).running(session_factory) as scheduler:
+        assert await scheduler.run_due(now=window_end + timedelta(hours=1)) == 2
+
+    assert [amount for amount, _ in attempts] == [50.0, 50.0]
+    assert attempts[0][1] is not None and attempts[0][1] == attempts[1][1]
+    async with session_factory() as session:
+        payouts = (await session.execute(select(PayoutSchedule))).scalars().all()
+    assert {(payout.status, payout.transaction_id, payout.transfer_key) for payout in payouts} == {
+        ("paid", "tx-once", attempts[0][1])
+    }
+
+
+@pytest.mark.asyncio
+async def test_reconciliation_reports_discrepancies_and_resumes(
+    client: AsyncClient, session_factory, users, use_current_user
+):
+    use_current_user(users["grantor"])
+    stages: dict[str, list[UUID]] = {}
+    for account, amounts in [("ACC-A", [100]), ("ACC-B", [50]), ("ACC-C", [70]), ("ACC-D", [30, 20])]:
+        grant = (
+            await client.post(
+                "/api/v1/grants/",
+                json={
+                    "name": f"Reconcile {account}",
+                    "bank_account_number": account,
+                    "stages": [
+                        {"order": order, "amount": amount, "requirements": []}
+                        for order, amount in enumerate(amounts, start=1)
+                    ],
+                    "participants": [],
+                },
+            )
+        ).json()
+        await client.post(f"/api/v1/grants/{grant['id']}/confirm")
+        for stage in grant["stages"]:
+            await client.post(f"/api/v1/grants/stages/{stage['id']}/complete")
+        stages[account] = [UUID(stage["id"]) for stage in grant["stages"]]
+
+    d1, d2 = stages["ACC-D"]
+    statement = sorted(
+        [
+            StatementEntry("ACC-A", stages["ACC-A"][0], "tx-a", Decimal("100.00")),
+            StatementEntry("ACC-B", stages["ACC-B"][0], "tx-b", Decimal("40.00")),
+            StatementEntry("ACC-C", uuid4(), "tx-stray", Decimal("5.00")),
+            # One netted transfer for both stages, plus a second payment of d1.
+            StatementEntry("ACC-D", d1, "tx-d", Decimal("50.00")),
+            StatementEntry("ACC-D", d2, "tx-d", Decimal("50.00")),
+            StatementEntry("ACC-D", d1, "tx-d-again", Decimal("30.00")),
+        ],
+        key=lambda entry: (entry.account, entry.stage_id),
+    )
+
+    async def fake_statement(after_account):
+        for entry in statement:
+            if after_account is None or entry.account > after_account:
+                yield entry
+
+    reconciler = PayoutReconciler(session_factory, statement=fake_statement, batch_size=2, checkpoint_every=1)
+    found = [(d.kind, d.account) async for d in reconciler.run()]
+    assert sorted(found) == [
+        ("duplicate", "ACC-D"),
+        ("mismatched", "ACC-B"),
+        ("missing", "ACC-C"),
+        ("unexpected", "ACC-C"),
+    ]
+
+    # Interrupt after the first finding; the finished accounts before it are checkpointed.
+    run = reconciler.run(resume=False)
+    assert (await anext(run)).account == "ACC-B"
+    await run.aclose()
+    async with session_factory() as session:
+        assert await JobCheckpointRepository(session).get(CHECKPOINT_NAME) == {"account": "ACC-A"}
+
+    resumed = PayoutReconciler(session_factory, statement=fake_statement)
+    assert sorted([(d.kind, d.account) async for d in resumed.run()]) == sorted(found)
+    assert resumed.stages_checked == 4
+    async with session_factory() as session:
+        assert await JobCheckpointRepository(session).get(CHECKPOINT_NAME) is None
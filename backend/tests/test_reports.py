@@ -0,0 +1,77 @@
+from datetime import date, datetime, timezone
+
+import pytest
+from httpx import AsyncClient
+
+from src.core.config import settings
+from src.modules.reports import commands
+
+
+@pytest.mark.asyncio
+async def test_disbursement_rollups_follow_transitions_and_rebuild(
+    monkeypatch, client: AsyncClient, session_factory, users, use_current_user
+):
+    use_current_user(users["grantor"])
+    payload = {
+        "name": "Rollup Program",
+        "bank_account_number": "BANK-ROLL",
+        "stages": [
+            {"order": 1, "amount": 300, "requirements": []},
+            {"order": 2, "amount": 200, "requirements": []},
+        ],
+        "participants": [],
+    }
+    grant = (await client.post("/api/v1/grants/", json=payload)).json()
+    await client.post(f"/api/v1/grants/{grant['id']}/confirm")
+    await client.post(f"/api/v1/grants/stages/{grant['stages'][0]['id']}/complete")
+
+    use_current_user(users["supervisor"])
+    other = (await client.post("/api/v1/grants/", json={**payload, "name": "Other Program"})).json()
+    await client.post(f"/api/v1/grants/{other['id']}/confirm")
+
+    now = datetime.now(timezone.utc)
+    this_month = date(now.year, now.month, 1)
+
+    use_current_user(users["grantor"])
+    series = (await client.get("/api/v1/reports/disbursements")).json()
+    assert len(series) == 12
+    assert series[-1] == {
+        "month": this_month.isoformat(),
+        "grantor_id": str(users["grantor"].id),
+        "status": None,
+        "committed_amount": 500.0,
+        "disbursed_amount": 300.0,
+        "programs_confirmed": 1,
+        "programs_completed": 0,
+        "stages_completed": 1,
+    }
+    assert all(point["committed_amount"] == 0 for point in series[:-1])
+
+    forbidden = await client.get("/api/v1/reports/disbursements", params={"grantor_id": str(users["supervisor"].id)})
+    assert forbidden.status_code == 403
+
+    monkeypatch.setattr(settings, "report_viewer_emails", [users["grantor"].email])
+    params = {"start": this_month.isoformat(), "end": this_month.isoformat()}
+    portfolio = (await client.get("/api/v1/reports/disbursements", params=params)).json()
+    assert [(point["committed_amount"], point["disbursed_amount"]) for point in portfolio] == [(1000.0, 300.0)]
+    by_grantor = (await client.get("/api/v1/reports/disbursements", params={**params, "by_grantor": True})).json()
+    assert len(by_grantor) == 2
+
+    assert await commands.rebuild_rollups(session_factory) == 2
+    assert (await client.get("/api/v1/reports/disbursements", params={**params, "by_grantor": True})).json() == by_grantor
+
+    # Completing the program moves everything it booked from the active buckets to the completed ones.
+    await client.post(f"/api/v1/grants/stages/{grant['stages'][1]['id']}/complete")
+    by_status = (await client.get("/api/v1/reports/disbursements", params={**params, "by_status": True})).json()
+    assert [
+        (point["status"], point["committed_amount"], point["disbursed_amount"], point["programs_completed"])
+        for point in by_status
+    ] == [("active", 500.0, 0.0, 0), ("completed", 500.0, 500.0, 1)]
+    completed = (await client.get("/api/v1/reports/disbursements", params={**params, "status": "completed"})).json()
+    assert [(point["status"], point["stages_completed"]) for point in completed] == [("completed", 2)]
+
+    split = {**params, "by_grantor": True, "by_status": True}
+    incremental = (await client.get("/api/v1/reports/disbursements", params=split)).json()
+    assert len(incremental) == 2
+    assert await commands.rebuild_rollups(session_factory) == 2
+    assert (await client.get("/api/v1/reports/disbursements", params=split)).json() == incremental
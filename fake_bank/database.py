@@ -1,4 +1,4 @@
-from sqlalchemy import create_engine, Column, String, Float, DateTime, Enum
+from sqlalchemy import create_engine, Column, String, Float, DateTime, Enum, Index
 from sqlalchemy.ext.declarative import declarative_base
 from sqlalchemy.orm import sessionmaker
 import datetime
@@ -39,6 +39,29 @@ class TransactionDB(Base):
     status = Column(String, default="completed")
     description = Column(String, nullable=True)
 
+class TransferReferenceDB(Base):
+    """
+    Одна строка на каждую ссылку `GrantStage:<id>` в описании перевода.
+    Индекс отдает выписку в порядке (получатель, ссылка) для сверки выплат.
+    """
+    __tablename__ = "transfer_references"
+    __table_args__ = (Index("ix_transfer_references_statement", "from_card", "to_card", "reference"),)
+
+    transaction_id = Column(String, primary_key=True)
+    reference = Column(String, primary_key=True)
+    from_card = Column(String, nullable=False)
+    to_card = Column(String, nullable=False)
+
+class IdempotencyKeyDB(Base):
+    """
+    Ключ идемпотентности (заголовок `Idempotency-Key`) проведенного пополнения или перевода.
+    Повторный запрос с тем же ключом возвращает эту транзакцию вместо новой.
+    """
+    __tablename__ = "idempotency_keys"
+
+    key = Column(String, primary_key=True)
+    transaction_id = Column(String, nullable=False)
+
 # Создаем таблицы
 def init_db():
     Base.metadata.create_all(bind=engine)
@@ -1,19 +1,33 @@
-from fastapi import FastAPI, Depends, HTTPException, status
+from fastapi import FastAPI, Depends, Header, HTTPException, status
+from fastapi.responses import StreamingResponse
+from sqlalchemy.exc import IntegrityError
 from sqlalchemy.orm import Session
 import uuid
 import datetime
-from typing import List
+from typing import List, Optional
 import json
 
-from database import get_db, AccountDB, TransactionDB
+from database import (
+    get_db,
+    DATABASE_URL,
+    SessionLocal,
+    AccountDB,
+    IdempotencyKeyDB,
+    TransactionDB,
+    TransferReferenceDB
+)
 from models import (
     DepositRequest, 
     TransferRequest, 
     TransactionResponse, 
     AccountBalance,
+    StatementEntry,
     TransactionType
 )
 
+GRANT_REFERENCE_PREFIX = "GrantStage:"
+STATEMENT_BATCH_SIZE = 1000
+
 app = FastAPI(
     title="Bank Service API",
     description="API для банковских операций с банком 131",
@@ -42,10 +56,53 @@ def log_event(event: dict):
         # Logging should never block banking operations
         pass
 
+def replayed_transaction(
+    db: Session, idempotency_key: Optional[str], amount: float, card_number: str
+) -> Optional[TransactionResponse]:
+    """
+    Транзакция, уже проведенная с этим ключом идемпотентности, или None.
+    Ключ, использованный для другой суммы или другого получателя, отклоняется с 409.
+    """
+    if idempotency_key is None:
+        return None
+    record = db.query(IdempotencyKeyDB).filter(IdempotencyKeyDB.key == idempotency_key).first()
+    if record is None:
+        return None
+    transaction = db.query(TransactionDB).filter(TransactionDB.id == record.transaction_id).one()
+    if transaction.amount != amount or transaction.to_card != card_number:
+        raise HTTPException(
+            status_code=status.HTTP_409_CONFLICT,
+            detail="Ключ идемпотентности уже использован для другой операции"
+        )
+    return TransactionResponse(
+        transaction_id=transaction.id,
+        type=transaction.type,
+        amount=transaction.amount,
+        card_number=card_number,
+        timestamp=transaction.timestamp,
+        status=transaction.status,
+        message="Операция уже проведена по этому ключу идемпотентности"
+    )
+
+def commit_once(db: Session, idempotency_key: Optional[str], transaction: TransactionDB) -> bool:
+    """
+    Фиксирует транзакцию вместе с ее ключом идемпотентности.
+    False: параллельный запрос с тем же ключом успел раньше, изменения откатаны.
+    """
+    if idempotency_key is not None:
+        db.add(IdempotencyKeyDB(key=idempotency_key, transaction_id=transaction.id))
+    try:
+        db.commit()
+    except IntegrityError:
+        db.rollback()
+        return False
+    return True
+
 @app.post("/deposit", response_model=TransactionResponse)
 async def deposit_money(
     request: DepositRequest,
-    db: Session = Depends(get_db)
+    db: Session = Depends(get_db),
+    idempotency_key: Optional[str] = Header(None, alias="Idempotency-Key")
 ):
 
     if not (request.card_number):
@@ -53,6 +110,10 @@ async def deposit_money(
             status_code=status.HTTP_400_BAD_REQUEST,
             detail="Неверный формат номера карты"
         )
+
+    replay = replayed_transaction(db, idempotency_key, request.amount, request.card_number)
+    if replay is not None:
+        return replay
     
     # Получаем или создаем счет
     account = db.query(AccountDB).filter(AccountDB.card_number == request.card_number).first()
@@ -74,7 +135,8 @@ async def deposit_money(
     )
     
     db.add(transaction)
-    db.commit()
+    if not commit_once(db, idempotency_key, transaction):
+        return replayed_transaction(db, idempotency_key, request.amount, request.card_number)
     db.refresh(transaction)
 
     log_event({
@@ -99,7 +161,8 @@ async def deposit_money(
 @app.post("/transfer", response_model=TransactionResponse)
 async def transfer_money(
     request: TransferRequest,
-    db: Session = Depends(get_db)
+    db: Session = Depends(get_db),
+    idempotency_key: Optional[str] = Header(None, alias="Idempotency-Key")
 ):
     # Валидация карт
     if not (request.from_card) or not (request.to_card):
@@ -113,6 +176,11 @@ async def transfer_money(
             status_code=status.HTTP_400_BAD_REQUEST,
             detail="Нельзя переводить деньги на ту же карту"
         )
+
+    # Повтор запроса, уже проведенного с этим ключом, не списывает деньги второй раз.
+    replay = replayed_transaction(db, idempotency_key, request.amount, request.to_card)
+    if replay is not None:
+        return replay
     
     # Получаем счет отправителя
     from_account = get_account(db, request.from_card)
@@ -146,7 +214,15 @@ async def transfer_money(
     )
     
     db.add(transaction)
-    db.commit()
+    for reference in grant_references(transaction.description):
+        db.add(TransferReferenceDB(
+            transaction_id=transaction.id,
+            reference=reference,
+            from_card=request.from_card,
+            to_card=request.to_card
+        ))
+    if not commit_once(db, idempotency_key, transaction):
+        return replayed_transaction(db, idempotency_key, request.amount, request.to_card)
     db.refresh(transaction)
 
     log_event({
@@ -226,6 +302,50 @@ async def get_transactions(
     
     return response_transactions
 
+def grant_references(description: Optional[str]) -> List[str]:
+    """`GrantStage:a,b` -> [`GrantStage:a`, `GrantStage:b`]"""
+    if not description or not description.startswith(GRANT_REFERENCE_PREFIX):
+        return []
+    stage_ids = description[len(GRANT_REFERENCE_PREFIX):].split(",")
+    return [f"{GRANT_REFERENCE_PREFIX}{stage_id.strip()}" for stage_id in stage_ids if stage_id.strip()]
+
+
+@app.get("/transfers/statement")
+def transfer_statement(from_card: str, after_card: Optional[str] = None):
+    """
+    Выписка переводов с карты в формате NDJSON, по одной строке на ссылку `GrantStage:<id>`,
+    отсортированная по (to_card, reference). Строки читаются пачками, поэтому размер выписки не ограничен.
+    `after_card` продолжает выписку после указанного получателя.
+    """
+    def rows():
+        db = SessionLocal()
+        try:
+            query = (
+                db.query(TransferReferenceDB, TransactionDB)
+                .join(TransactionDB, TransactionDB.id == TransferReferenceDB.transaction_id)
+                .filter(TransferReferenceDB.from_card == from_card)
+            )
+            # Побайтовый порядок (COLLATE "C" в PostgreSQL) совпадает с порядком сверки на стороне SmartGrant.
+            to_card = TransferReferenceDB.to_card
+            if not DATABASE_URL.startswith("sqlite"):
+                to_card = to_card.collate("C")
+            if after_card is not None:
+                query = query.filter(to_card > after_card)
+            query = query.order_by(to_card, TransferReferenceDB.reference).yield_per(STATEMENT_BATCH_SIZE)
+            for reference, transaction in query:
+                entry = StatementEntry(
+                    transaction_id=transaction.id,
+                    to_card=reference.to_card,
+                    reference=reference.reference,
+                    amount=transaction.amount,
+                    status=transaction.status
+                )
+                yield entry.json() + "\n"
+        finally:
+            db.close()
+
+    return StreamingResponse(rows(), media_type="application/x-ndjson")
+
 @app.get("/")
 async def root():
     return {
@@ -235,7 +355,8 @@ async def root():
             "deposit": "POST /deposit - Пополнение счета",
             "transfer": "POST /transfer - Перевод денег",
             "balance": "GET /balance/{card_number} - Получение баланса",
-            "transactions": "GET /transactions/{card_number} - История транзакций"
+            "transactions": "GET /transactions/{card_number} - История транзакций",
+            "statement": "GET /transfers/statement?from_card=... - Выписка переводов для сверки (NDJSON)"
         }
     }
 
@@ -26,6 +26,13 @@ class TransactionResponse(BaseModel):
     status: str
     message: str
 
+class StatementEntry(BaseModel):
+    transaction_id: str
+    to_card: str
+    reference: str
+    amount: float
+    status: str
+
 class AccountBalance(BaseModel):
     card_number: str
     balance: float